@@ -0,0 +1,67 @@
+from wasmfunc import array, f64, i32, i64, wasmfunc
+
+# Without -gc, arrays live in linear memory, see examples/gc_lists.py for the same functions using WasmGC
+
+
+@wasmfunc()
+def create() -> i32:
+    arr: array[i32] = [5, 4, 3, 2, 1]
+    return arr[0] + arr[4] * 10
+
+
+@wasmfunc()
+def edit(index: i32, value: f64) -> f64:
+    values: array[f64] = [0.5, 1.5, 2.5]
+    values[index] = value
+    return values[0] + values[1] + values[2]
+
+
+@wasmfunc()
+def list_range(start: i32, stop: i32, step: i32, index: i32) -> i32:
+    arr: array[i32] = list(range(start, stop, step))
+    return arr[index]
+
+
+@wasmfunc()
+def list_lens(start: i32, stop: i32, step: i32) -> i32:
+    arr: array[i64] = list(range(start, stop, step))
+    return len(arr)
+
+
+@wasmfunc()
+def powers_of_three(count: i32) -> array[i64]:
+    powers: array[i64] = list(range(0, count, 1))
+    power: i64 = 1
+    for i in range(count):
+        powers[i] = power
+        power = power * 3
+    return powers
+
+
+@wasmfunc()
+def total(values: array[i64]) -> i64:
+    result: i64 = 0
+    for i in range(len(values)):
+        result = result + values[i]
+    return result
+
+
+@wasmfunc()
+def sum_of_powers(count: i32) -> i64:
+    powers: array[i64] = powers_of_three(count)
+    return total(powers)
+
+
+testinputs_create = [()]
+testinputs_edit = [(0, 4.0), (2, -1.0)]
+testinputs_list_range = [
+    (0, 10, 1, 3),
+    (1, 11, 2, 4),
+    (-5, 5, 3, 2),
+    (-20, -10, 3, 2),
+    (10, 0, -3, 3),
+]
+testinputs_list_lens = [(0, 10, 1), (1, 11, 2), (10, 0, 1), (10, 0, -3), (5, 5, 1)]
+testinputs_powers_of_three = [(0,), (5,), (40,)]
+testinputs_sum_of_powers = [(0,), (1,), (30,)]
+testinputs_total = [([],), ([1, 2, 3],), ([2**40, -5],)]
@@ -0,0 +1,112 @@
+from wasmfunc import f32, f64, i32, i64, wasmfunc
+
+
+@wasmfunc()
+def bit_ops_i32(x: i32, y: i32) -> i32:
+    return (x & y) ^ (x | y) ^ ~x
+
+
+@wasmfunc()
+def bit_ops_i64(x: i64, y: i64) -> i64:
+    return (x & y) ^ (x | y) ^ ~y
+
+
+testinputs_bit_ops_i32 = testinputs_bit_ops_i64 = [
+    (0, 0),
+    (12, 10),
+    (-1, 5),
+    (-123456, 98765),
+]
+
+
+@wasmfunc()
+def shifts_i32(x: i32, n: i32) -> i32:
+    return ((x << n) >> 1) + (x >> n)
+
+
+@wasmfunc()
+def shifts_i64(x: i64, n: i64) -> i64:
+    return (x << n) + (x >> n) + (1 << 40)
+
+
+testinputs_shifts_i32 = [(1, 3), (-64, 2), (1000, 0), (12345, 7)]
+testinputs_shifts_i64 = [(1, 3), (-64, 2), (1000, 20), (-(2**40), 5)]
+
+
+@wasmfunc()
+def literal_shifts(x: i64) -> i64:
+    # Shifts of two literals are computed like python, even for counts past the width of an i32
+    return x + (1 << 33) + ((1 << 35) >> 33) + (1000 >> 33)
+
+
+testinputs_literal_shifts = [(0,), (-5,)]
+
+
+@wasmfunc()
+def fnv1a(n: i32) -> i64:
+    # FNV-1a hash of the bytes 0 to n - 1, kept to 32 bits
+    hash: i64 = 2166136261
+    for i in range(n):
+        hash = ((hash ^ (i & 255)) * 16777619) & 4294967295
+    return hash
+
+
+testinputs_fnv1a = [(0,), (1,), (100,)]
+
+
+@wasmfunc()
+def popcount(x: i32) -> i32:
+    count: i32 = 0
+    while x != 0:
+        x = x & (x - 1)
+        count += 1
+    return count
+
+
+testinputs_popcount = [(0,), (1,), (255,), (1 << 30,)]
+
+
+@wasmfunc()
+def power_i32(x: i32, n: i32) -> i32:
+    return x**n
+
+
+@wasmfunc()
+def power_i64(x: i64, n: i64) -> i64:
+    return x**n
+
+
+testinputs_power_i32 = [(2, 10), (3, 0), (-3, 5), (7, 1), (0, 0)]
+testinputs_power_i64 = [(2, 40), (3, 30), (-5, 7), (10, 0)]
+
+
+@wasmfunc()
+def power_literals(x: i32) -> i32:
+    return x**2 + x**3 + x**0 + x**1 + 2**10
+
+
+testinputs_power_literals = [(0,), (3,), (-4,)]
+
+
+@wasmfunc()
+def power_f64(x: f64, n: i32) -> f64:
+    return x**n
+
+
+testinputs_power_f64 = [(2.0, 10), (2.0, -2), (1.5, 3), (-0.5, 0), (10.0, -3)]
+
+
+@wasmfunc()
+def power_float_literals(x: f64) -> f64:
+    return x**2 + x**-1 + x**0.5 + 4**-1
+
+
+testinputs_power_float_literals = [(1.0,), (4.0,), (0.25,)]
+
+
+@wasmfunc()
+def power_f32(x: f32) -> f32:
+    return x**3
+
+
+testinputs_power_f32 = [(2.0,), (-1.5,)]
@@ -0,0 +1,53 @@
+from wasmfunc import buf, f64, i32, i64, wasmfunc
+
+
+@wasmfunc()
+def sum_f64(values: buf[f64]) -> f64:
+    total: f64 = 0.0
+    i: i32 = 0
+    while i < len(values):
+        total = total + values[i]
+        i = i + 1
+    return total
+
+
+@wasmfunc()
+def dot(a: buf[f64], b: buf[f64]) -> f64:
+    total: f64 = 0.0
+    i: i32 = 0
+    while i < len(a):
+        total = total + a[i] * b[i]
+        i = i + 1
+    return total
+
+
+@wasmfunc()
+def count_above(values: buf[i64], threshold: i64) -> i32:
+    count: i32 = 0
+    i: i32 = 0
+    while i < len(values):
+        if values[i] > threshold:
+            count = count + 1
+        i = i + 1
+    return count
+
+
+@wasmfunc()
+def fill(values: buf[i32], value: i32) -> i32:
+    i: i32 = 0
+    while i < len(values):
+        values[i] = value
+        i = i + 1
+    return len(values)
+
+
+@wasmfunc()
+def sum_twice(values: buf[f64]) -> f64:
+    return sum_f64(values) + sum_f64(values)
+
+
+testinputs_sum_f64 = [([],), ([1.5],), ([1.0, 2.0, 3.5],)]
+testinputs_dot = [([1.0, 2.0, 3.0], [4.0, 5.0, 6.0])]
+testinputs_count_above = [([1, 5, 10, 2**40], 4), ([], 0)]
+testinputs_fill = [([0, 0, 0], 7)]
+testinputs_sum_twice = [([0.25, 0.5],)]
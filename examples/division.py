@@ -21,7 +21,38 @@ def division_f64(x: f64, y: f64) -> f64:
     return x // y
 
 
-testinputs_division_i32 = testinputs_division_i64 = [
+@wasmfunc()
+def modulo_i32(x: i32, y: i32) -> i32:
+    return x % y
+
+
+@wasmfunc()
+def modulo_i64(x: i64, y: i64) -> i64:
+    return x % y
+
+
+@wasmfunc()
+def constant_divisors_i32(x: i32) -> i32:
+    return x // 7 + x % 7 * 10 + x // 8 * 100 + x % 8 * 1000 + x // -3 * 10000
+
+
+@wasmfunc()
+def constant_divisors_i64(x: i64) -> i64:
+    return x // 1000000007 + x % 1000000007 + x // 4096 + x % 4096
+
+
+@wasmfunc()
+def true_division(x: i32, y: i32) -> f64:
+    return x / y
+
+
+testinputs_constant_divisors_i32 = [(0,), (1,), (-1,), (20,), (-20,), (56,), (-57,)]
+testinputs_constant_divisors_i64 = [(0,), (-1,), (2**40 + 12345,), (-(2**40) - 12345,)]
+testinputs_true_division = [(7, 2), (-7, 2), (1, 3)]
+
+testinputs_division_i32 = testinputs_division_i64 = testinputs_modulo_i32 = (
+    testinputs_modulo_i64
+) = [
     (10, 3),
     (10, -3),
     (-10, 3),
@@ -0,0 +1,148 @@
+from wasmfunc import i32, i64, wasmfunc
+
+
+@wasmfunc()
+def sum_below(n: i32) -> i32:
+    total: i32 = 0
+    for i in range(n):
+        total += i
+    return total
+
+
+testinputs_sum_below = [(0,), (1,), (10,), (-5,)]
+
+
+@wasmfunc()
+def sum_range(start: i32, stop: i32, step: i32) -> i32:
+    total: i32 = 0
+    for i in range(start, stop, step):
+        total += i
+    return total
+
+
+testinputs_sum_range = [
+    (0, 10, 1),
+    (0, 10, 3),
+    (10, 0, -1),
+    (10, 0, -4),
+    (5, 5, 2),
+    (0, 10, -1),
+]
+
+
+@wasmfunc()
+def count_down(n: i32) -> i32:
+    last: i32 = -1
+    for i in range(n, 0, -2):
+        last = i
+    return last
+
+
+testinputs_count_down = [(10,), (9,), (0,)]
+
+
+@wasmfunc()
+def sum_large(n: i64) -> i64:
+    total: i64 = 0
+    for i in range(n):
+        total += i * 1000000
+    return total
+
+
+testinputs_sum_large = [(0,), (100000,)]
+
+
+@wasmfunc()
+def first_multiple(n: i32, factor: i32) -> i32:
+    found: i32 = -1
+    for i in range(1, n):
+        if i % factor != 0:
+            continue
+        found = i
+        break
+    else:
+        found = 0
+    return found
+
+
+testinputs_first_multiple = [(20, 7), (5, 7), (10, 1)]
+
+
+@wasmfunc()
+def loop_variable(n: i32) -> i32:
+    i: i32 = 100
+    for i in range(n):
+        # Assigning to the loop variable doesn't change the iteration
+        i = i * 2
+    return i
+
+
+testinputs_loop_variable = [(0,), (5,)]
+
+
+@wasmfunc()
+def triangle(n: i32) -> i32:
+    total: i32 = 0
+    for i in range(n):
+        for j in range(i + 1):
+            if j == 3:
+                continue
+            total += j
+    return total
+
+
+testinputs_triangle = [(0,), (3,), (10,)]
+
+
+@wasmfunc()
+def near_int_max(step: i32) -> i32:
+    # The counter wraps around after the last iteration, which must not restart the loop
+    count: i32 = 0
+    for i in range(2147483640, 2147483647, 5):
+        count += 1
+    for i in range(2147483640, 2147483647, step):
+        count += 100
+    return count
+
+
+@wasmfunc()
+def near_int_min(step: i32) -> i32:
+    count: i32 = 0
+    last: i32 = 0
+    for i in range(-2147483640, -2147483648, -5):
+        count += 1
+        last = i
+    for i in range(-2147483640, -2147483648, step):
+        count += 100
+    return count + (last + 2147483640)
+
+
+testinputs_near_int_max = [(5,), (1,), (7,)]
+testinputs_near_int_min = [(-5,), (-1,), (-8,)]
+
+
+@wasmfunc()
+def near_i64_limits(step: i64) -> i64:
+    count: i64 = 0
+    for i in range(9223372036854775800, 9223372036854775807, step):
+        count += 1
+    for i in range(-9223372036854775800, -9223372036854775807 - 1, -step):
+        count += 100
+    return count
+
+
+testinputs_near_i64_limits = [(3,), (1,), (9223372036854775807,)]
+
+
+@wasmfunc()
+def large_step(n: i32) -> i64:
+    # A literal step which doesn't fit in an i32 counts with an i64
+    total: i64 = 0
+    for i in range(0, n, 10000000000):
+        total += i + 1
+    for i in range(n, -30000000000, -10000000000):
+        total += i
+    return total
+
+
+testinputs_large_step = [(0,), (5,), (-5,), (2147483647,)]
@@ -26,6 +26,18 @@ def list_lens(start: i32, stop: i32, step: i32, index: i32) -> i32:
     return len(arr)
 
 
+@wasmfunc()
+def powers_of_three(count: i32) -> array[i64]:
+    powers: array[i64] = list(range(0, count, 1))
+    power: i64 = 1
+    i: i32 = 0
+    while i < count:
+        powers[i] = power
+        power = power * 3
+        i = i + 1
+    return powers
+
+
 # @wasmfunc()
 # def copy() -> i32:
 #     original: array[i32] = [5, 4, 3, 2, 1]
@@ -51,4 +63,5 @@ testinputs_list_lens = testinputs_list_range = [
     (10, 20, 4, 2),  # Expected output: 18
     (-20, -10, 3, 2),  # Expected output: -17
 ]
+testinputs_powers_of_three = [(0,), (5,), (40,)]
 # testinputs_copy = [()]
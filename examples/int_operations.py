@@ -32,9 +32,10 @@ def bidmas() -> f64:
     return x
 
 
-# @wasmfunc()
-# def exponentiation() -> i32:
-#     return 2 ** 3
+@wasmfunc()
+def exponentiation() -> i32:
+    return 2**3
+
 
 testinputs_addition = [()]
 testinputs_subtraction = [()]
@@ -42,3 +43,4 @@ testinputs_multiplication = [()]
 testinputs_division = [()]
 testinputs_remainder = [()]
 testinputs_bidmas = [()]
+testinputs_exponentiation = [()]
@@ -0,0 +1,45 @@
+from wasmfunc import f32, f64, i32, i64, wasmfunc
+
+
+@wasmfunc()
+def scale_f32(x: f32) -> f32:
+    return x * 0.5 + 2 - 1.25 / 5
+
+
+testinputs_scale_f32 = [(0.0,), (1.0,), (-3.5,)]
+
+
+@wasmfunc()
+def polynomial_f32(x: f32) -> f32:
+    y: f32 = 3
+    y = y * x - 2.0
+    return y * x + 1
+
+
+testinputs_polynomial_f32 = [(0.0,), (2.0,), (-0.5,)]
+
+
+@wasmfunc()
+def mix_f64(x: f64) -> f64:
+    return x * 2 + 0.1 - -3
+
+
+testinputs_mix_f64 = [(0.0,), (1.5,)]
+
+
+@wasmfunc()
+def offset_i64(x: i64) -> i64:
+    return x * 3 + 5000000000 - -1
+
+
+testinputs_offset_i64 = [(0,), (2**40,), (-7,)]
+
+
+@wasmfunc()
+def compare_f32(x: f32) -> i32:
+    if x > 1:
+        return 1
+    return 0
+
+
+testinputs_compare_f32 = [(0.5,), (2.0,)]
@@ -0,0 +1,91 @@
+import math
+from math import copysign
+from math import floor as round_down
+
+from wasmfunc import f32, f64, i32, i64, wasmfunc
+
+
+@wasmfunc()
+def hypotenuse(a: f64, b: f64) -> f64:
+    return math.sqrt(a * a + b * b)
+
+
+testinputs_hypotenuse = [(3.0, 4.0), (1.5, 2.5), (0.0, 0.0)]
+
+
+@wasmfunc()
+def sqrt_f32(x: f32) -> f32:
+    return math.sqrt(x)
+
+
+testinputs_sqrt_f32 = [(4.0,), (0.25,), (16.0,)]
+
+
+@wasmfunc()
+def integer_sqrt(n: i32) -> f64:
+    return math.sqrt(n)
+
+
+testinputs_integer_sqrt = [(0,), (49,), (2,)]
+
+
+@wasmfunc()
+def rounding(x: f64) -> f64:
+    return math.floor(x) * 100.0 + math.ceil(x) * 10.0 + math.trunc(x)
+
+
+testinputs_rounding = [(2.5,), (-2.5,), (7.0,), (-0.75,)]
+
+
+@wasmfunc()
+def floor_to_int(x: f32) -> i32:
+    return round_down(x)
+
+
+testinputs_floor_to_int = [(2.75,), (-2.25,), (3.0,)]
+
+
+@wasmfunc()
+def floor_int(x: i64) -> i64:
+    return math.floor(x) + math.ceil(x)
+
+
+testinputs_floor_int = [(5,), (-7,)]
+
+
+@wasmfunc()
+def sign_of(x: f64, y: f64) -> f64:
+    return copysign(x, y)
+
+
+testinputs_sign_of = [(3.0, -1.0), (-3.0, 2.0), (1.5, -0.0)]
+
+
+@wasmfunc()
+def absolutes(x: i32, y: i64, z: f64) -> f64:
+    return abs(x) + abs(y) + abs(z)
+
+
+testinputs_absolutes = [(-3, -4, -5.5), (3, 4, 5.5), (0, -(2**40), -0.0)]
+
+
+@wasmfunc()
+def clamp(x: i32, low: i32, high: i32) -> i32:
+    return max(low, min(x, high))
+
+
+testinputs_clamp = [(5, 0, 10), (-5, 0, 10), (15, 0, 10), (10, 0, 10)]
+
+
+@wasmfunc()
+def smallest(a: f64, b: f64, c: f64) -> f64:
+    return min(a, b, c)
+
+
+@wasmfunc()
+def largest(a: i64, b: i32, c: i64) -> i64:
+    return max(a, b, c)
+
+
+testinputs_smallest = [(1.0, 2.0, 3.0), (3.0, -2.0, 1.0), (0.5, 0.25, -4.0)]
+testinputs_largest = [(1, 2, 3), (2**40, -2, 7), (-5, -6, -7)]
@@ -0,0 +1,81 @@
+import wasmfunc as wf
+from wasmfunc import (
+    buf,
+    f32,
+    f32x4,
+    f32x4_add,
+    f32x4_load,
+    f32x4_mul,
+    f32x4_splat,
+    f32x4_sum,
+    f64,
+    f64x2,
+    i32,
+    i32x4,
+    wasmfunc,
+)
+
+
+@wasmfunc()
+def dot_f32(a: buf[f32], b: buf[f32]) -> f32:
+    # Four lanes at a time, then the elements left over one at a time
+    total: f32x4 = f32x4_splat(0.0)
+    end: i32 = len(a) - len(a) % 4
+    for i in range(0, end, 4):
+        total = f32x4_add(total, f32x4_mul(f32x4_load(a, i), f32x4_load(b, i)))
+    result: f32 = f32x4_sum(total)
+    for i in range(end, len(a)):
+        result = result + a[i] * b[i]
+    return result
+
+
+testinputs_dot_f32 = [
+    ([], []),
+    ([1.0, 2.0, 3.0], [4.0, 5.0, 6.0]),
+    ([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0], [0.5, 0.5, 2.0, 2.0, 1.0, 1.0, -1.0]),
+]
+
+
+@wasmfunc()
+def scale_f64(values: buf[f64], out: buf[f64], factor: f64) -> f64:
+    scale: f64x2 = wf.f64x2_splat(factor)
+    for i in range(0, len(values) - 1, 2):
+        wf.f64x2_store(out, i, wf.f64x2_mul(wf.f64x2_load(values, i), scale))
+    return out[0] + out[len(out) - 1]
+
+
+testinputs_scale_f64 = [
+    ([1.0, 2.0], [0.0, 0.0], 3.0),
+    ([1.5, -2.0, 4.0, 8.0], [0.0, 0.0, 0.0, 0.0], 0.5),
+]
+
+
+@wasmfunc()
+def lanes_i32(a: i32, b: i32, c: i32, d: i32) -> i32:
+    vector: i32x4 = wf.i32x4_make(a, b, c, d)
+    vector = wf.i32x4_replace_lane(vector, 2, 100)
+    doubled: i32x4 = wf.i32x4_add(vector, vector)
+    negated: i32x4 = wf.i32x4_abs(wf.i32x4_neg(doubled))
+    return (
+        wf.i32x4_extract_lane(negated, 3) * 1000
+        + wf.i32x4_reduce_max(vector)
+        - wf.i32x4_reduce_min(vector)
+    )
+
+
+testinputs_lanes_i32 = [(1, 2, 3, 4), (-5, 7, 0, 200), (0, 0, 0, 0)]
+
+
+@wasmfunc()
+def min_max_f32(a: f32, b: f32, c: f32, d: f32) -> f32:
+    vector: f32x4 = wf.f32x4_make(a, b, c, d)
+    low: f32x4 = wf.f32x4_min(vector, wf.f32x4_splat(1.0))
+    high: f32x4 = wf.f32x4_max(vector, wf.f32x4_splat(1.0))
+    return (
+        wf.f32x4_sum(low) * 10.0
+        + wf.f32x4_reduce_max(high)
+        + wf.f32x4_sum(wf.f32x4_sqrt(wf.f32x4_abs(vector)))
+    )
+
+
+testinputs_min_max_f32 = [(4.0, -9.0, 0.25, 16.0), (1.0, 1.0, 1.0, 1.0)]
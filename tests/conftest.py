@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(monkeypatch, tmp_path):
+    """Keep modules compiled by the tests out of the user's real cache"""
+    monkeypatch.setenv("WASMFUNC_CACHE_DIR", str(tmp_path / "cache"))
@@ -0,0 +1,74 @@
+"""test_arrays
+
+Checks that without WasmGC arrays run in process in linear memory, and that the memory they use is freed after each
+call from the host.
+"""
+
+import importlib.util
+import os
+
+import pytest
+import wasmtime
+
+from wasmfunc.compiler import HEAP_POINTER_NAME
+from wasmfunc.file_handler import compile_file
+from wasmfunc.runtime import WasmRuntime
+
+examples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+
+def test_pancake_runs_without_gc():
+    path = os.path.join(examples_dir, "gc_pancake.py")
+    spec = importlib.util.spec_from_file_location("gc_pancake", path)
+    python_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(python_module)
+
+    runtime = WasmRuntime.from_binary(compile_file(path).emit_binary())
+    fannkuch = runtime.get_function("fannkuch")
+    for n in [3, 5, 7]:
+        assert fannkuch(n) == python_module.fannkuch(n)
+
+
+def test_memory_is_freed_after_each_call():
+    runtime = WasmRuntime.from_binary(
+        compile_file(os.path.join(examples_dir, "arrays.py")).emit_binary()
+    )
+    sum_of_powers = runtime.get_function("sum_of_powers")
+    sum_of_powers(10)
+
+    store, exports = runtime._get_thread_instance()
+    heap_pointer = exports[HEAP_POINTER_NAME.decode()]
+    mark = heap_pointer.value(store)
+    for _ in range(3):
+        assert sum_of_powers(30) == (3**30 - 1) // 2
+        assert heap_pointer.value(store) == mark
+
+
+def test_only_allocating_functions_free_memory():
+    signatures = compile_file(os.path.join(examples_dir, "arrays.py")).get_signatures()
+    # sum_of_powers allocates through powers_of_three
+    assert signatures["powers_of_three"]["allocates"]
+    assert signatures["sum_of_powers"]["allocates"]
+    assert not signatures["total"]["allocates"]
+
+
+def test_array_arguments_are_copied_in():
+    runtime = WasmRuntime.from_binary(
+        compile_file(os.path.join(examples_dir, "arrays.py")).emit_binary()
+    )
+    total = runtime.get_function("total")
+    assert total((4, 5, 6)) == 15
+    assert total(range(100)) == 4950
+    with pytest.raises(TypeError, match="Argument 0 of total"):
+        total([1.5])
+
+
+def test_out_of_bounds_indexes_trap():
+    runtime = WasmRuntime.from_binary(
+        compile_file(os.path.join(examples_dir, "arrays.py")).emit_binary()
+    )
+    list_range = runtime.get_function("list_range")
+    assert list_range(0, 10, 1, 9) == 9
+    for index in [10, -1]:
+        with pytest.raises(wasmtime.Trap):
+            list_range(0, 10, 1, index)
@@ -0,0 +1,178 @@
+"""test_decorators
+
+Checks that functions decorated with `@wasmfunc(exec=True)` run as Wasm and give the same result as the python code.
+"""
+
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from wasmfunc import buf, f64, file_handler, i32
+from wasmfunc import runtime as wasmfunc_runtime
+from wasmfunc import wasmfunc
+
+
+@wasmfunc(exec=True)
+def add(x: i32, y: i32) -> i32:
+    return x + y
+
+
+@wasmfunc(exec=True)
+def double(x: i32) -> i32:
+    return add(x, x)
+
+
+def test_exec_matches_python():
+    assert add(4, 5) == 9
+    assert double(21) == 42
+
+
+def test_module_compiled_once(monkeypatch):
+    calls = []
+    compile_file = file_handler.compile_file
+
+    def counting_compile_file(*args, **kwargs):
+        calls.append(args)
+        return compile_file(*args, **kwargs)
+
+    monkeypatch.setattr(file_handler, "compile_file", counting_compile_file)
+
+    runtime = wasmfunc_runtime.WasmRuntime(__file__, use_cache=False)
+    for i in range(10):
+        assert runtime.get_function("add")(i, 1) == i + 1
+        assert runtime.get_function("double")(i) == i * 2
+
+    assert len(calls) == 1
+
+
+def test_disk_cache_skips_compilation(monkeypatch, tmp_path):
+    monkeypatch.setenv("WASMFUNC_CACHE_DIR", str(tmp_path))
+
+    calls = []
+    compile_file = file_handler.compile_file
+
+    def counting_compile_file(*args, **kwargs):
+        calls.append(args)
+        return compile_file(*args, **kwargs)
+
+    monkeypatch.setattr(file_handler, "compile_file", counting_compile_file)
+
+    # Simulate two separate processes, the second one should load everything from the cache
+    for _ in range(2):
+        runtime = wasmfunc_runtime.WasmRuntime(__file__)
+        assert runtime.get_function("double")(4) == 8
+
+    assert len(calls) == 1
+    assert any(path.suffix == ".cwasm" for path in tmp_path.iterdir())
+
+
+def test_eager_load_in_background():
+    runtime = wasmfunc_runtime.WasmRuntime(__file__, use_cache=False)
+    runtime.load_in_background()
+    # The call waits for the background compilation instead of compiling again
+    assert runtime.get_function("add")(2, 3) == 5
+    runtime._load_thread.join()
+    assert runtime._loaded
+
+
+def test_calls_from_many_threads():
+    runtime = wasmfunc_runtime.WasmRuntime(__file__, use_cache=False)
+    double_wasm = runtime.get_function("double")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(double_wasm, range(1000)))
+
+    assert results == [i * 2 for i in range(1000)]
+
+
+def test_wrappers_are_picklable():
+    assert pickle.loads(pickle.dumps(add)) is add
+    assert pickle.loads(pickle.dumps(double)) is double
+
+
+def test_map_over_process_pool():
+    arguments = [(i, i + 1) for i in range(100)]
+    results = list(add.map(arguments, workers=2, chunksize=16))
+    assert results == [x + y for (x, y) in arguments]
+
+
+@wasmfunc(exec=True)
+def scale(x: f64, factor: f64) -> f64:
+    return x * factor + 1.0
+
+
+def test_vectorize():
+    numpy = pytest.importorskip("numpy")
+
+    values = numpy.arange(1000, dtype=numpy.float64)
+    factors = numpy.full(1000, 0.5)
+    expected = values * factors + 1.0
+
+    assert numpy.array_equal(scale.vectorize(values, factors), expected)
+
+    out = numpy.empty(1000)
+    scale.vectorize(values, factors, out=out)
+    assert numpy.array_equal(out, expected)
+
+    assert numpy.array_equal(add.vectorize([1, 2, 3], [4, 5, 6]), [5, 7, 9])
+
+
+@wasmfunc(exec=True)
+def scale_in_place(values: buf[f64], factor: f64) -> i32:
+    i: i32 = 0
+    while i < len(values):
+        values[i] = values[i] * factor
+        i = i + 1
+    return len(values)
+
+
+@wasmfunc(exec=True)
+def total(values: buf[f64]) -> f64:
+    result: f64 = 0.0
+    i: i32 = 0
+    while i < len(values):
+        result = result + values[i]
+        i = i + 1
+    return result
+
+
+def test_buffer_arguments():
+    numpy = pytest.importorskip("numpy")
+
+    array = numpy.arange(1000, dtype=numpy.float64)
+    assert total(array) == array.sum()
+    assert total(memoryview(array)) == array.sum()
+    assert total([1, 2, 3]) == 6.0
+
+    # Writes to the buffer are copied back into the array
+    assert scale_in_place(array, 2.0) == 1000
+    assert numpy.array_equal(array, numpy.arange(1000) * 2.0)
+
+
+def test_buffer_in_linear_memory_is_not_copied():
+    numpy = pytest.importorskip("numpy")
+
+    array = total.runtime.empty(100, numpy.float64)
+    array[:] = 1.0
+    scale_in_place(array, 3.0)
+    assert numpy.all(array == 3.0)
+    assert total(array) == 300.0
+
+    # Growing the memory doesn't move it, so the array is still a view of linear memory
+    total.runtime.empty(1_000_000, numpy.float64)
+    assert total(numpy.ones(1_000_000)) == 1_000_000.0
+    scale_in_place(array, 2.0)
+    assert numpy.all(array == 6.0)
+    assert total(array) == 600.0
+
+
+def test_gc_arrays_run_in_process():
+    examples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+    runtime = wasmfunc_runtime.WasmRuntime(
+        os.path.join(examples_dir, "gc_lists.py"), enable_gc=True, use_cache=False
+    )
+    assert runtime.get_function("list_lens")(3, 10, 1, 0) == 7
+    # Modules without strings don't need deno
+    assert runtime._gc_runner is None
@@ -0,0 +1,76 @@
+"""test_imports
+
+Guards the import time of wasmfunc. binaryen and wasmtime are slow to load, so they should only be imported when a
+module is compiled or executed, not when wasmfunc or a file of decorated functions is imported.
+"""
+
+import subprocess
+import sys
+import textwrap
+
+HEAVY_MODULES = ["binaryen", "wasmtime"]
+
+# Generous budget for `import wasmfunc`, in practice it is a few milliseconds without the native libraries
+IMPORT_TIME_BUDGET = 0.25
+
+
+def run_python(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        stdout=subprocess.PIPE,
+        check=True,
+    )
+    return result.stdout.decode().strip()
+
+
+def test_import_does_not_load_native_libraries():
+    loaded = run_python(
+        f"""
+        import sys
+        import wasmfunc
+        print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+        """
+    )
+    assert loaded == ""
+
+
+def test_decorating_does_not_load_native_libraries(tmp_path):
+    example = tmp_path / "decorated.py"
+    example.write_text(
+        textwrap.dedent(
+            """
+            from wasmfunc import i32, wasmfunc
+
+            @wasmfunc()
+            def add(x: i32, y: i32) -> i32:
+                return x + y
+
+            @wasmfunc(exec=True)
+            def sub(x: i32, y: i32) -> i32:
+                return x - y
+
+            assert add(1, 2) == 3
+            """
+        )
+    )
+    loaded = run_python(
+        f"""
+        import sys
+        sys.path.insert(0, {str(tmp_path)!r})
+        import decorated
+        print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))
+        """
+    )
+    assert loaded == ""
+
+
+def test_import_time():
+    elapsed = run_python(
+        """
+        import time
+        start = time.perf_counter()
+        import wasmfunc
+        print(time.perf_counter() - start)
+        """
+    )
+    assert float(elapsed) < IMPORT_TIME_BUDGET
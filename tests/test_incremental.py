@@ -0,0 +1,105 @@
+"""test_incremental
+
+Checks that `IncrementalCompiler` only recompiles the functions that changed, and that the result behaves the same as
+compiling the file from scratch.
+"""
+
+import pytest
+
+from wasmfunc.incremental import IncrementalCompiler
+from wasmfunc.runtime import WasmRuntime
+
+HEADER = "from wasmfunc import f64, i32, wasmfunc\n\n"
+
+ADD = """
+@wasmfunc()
+def add(x: i32, y: i32) -> i32:
+    return x + y
+"""
+
+TRIPLE = """
+@wasmfunc()
+def triple(x: i32) -> i32:
+    return add(x, add(x, x))
+"""
+
+HALF = """
+@wasmfunc()
+def half(x: i32) -> i32:
+    return x // 2
+"""
+
+QUARTER = HALF.replace("// 2", "// 4")
+
+
+def compile_source(compiler: IncrementalCompiler, path, source: str):
+    path.write_text(HEADER + source)
+    binary = compiler.compile().emit_binary()
+    return WasmRuntime.from_binary(binary)
+
+
+def test_only_changed_functions_recompile(tmp_path):
+    path = tmp_path / "kernels.py"
+    compiler = IncrementalCompiler(str(path))
+
+    runtime = compile_source(compiler, path, ADD + TRIPLE + HALF)
+    assert sorted(compiler.recompiled) == ["add", "half", "triple"]
+    assert runtime.get_function("triple")(5) == 15
+
+    runtime = compile_source(compiler, path, ADD + TRIPLE + QUARTER)
+    assert compiler.recompiled == ["half"]
+    assert runtime.get_function("half")(20) == 5
+    assert runtime.get_function("triple")(5) == 15
+
+    # Callers are recompiled when the signature of a function they call changes
+    runtime = compile_source(
+        compiler, path, ADD.replace("-> i32", "-> f64") + TRIPLE + QUARTER
+    )
+    assert sorted(compiler.recompiled) == ["add", "triple"]
+    assert runtime.get_function("triple")(5) == 15
+
+    runtime = compile_source(compiler, path, ADD + QUARTER)
+    assert compiler.recompiled == ["add"]
+    assert "triple" not in runtime.signatures
+
+
+def test_failed_compile_rebuilds_module(tmp_path):
+    path = tmp_path / "kernels.py"
+    compiler = IncrementalCompiler(str(path))
+    compile_source(compiler, path, ADD + TRIPLE)
+
+    # add is recompiled before triple fails, leaving the module half updated
+    broken_triple = TRIPLE.replace("add(x, add(x, x))", "add(x, x) << 1.5")
+    with pytest.raises(RuntimeError, match="Bitwise operators"):
+        compile_source(compiler, path, ADD.replace("-> i32", "-> f64") + broken_triple)
+
+    runtime = compile_source(compiler, path, ADD + TRIPLE)
+    assert sorted(compiler.recompiled) == ["add", "triple"]
+    assert runtime.get_function("triple")(5) == 15
+
+
+def test_allocation_follows_recompiled_functions(tmp_path):
+    path = tmp_path / "kernels.py"
+    compiler = IncrementalCompiler(str(path))
+    allocating_half = HALF.replace(
+        "return x // 2",
+        "values: array[i32] = [x, 2]\n    return values[0] // values[1]",
+    )
+
+    path.write_text(HEADER.replace("f64,", "array, f64,") + ADD + allocating_half)
+    signatures = compiler.compile().get_signatures()
+    assert signatures["half"]["allocates"]
+    assert not signatures["add"]["allocates"]
+
+    path.write_text(HEADER.replace("f64,", "array, f64,") + ADD + HALF)
+    assert not compiler.compile().get_signatures()["half"]["allocates"]
+
+
+def test_top_level_changes_rebuild_module(tmp_path):
+    path = tmp_path / "kernels.py"
+    compiler = IncrementalCompiler(str(path))
+
+    compile_source(compiler, path, ADD + HALF)
+    runtime = compile_source(compiler, path, "offset: i32 = 1\n" + ADD + HALF)
+    assert sorted(compiler.recompiled) == ["add", "half"]
+    assert runtime.get_function("add")(1, 2) == 3
@@ -0,0 +1,25 @@
+"""test_literals
+
+Checks that literals take the type of the context they are used in, so no conversion instructions are emitted for them.
+"""
+
+import os
+import re
+
+from wasmfunc.file_handler import compile_file
+
+examples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+
+def test_literals_need_no_conversions(tmp_path):
+    compiler = compile_file(os.path.join(examples_dir, "literals.py"))
+    wat_path = str(tmp_path / "literals.wat")
+    compiler.module.write_text(wat_path)
+    with open(wat_path, "r", encoding="utf-8") as file:
+        text = file.read()
+
+    conversions = re.findall(r"\w+\.(?:convert|promote|demote|extend|wrap)\w*", text)
+    assert conversions == []
+    # 1.25 / 5 is folded into a single f32 constant
+    assert "(f32.const 0.25)" in text
+    assert "(i64.const 5000000000)" in text
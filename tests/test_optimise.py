@@ -0,0 +1,65 @@
+"""test_optimise
+
+Checks that every optimisation level, inlining threshold and explicit pass list produces a module which gives the same
+results as the unoptimised one.
+"""
+
+import os
+
+import pytest
+
+from wasmfunc import cache
+from wasmfunc.file_handler import compile_file
+from wasmfunc.optimise import OPTIMISATION_LEVELS, OptimisationSettings
+from wasmfunc.runtime import WasmRuntime
+
+examples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+
+def run_fib(settings: OptimisationSettings):
+    compiler = compile_file(os.path.join(examples_dir, "fib.py"))
+    settings.apply(compiler.module)
+    assert compiler.module.validate()
+    runtime = WasmRuntime.from_binary(compiler.emit_binary())
+    return [runtime.get_function("fib_loop")(n) for n in range(20)]
+
+
+@pytest.mark.parametrize("level", list(OPTIMISATION_LEVELS))
+def test_levels_keep_results(level):
+    assert run_fib(OptimisationSettings(level)) == run_fib(OptimisationSettings("0"))
+
+
+def test_inlining_and_passes():
+    settings = OptimisationSettings(
+        "3",
+        always_inline_max_size=10,
+        flexible_inline_max_size=200,
+        passes=["precompute", "vacuum"],
+    )
+    assert run_fib(settings) == run_fib(OptimisationSettings("0"))
+    assert run_fib(OptimisationSettings("0", passes=["vacuum"])) == run_fib(
+        OptimisationSettings("0")
+    )
+
+
+def test_from_options():
+    assert OptimisationSettings.from_options(False).level == "0"
+    assert not OptimisationSettings.from_options(False).enabled
+    assert OptimisationSettings.from_options(True) == OptimisationSettings()
+    assert OptimisationSettings.from_options(3).level == "3"
+    assert OptimisationSettings.from_options("Oz").level == "z"
+    with pytest.raises(RuntimeError):
+        OptimisationSettings.from_options(5)
+
+
+def test_settings_change_cache_key():
+    keys = {
+        cache.get_cache_key(b"", optimise=settings)
+        for settings in [
+            OptimisationSettings("2"),
+            OptimisationSettings("3"),
+            OptimisationSettings("3", flexible_inline_max_size=100),
+            OptimisationSettings("3", passes=["vacuum"]),
+        ]
+    }
+    assert len(keys) == 4
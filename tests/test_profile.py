@@ -0,0 +1,97 @@
+"""test_profile
+
+Checks that an instrumented module counts calls and branches, and that compiling with the profile keeps the results of
+every function the same.
+"""
+
+import ast
+import os
+
+import binaryen
+
+from wasmfunc.file_handler import compile_file
+from wasmfunc.profile import Profile, load_workload, profile_file
+from wasmfunc.runtime import WasmRuntime
+
+examples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+fib_path = os.path.join(examples_dir, "fib.py")
+
+CLAMP = """
+from wasmfunc import i32, wasmfunc
+
+
+@wasmfunc()
+def clamp(n: i32) -> i32:
+    if n < 0:
+        return 0
+    else:
+        return n
+"""
+
+
+def get_function_names(compiler):
+    module = compiler.module.ref
+    return [
+        binaryen.ffi.string(
+            binaryen.lib.BinaryenFunctionGetName(
+                binaryen.lib.BinaryenGetFunctionByIndex(module, i)
+            )
+        ).decode()
+        for i in range(binaryen.lib.BinaryenGetNumFunctions(module))
+    ]
+
+
+def test_profile_counts():
+    profile = profile_file(fib_path, {"fib_recursive": [(10,)], "fib_loop": [(1,)]})
+
+    fib_recursive = profile.functions["fib_recursive"]
+    assert fib_recursive["calls"] == 177
+    # n <= 1 is true for the 89 leaves of the call tree, and false for the other 88 calls
+    assert fib_recursive["branches"] == [[89, 88]]
+    fib_loop = profile.functions["fib_loop"]
+    assert fib_loop["calls"] == 1
+    assert fib_loop["branches"] == [[1, 0], [0, 0]]
+
+
+def test_compile_with_profile(tmp_path):
+    profile = profile_file(fib_path, {"fib_loop": [(n,) for n in range(3, 100)]})
+    path = str(tmp_path / "fib.profile.json")
+    profile.save(path)
+    profile = Profile.load(path)
+
+    compiler = compile_file(fib_path, profile=profile)
+    # The hottest function comes first
+    assert get_function_names(compiler)[0] == "fib_loop"
+
+    runtime = WasmRuntime.from_binary(compiler.emit_binary())
+    baseline = WasmRuntime.from_binary(compile_file(fib_path).emit_binary())
+    for name, inputs in load_workload(fib_path).items():
+        for arguments in inputs:
+            assert runtime.get_function(name)(*arguments) == baseline.get_function(
+                name
+            )(*arguments)
+
+
+def test_hot_else_comes_first(tmp_path):
+    path = tmp_path / "clamp.py"
+    path.write_text(CLAMP)
+    profile = profile_file(str(path), {"clamp": [(n,) for n in range(100)]})
+    assert profile.functions["clamp"]["branches"] == [[0, 100]]
+
+    compiler = compile_file(str(path), profile=profile)
+    assert compiler.emit_binary() != compile_file(str(path)).emit_binary()
+    clamp = WasmRuntime.from_binary(compiler.emit_binary()).get_function("clamp")
+    assert [clamp(n) for n in (-5, 0, 5)] == [0, 0, 5]
+
+
+def test_changed_function_ignores_profile():
+    profile = profile_file(fib_path, {"fib_recursive": [(5,)]})
+    with open(fib_path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read())
+    fib_recursive = next(
+        node for node in tree.body if getattr(node, "name", "") == "fib_recursive"
+    )
+    assert profile.get_calls("fib_recursive", "not the hash") is None
+    assert profile.order_functions([fib_recursive]) == [fib_recursive]
+    fib_recursive.body.append(ast.Pass())
+    assert profile.get_cold_functions([fib_recursive]) == []
@@ -14,6 +14,7 @@ E.g. testinputs_add = [(1,2), (5,6), (7,8)] would test the function add(1,2), ad
 WebAssembly outputs match the pure Python ones.
 """
 
+import array
 import importlib
 import importlib.util
 import os
@@ -50,6 +51,9 @@ def test_wasmfunc_file(path: str):
         for variables in function_inputs:
             python_output = python_func(*variables)
             wasm_output = wasm_runner(function_name, variables)
+            if isinstance(wasm_output, array.array):
+                # Arrays are returned in bulk as an array.array
+                wasm_output = wasm_output.tolist()
             print(f"{python_output} == {wasm_output}")
             assert python_output == wasm_output
 
@@ -0,0 +1,64 @@
+"""test_simd
+
+Checks that the SIMD intrinsics compile to Wasm SIMD instructions, and that vector loads and stores stay inside their
+buffer.
+"""
+
+import os
+
+import pytest
+import wasmtime
+
+from wasmfunc.file_handler import compile_file
+from wasmfunc.runtime import WasmRuntime
+
+examples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+
+def test_intrinsics_are_simd_instructions(tmp_path):
+    compiler = compile_file(os.path.join(examples_dir, "simd.py"))
+    wat_path = str(tmp_path / "simd.wat")
+    compiler.module.write_text(wat_path)
+    with open(wat_path, "r", encoding="utf-8") as file:
+        text = file.read()
+
+    for instruction in [
+        "v128.load",
+        "v128.store",
+        "f32x4.splat",
+        "f32x4.mul",
+        "f64x2.mul",
+        "i32x4.replace_lane",
+        "i32x4.max_s",
+        "i8x16.shuffle",
+    ]:
+        assert instruction in text
+
+
+def test_loads_past_the_end_trap(tmp_path):
+    path = tmp_path / "simd_bounds.py"
+    path.write_text(
+        "from wasmfunc import buf, f32, f32x4_load, f32x4_sum, i32, wasmfunc\n"
+        "@wasmfunc()\n"
+        "def sum_at(values: buf[f32], i: i32) -> f32:\n"
+        "    return f32x4_sum(f32x4_load(values, i))\n"
+    )
+    runtime = WasmRuntime.from_binary(compile_file(str(path)).emit_binary())
+    sum_at = runtime.get_function("sum_at")
+
+    assert sum_at([1.0, 2.0, 3.0, 4.0, 5.0], 1) == 14.0
+    for index in [2, -1, 5]:
+        with pytest.raises(wasmtime.Trap):
+            sum_at([1.0, 2.0, 3.0, 4.0, 5.0], index)
+
+
+def test_lanes_must_be_constant(tmp_path):
+    path = tmp_path / "simd_lane.py"
+    path.write_text(
+        "from wasmfunc import f64, f64x2_extract_lane, f64x2_splat, i32, wasmfunc\n"
+        "@wasmfunc()\n"
+        "def lane(x: f64, i: i32) -> f64:\n"
+        "    return f64x2_extract_lane(f64x2_splat(x), i)\n"
+    )
+    with pytest.raises(RuntimeError, match="must be a constant"):
+        compile_file(str(path))
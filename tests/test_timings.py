@@ -0,0 +1,46 @@
+"""test_timings
+
+Checks that `compile_file` records every compilation stage, and every Wasm function, when given a `CompileTimings`.
+"""
+
+import os
+
+from wasmfunc import timings as timings_module
+from wasmfunc.file_handler import compile_file
+from wasmfunc.timings import CompileTimings
+
+examples_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+
+def test_compile_file_records_stages():
+    timings = CompileTimings()
+    compiler = compile_file(os.path.join(examples_dir, "fib.py"), timings=timings)
+    with timings.measure("optimize"):
+        compiler.module.optimize()
+
+    assert [stage.name for stage in timings.stages] == [
+        "ast.parse",
+        "pre_compile",
+        "compile",
+        "auto_drop",
+        "validate",
+        "optimize",
+    ]
+    assert sorted(function.name for function in timings.functions) == [
+        "fib_loop",
+        "fib_recursive",
+    ]
+    compile_stage = timings.stages[2]
+    assert compile_stage.seconds >= sum(f.seconds for f in timings.functions)
+    assert compile_stage.peak_memory >= max(f.peak_memory for f in timings.functions)
+    assert "fib_loop" in timings.report()
+
+
+def test_max_rss_is_optional(monkeypatch):
+    # The resource module doesn't exist on Windows
+    monkeypatch.setattr(timings_module, "resource", None)
+    timings = CompileTimings(trace_memory=False)
+    compile_file(os.path.join(examples_dir, "fib.py"), timings=timings)
+
+    assert all(stage.max_rss is None for stage in timings.stages)
+    assert "fib_loop" in timings.report()
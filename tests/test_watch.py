@@ -0,0 +1,59 @@
+"""test_watch
+
+Checks that the watcher only recompiles files which have changed, and only the functions in them which have changed.
+"""
+
+import os
+
+from wasmfunc.runtime import WasmRuntime
+from wasmfunc.watch import Watcher
+
+SOURCE = """
+from wasmfunc import i32, wasmfunc
+
+
+@wasmfunc()
+def add(a: i32, b: i32) -> i32:
+    return a + b
+
+
+@wasmfunc()
+def scale(a: i32) -> i32:
+    return a * {factor}
+"""
+
+
+def write_source(path, factor: int):
+    path.write_text(SOURCE.format(factor=factor))
+    # Make sure the change is seen even if the file system's timestamps are coarse
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + factor * 1_000_000_000))
+
+
+def test_watch_recompiles_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "module.py"
+    write_source(source, 2)
+
+    watcher = Watcher([str(tmp_path)])
+    messages = watcher.poll()
+    assert len(messages) == 1 and "(add, scale)" in messages[0]
+    assert watcher.poll() == []
+
+    write_source(source, 3)
+    messages = watcher.poll()
+    assert len(messages) == 1 and "(scale)" in messages[0]
+
+    runtime = WasmRuntime.from_binary((tmp_path / "module.wasm").read_bytes())
+    assert runtime.get_function("scale")(5) == 15
+    assert runtime.get_function("add")(1, 2) == 3
+    assert (tmp_path / "module.wat").exists()
+
+
+def test_watch_reports_errors(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "broken.py"
+    source.write_text("def broken(:\n")
+
+    messages = Watcher([str(source)]).poll()
+    assert len(messages) == 1 and messages[0].startswith("Error compiling")
@@ -1,2 +1,3 @@
 from .decorators import *
+from .simd import *
 from .types import *
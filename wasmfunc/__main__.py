@@ -1,25 +1,71 @@
 import argparse
 import sys
-
-from wasmtime import Instance, Module, Store
+from concurrent.futures import ProcessPoolExecutor
 
 from .file_handler import (
     compile_file,
     execute_wasm_binary_with_deno,
+    find_source_files,
     generate_output_name,
 )
+from .optimise import DEFAULT_LEVEL, OPTIMISATION_LEVELS, OptimisationSettings
+from .profile import Profile, generate_profile_path, load_workload, profile_file
+from .timings import CompileTimings, measure
+from .watch import Watcher
 
 
-def main():
+def compile_to_files(
+    file: str,
+    enable_gc=False,
+    enable_str=False,
+    optimise: OptimisationSettings | None = None,
+    timings=False,
+    profile_path: str | None = None,
+) -> tuple[list[str], str | None]:
+    """Compile a file and write its `.wasm` and `.wat` outputs. Runs in a worker process when compiling many files, so
+    instead of printing it returns the messages to report and the error if compilation failed.
+    """
+    messages = [f"Compiling {file}..."]
+    compile_timings = CompileTimings() if timings else None
+    try:
+        profile = Profile.load(profile_path) if profile_path is not None else None
+        compiler = compile_file(
+            file,
+            enable_gc=enable_gc,
+            enable_str=enable_str,
+            timings=compile_timings,
+            profile=profile,
+        )
 
-    parser = argparse.ArgumentParser(description="A WebAssembly compiler for Python")
-    subparsers = parser.add_subparsers(dest="command", help="Command to execute")
+        if optimise is None:
+            optimise = OptimisationSettings()
+        if optimise.enabled:
+            with measure(compile_timings, "optimize"):
+                optimise.apply(compiler.module)
 
-    compile_parser = subparsers.add_parser("compile", help="Compile a file")
-    compile_parser.add_argument(
-        "file", metavar="FILE", type=str, help="File to compile"
-    )
-    compile_parser.add_argument(
+        if not compiler.module.get_num_functions() > 0:
+            messages.append("No Wasm functions found")
+
+        else:
+            filename = generate_output_name(file)
+            with measure(compile_timings, "write_binary"):
+                with open(filename, "wb") as output:
+                    output.write(compiler.emit_binary())
+            messages.append(f"Written {filename}")
+            wat_filename = generate_output_name(file, False)
+            with measure(compile_timings, "write_text"):
+                compiler.module.write_text(wat_filename)
+            messages.append(f"Written {wat_filename}")
+    except Exception as error:
+        return messages, f"{type(error).__name__}: {error}"
+    if compile_timings is not None:
+        messages.append(compile_timings.report())
+    return messages, None
+
+
+def add_build_arguments(parser: argparse.ArgumentParser):
+    """Add the options shared by the compile and watch commands"""
+    parser.add_argument(
         "-gc",
         "--enable-gc",
         dest="wasmgc",
@@ -27,7 +73,7 @@ def main():
         action="store_true",
         help="Enable experimental garbage collection with WasmGC (default: False)",
     )
-    compile_parser.add_argument(
+    parser.add_argument(
         "-s",
         "--enable-strings",
         dest="strings",
@@ -35,13 +81,138 @@ def main():
         action="store_true",
         help="Enable experimental string support with WasmGC (default: False)",
     )
-    compile_parser.add_argument(
+    parser.add_argument(
+        "-O",
+        dest="level",
+        choices=list(OPTIMISATION_LEVELS),
+        default=DEFAULT_LEVEL,
+        help=f"Optimisation level, -O0 to -O4 optimise for speed, -Os and -Oz for size (default: -O{DEFAULT_LEVEL})",
+    )
+    parser.add_argument(
         "-no",
         "--no-optimisations",
-        dest="optimise",
-        default=True,
-        action="store_false",
-        help="Disable optimizations (default: True)",
+        dest="level",
+        action="store_const",
+        const="0",
+        help="Disable optimizations, the same as -O0",
+    )
+    parser.add_argument(
+        "--always-inline-max-size",
+        dest="always_inline_max_size",
+        type=int,
+        default=None,
+        help="Always inline functions of at most this size (default: binaryen's default)",
+    )
+    parser.add_argument(
+        "--flexible-inline-max-size",
+        dest="flexible_inline_max_size",
+        type=int,
+        default=None,
+        help="Inline functions of at most this size when it looks worthwhile (default: binaryen's default)",
+    )
+    parser.add_argument(
+        "--passes",
+        dest="passes",
+        type=lambda value: [name for name in value.split(",") if name],
+        default=[],
+        help="Comma separated binaryen passes to run after the optimisation level's pipeline, e.g. precompute,vacuum",
+    )
+
+
+def get_optimisation_settings(args: argparse.Namespace) -> OptimisationSettings:
+    return OptimisationSettings(
+        args.level,
+        args.always_inline_max_size,
+        args.flexible_inline_max_size,
+        args.passes,
+    )
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="A WebAssembly compiler for Python")
+    subparsers = parser.add_subparsers(dest="command", help="Command to execute")
+
+    compile_parser = subparsers.add_parser("compile", help="Compile a file")
+    compile_parser.add_argument(
+        "files",
+        metavar="FILE",
+        type=str,
+        nargs="+",
+        help="Files to compile, directories are searched for python files",
+    )
+    compile_parser.add_argument(
+        "--timings",
+        dest="timings",
+        default=False,
+        action="store_true",
+        help="Report the time and memory used by each compilation stage (default: False)",
+    )
+    compile_parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=None,
+        help="Number of files to compile in parallel (default: number of CPUs)",
+    )
+    add_build_arguments(compile_parser)
+    compile_parser.add_argument(
+        "--profile",
+        dest="profile",
+        type=str,
+        default=None,
+        help="Optimise using a profile written by the profile command",
+    )
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="Recompile files whenever they change"
+    )
+    watch_parser.add_argument(
+        "files",
+        metavar="FILE",
+        type=str,
+        nargs="+",
+        help="Files to watch, directories are searched for python files",
+    )
+    watch_parser.add_argument(
+        "--interval",
+        dest="interval",
+        type=float,
+        default=0.2,
+        help="Seconds between checks for changed files (default: 0.2)",
+    )
+    add_build_arguments(watch_parser)
+
+    profile_parser = subparsers.add_parser(
+        "profile", help="Run a workload and record a profile to optimise with"
+    )
+    profile_parser.add_argument(
+        "file", metavar="FILE", type=str, help="File to profile"
+    )
+    profile_parser.add_argument(
+        "-w",
+        "--workload",
+        dest="workload",
+        type=str,
+        default=None,
+        help="Python file whose testinputs_<function> lists are the calls to run (default: FILE)",
+    )
+    profile_parser.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        type=str,
+        default=None,
+        help="Where to write the profile (default: FILE with the extension .profile.json)",
+    )
+    profile_parser.add_argument(
+        "-gc",
+        "--enable-gc",
+        dest="wasmgc",
+        default=False,
+        action="store_true",
+        help="Enable experimental garbage collection with WasmGC (default: False)",
     )
 
     exec_parser = subparsers.add_parser("exec", help="Execute a file")
@@ -60,29 +231,68 @@ def main():
     args = parser.parse_args()
 
     if args.command == "compile":
-        file = args.file
-        print(f"Compiling {file}...")
-        compiler = compile_file(file, enable_gc=args.wasmgc, enable_str=args.strings)
+        files = find_source_files(args.files)
+        if len(files) == 0:
+            parser.error("no python files found")
+        output_names = [generate_output_name(file) for file in files]
+        for name in set(output_names):
+            if output_names.count(name) > 1:
+                parser.error(f"more than one input file would be written to {name}")
 
-        if args.optimise:
-            compiler.module.optimize()
+        optimise = get_optimisation_settings(args)
+        arguments = [
+            (args.wasmgc, args.strings, optimise, args.timings, args.profile)
+        ] * len(files)
+        if len(files) == 1 or args.jobs == 1:
+            results = map(compile_to_files, files, *zip(*arguments))
+            executor = None
+        else:
+            # Compile each file in its own process, binaryen holds the GIL so threads would run one at a time
+            executor = ProcessPoolExecutor(max_workers=args.jobs)
+            results = executor.map(compile_to_files, files, *zip(*arguments))
 
-        if not compiler.module.get_num_functions() > 0:
-            print("No Wasm functions found")
+        failed = []
+        for file, (messages, error) in zip(files, results):
+            for message in messages:
+                print(message)
+            if error is not None:
+                print(f"Error compiling {file}: {error}", file=sys.stderr)
+                failed.append(file)
 
-        else:
-            filename = generate_output_name(file)
-            compiler.module.write_binary(filename)
-            print(f"Written {filename}")
-            wat_filename = generate_output_name(file, False)
-            compiler.module.write_text(wat_filename)
-            print(f"Written {wat_filename}")
+        if executor is not None:
+            executor.shutdown()
+        if failed:
+            print(f"{len(failed)} of {len(files)} files failed to compile")
+            sys.exit(1)
+    elif args.command == "watch":
+        watcher = Watcher(
+            args.files,
+            enable_gc=args.wasmgc,
+            enable_str=args.strings,
+            optimise=get_optimisation_settings(args),
+        )
+        watcher.run(args.interval)
+    elif args.command == "profile":
+        workload = load_workload(args.workload) if args.workload is not None else None
+        output = args.output or generate_profile_path(args.file)
+        try:
+            profile = profile_file(args.file, workload, enable_gc=args.wasmgc)
+        except Exception as error:
+            print(
+                f"Error profiling {args.file}: {type(error).__name__}: {error}",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+        profile.save(output)
+        print(f"Written {output}")
     elif args.command == "exec":
         if args.wasmgc:
             print(
                 execute_wasm_binary_with_deno(args.file, args.function, args.arguments)
             )
         else:
+            from wasmtime import Instance, Module, Store
+
             arguments = list(map(float, args.arguments))
             store = Store()
             module = Module.from_file(store.engine, args.file)
@@ -0,0 +1,120 @@
+"""Content addressed disk cache for compiled Wasm modules.
+
+Each entry is stored under a key that hashes everything that can change the output: the python source, the compiler
+flags, the optimisation settings and profile, the binaryen and wasmtime versions and the source code of wasmfunc itself.
+An entry contains the binaryen output (`<key>.wasm`) and, for modules executed with wasmtime, the serialized native
+code (`<key>.cwasm`), so a cache hit skips both the python to Wasm compiler and Cranelift.
+
+The cache lives in `$WASMFUNC_CACHE_DIR`, or `$XDG_CACHE_HOME/wasmfunc` (`~/.cache/wasmfunc`) if that is not set.
+"""
+
+import hashlib
+import os
+import tempfile
+from functools import cache
+from glob import glob
+from importlib import metadata
+from pathlib import Path
+
+from wasmtime import Engine, Module, WasmtimeError
+
+CACHE_FORMAT_VERSION = "1"
+
+
+def get_cache_dir() -> str:
+    if "WASMFUNC_CACHE_DIR" in os.environ:
+        return os.environ["WASMFUNC_CACHE_DIR"]
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(cache_home, "wasmfunc")
+
+
+@cache
+def _get_package_version(package: str) -> str:
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+@cache
+def _get_compiler_hash() -> str:
+    """Hash the source of wasmfunc, so that changes to the compiler invalidate old entries"""
+    digest = hashlib.sha256()
+    for path in sorted(glob(str(Path(__file__).parent.joinpath("*.py")))):
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def get_cache_key(
+    source: bytes,
+    enable_gc=False,
+    enable_str=False,
+    optimise=False,
+    profile: bytes | None = None,
+) -> str:
+    digest = hashlib.sha256()
+    parts = [
+        CACHE_FORMAT_VERSION,
+        _get_compiler_hash(),
+        _get_package_version("binaryen.py"),
+        _get_package_version("wasmtime"),
+        f"gc={enable_gc}",
+        f"str={enable_str}",
+        f"optimise={optimise}",
+    ]
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(source)
+    if profile is not None:
+        digest.update(b"\0profile\0")
+        digest.update(profile)
+    return digest.hexdigest()
+
+
+def _get_entry_path(key: str, extension: str) -> str:
+    return os.path.join(get_cache_dir(), key + extension)
+
+
+def _write_atomic(path: str, data: bytes):
+    # Write to a temporary file first, so a concurrent reader never sees a half written entry
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def load_binary(key: str) -> bytes | None:
+    """Load a cached Wasm binary, returns None on a cache miss"""
+    try:
+        with open(_get_entry_path(key, ".wasm"), "rb") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def store_binary(key: str, binary: bytes):
+    _write_atomic(_get_entry_path(key, ".wasm"), binary)
+
+
+def load_module(key: str, engine: Engine) -> Module | None:
+    """Load cached native code compiled by wasmtime, returns None on a cache miss or if the entry can't be used by this engine"""
+    path = _get_entry_path(key, ".cwasm")
+    if not os.path.exists(path):
+        return None
+    try:
+        return Module.deserialize_file(engine, path)
+    except WasmtimeError:
+        # The entry was created by an incompatible engine configuration, ignore it and let it be overwritten
+        return None
+
+
+def store_module(key: str, module: Module):
+    _write_atomic(_get_entry_path(key, ".cwasm"), module.serialize())
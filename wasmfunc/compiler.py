@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 import ast
+import json
+import struct
 from ast import (
     AST,
     Add,
@@ -22,6 +24,7 @@ from ast import (
     Eq,
     Expr,
     FloorDiv,
+    For,
     FunctionDef,
     Global,
     Gt,
@@ -61,17 +64,23 @@ from ast import (
     UnaryOp,
     USub,
     While,
+    stmt,
 )
 
 import binaryen
 
-from . import mini_std
+from . import mini_math, mini_std
 from .pre_compiler import (
+    BufferType,
+    add_parent_links,
     does_contain_wasm,
     get_binaryen_type,
+    get_type_name,
     handle_Import,
     handle_ImportFrom,
+    iter_module_statements,
 )
+from .profile import Profile, get_counter_name, get_function_hash, mark_cold_functions
 
 type BinaryenType = binaryen.internals.BinaryenType
 Int32 = binaryen.type.Int32
@@ -79,6 +88,58 @@ Int64 = binaryen.type.Int64
 Float32 = binaryen.type.Float32
 Float64 = binaryen.type.Float64
 
+NUMBER_TYPES = [Int32, Int64, Float32, Float64]
+
+# Linear memory, exported so the host can read and write it directly
+MEMORY_NAME = b"memory"
+MAX_MEMORY_PAGES = 65536
+
+# Exported global holding the next free address in linear memory. The host allocates space for buffers by bumping it.
+HEAP_POINTER_NAME = b"__heap_pointer"
+# Keep address 0 free, so it can never be a valid pointer
+HEAP_BASE = 8
+
+# Custom section describing the signatures of the exported functions, so the host knows how to pass arguments
+SIGNATURE_SECTION_NAME = "wasmfunc.signatures"
+
+# Prefix of the exported functions which loop a scalar function over arrays in linear memory
+VECTORIZE_PREFIX = "__vectorize_"
+
+# Prefix of the exported functions which copy an array returned by a function into linear memory
+RESULT_PREFIX = "__result_"
+
+# Prefix of the helper functions which raise a number to a power that is only known at run time
+POW_PREFIX = "__pow_"
+
+# Without WasmGC, arrays live in linear memory. An array is a pointer to its length (an i32), followed by its elements
+# at ARRAY_HEADER_SIZE bytes from the pointer, so elements of 8 byte types stay aligned.
+ARRAY_HEADER_SIZE = 8
+# Helper function which allocates memory for arrays by bumping the heap pointer, the same way the host allocates buffers
+ALLOC_NAME = b"__alloc"
+
+
+def get_type_size(binaryen_type: BinaryenType) -> int:
+    """Size in bytes of a numeric type in linear memory"""
+    match binaryen_type:
+        case binaryen.type.Int32 | binaryen.type.Float32:
+            return 4
+        case binaryen.type.Int64 | binaryen.type.Float64:
+            return 8
+        case _:
+            raise RuntimeError("Only numeric types can be stored in linear memory")
+
+
+def _encode_uleb128(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
 
 class Compiler(NodeVisitor):
     def __init__(
@@ -88,11 +149,20 @@ class Compiler(NodeVisitor):
         function_return: dict[str, BinaryenType],
         enable_gc=False,
         enable_str=False,
+        vectorize=False,
+        statements: list[stmt] | None = None,
+        instrument=False,
+        profile: Profile | None = None,
     ) -> None:
         self.filename = filename
+        # The statements collected by the PreCompiler, to avoid searching the module again
+        self.statements = statements
         self.module = binaryen.Module()
         self.module_aliases = []
         self.object_aliases = {}
+        # Names python's math module and the functions imported from it are used under, see mini_math.py
+        self.math_aliases: list[str] = []
+        self.math_functions: dict[str, str] = {}
 
         self.func_ref: binaryen.FunctionRef | None = None
         self.function_arguments = function_arguments
@@ -100,11 +170,40 @@ class Compiler(NodeVisitor):
 
         self.variable_types: dict[str, BinaryenType] = {}
         self.variable_indexes: dict[str, int] = {}
+        # buf[T] arguments, the index is of the pointer local, the length is in the next local
+        self.buffers: dict[str, tuple[BufferType, int]] = {}
+        # Buffers which are stored to, or passed to another function, in the current function
+        self.written_buffers: set[str] = set()
+        # Indexes of the buffer arguments each function may write to, the host only copies these back
+        self.buffer_writes: dict[str, list[int]] = {}
+        # Locals holding arrays in linear memory when WasmGC is disabled, with the type of their elements
+        self.memory_arrays: dict[str, BinaryenType] = {}
+        # Functions which allocate linear memory themselves, and the Wasm functions each function calls. A function
+        # which allocates or calls one that does has its memory freed by the host after each call.
+        self.allocating_functions: set[str] = set()
+        self.function_calls: dict[str, set[str]] = {}
+        # Wasm functions called by the current function
+        self.called_functions: set[str] = set()
 
         self.all_globals: dict[str, tuple[BinaryenType, AST]] = {}
         self.scoped_globals: dict[str, BinaryenType] = {}
 
         self.while_stack = [0]
+        # Labels to branch to on continue, for loops which must do more than re-test their condition (e.g. for loops)
+        self.continue_labels: dict[int, bytes] = {}
+
+        self.compiled_functions: list[str] = []
+        self.has_memory = False
+        self.vectorize = vectorize
+
+        # Profile guided optimisation, see profile.py. When instrumenting, every counter global is recorded as
+        # (function, function hash, "calls" | "then" | "else", index of the if statement in the function)
+        self.instrument = instrument
+        self.profile = profile
+        self.profile_counters: list[tuple[str, str, str, int]] = []
+        self.function_node: FunctionDef | None = None
+        self.function_hash: str | None = None
+        self.branch_index = 0
 
         if enable_gc:
             print("Warning: using WasmGC, this is experimental")
@@ -121,8 +220,13 @@ class Compiler(NodeVisitor):
             enable_gc = True
             print("Warning: using Strings, this is experimental")
 
+        # SIMD is part of Wasm 2.0, so it is always enabled for the f32x4, f64x2 and i32x4 intrinsics
+        self.module.set_feature(self.module.get_features() | binaryen.Feature.SIMD128)
+
         self.gc = enable_gc
         self.str = enable_str
+        # Set to a CompileTimings to record how long each function takes to compile
+        self.timings = None
         super().__init__()
 
     def _create_local(self, name: str, var_type: BinaryenType) -> int:
@@ -134,11 +238,75 @@ class Compiler(NodeVisitor):
         self.func_ref.set_local_name(index, name.encode("ascii"))
         return index
 
+    def _get_literal_value(self, expression: binaryen.Expression) -> int | float | None:
+        """Get the value of a numeric constant expression, or None if the expression is not a constant"""
+        if expression.get_id() != binaryen.lib.BinaryenConstId():
+            return None
+        match expression.get_type():
+            case binaryen.type.Int32:
+                return binaryen.lib.BinaryenConstGetValueI32(expression.ref)
+            case binaryen.type.Int64:
+                return binaryen.lib.BinaryenConstGetValueI64(expression.ref)
+            case binaryen.type.Float32:
+                return binaryen.lib.BinaryenConstGetValueF32(expression.ref)
+            case binaryen.type.Float64:
+                return binaryen.lib.BinaryenConstGetValueF64(expression.ref)
+        return None
+
+    def _make_literal(
+        self, value: int | float, literal_type: BinaryenType
+    ) -> binaryen.Expression | None:
+        """Create a constant of literal_type, or return None if value can't be represented in that type. Floats are never
+        made into integers, and integers only become floats if they convert exactly."""
+        match literal_type:
+            case binaryen.type.Int32 if isinstance(value, int):
+                if -(2**31) <= value < 2**31:
+                    return self.module.i32(value)
+            case binaryen.type.Int64 if isinstance(value, int):
+                if -(2**63) <= value < 2**63:
+                    return self.module.i64(value)
+            case binaryen.type.Float32:
+                try:
+                    rounded = struct.unpack("f", struct.pack("f", value))[0]
+                except OverflowError:
+                    return None
+                # Float literals take the precision of their context, integers must be exact
+                if isinstance(value, float) or rounded == value:
+                    return self.module.f32(rounded)
+            case binaryen.type.Float64:
+                if isinstance(value, float) or float(value) == value:
+                    return self.module.f64(float(value))
+        return None
+
+    def _retype_literal(
+        self, expression: binaryen.Expression, literal_type: BinaryenType
+    ) -> binaryen.Expression | None:
+        """Give a constant the type its context needs, so no conversion instruction is emitted for it"""
+        value = self._get_literal_value(expression)
+        if value is None:
+            return None
+        if expression.get_type() in [Float32, Float64]:
+            value = float(value)
+        return self._make_literal(value, literal_type)
+
     def _cast_numeric_to_matching(
         self, left: binaryen.Expression, right: binaryen.Expression, lineno: int
     ):
         left_type = left.get_type()
         right_type = right.get_type()
+
+        # A literal takes the type of the other operand if it can, rather than converting that operand at run time
+        if left_type != right_type:
+            left_literal = self._get_literal_value(left) is not None
+            right_literal = self._get_literal_value(right) is not None
+            if right_literal and not left_literal:
+                retyped = self._retype_literal(right, left_type)
+                if retyped is not None:
+                    return (left, retyped)
+            if left_literal and not right_literal:
+                retyped = self._retype_literal(left, right_type)
+                if retyped is not None:
+                    return (retyped, right)
         input_types = [left_type, right_type]
 
         number_types = [Int32, Int64, Float32, Float64]
@@ -162,13 +330,9 @@ class Compiler(NodeVisitor):
             target_type = Int64 if large else Int32
 
         if left_type != target_type:
-            operation = self._get_numeric_conversion_op(left, target_type, lineno)
-            if operation is not None:
-                left = self.module.unary(operation, left)
+            left = self._cast_numeric_to_type(left, target_type, lineno)
         if right_type != target_type:
-            operation = self._get_numeric_conversion_op(right, target_type, lineno)
-            if operation is not None:
-                right = self.module.unary(operation, right)
+            right = self._cast_numeric_to_type(right, target_type, lineno)
 
         return (left, right)
 
@@ -236,6 +400,12 @@ class Compiler(NodeVisitor):
                         raise RuntimeError(
                             f"Can't convert from float64 to required type on line {lineno}"
                         )
+            case binaryen.type.Vec128:
+                if convert_to == binaryen.type.Vec128:
+                    return None
+                raise RuntimeError(
+                    f"SIMD vectors can only be converted with intrinsics, on line {lineno}"
+                )
             case _:
                 raise RuntimeError(
                     f"Unsupported type target in numeric conversion on line {lineno}"
@@ -247,10 +417,18 @@ class Compiler(NodeVisitor):
         convert_to: BinaryenType,
         lineno: int,
     ):
-        if not binaryen.type.heap_type.is_basic(convert_to):  # type: ignore
+        if self._is_memory_array(convert_to):
+            # Arrays in linear memory are pointers
+            convert_to = Int32
+        elif not binaryen.type.heap_type.is_basic(convert_to):  # type: ignore
             print("Warning cannot cast heap types")
             return target
 
+        if target.get_type() != convert_to:
+            retyped = self._retype_literal(target, convert_to)
+            if retyped is not None:
+                return retyped
+
         op = self._get_numeric_conversion_op(target, convert_to, lineno)
         if op is None:
             return target
@@ -259,6 +437,28 @@ class Compiler(NodeVisitor):
         # )
         return self.module.unary(op, target)
 
+    def _is_memory_array(self, binaryen_type: "BinaryenType | BufferType") -> bool:
+        """Check if a type is an array annotation, which is an array in linear memory as WasmGC is disabled"""
+        return (
+            not self.gc
+            and not isinstance(binaryen_type, BufferType)
+            and not binaryen.type.heap_type.is_basic(binaryen_type)
+            and binaryen.type.heap_type.is_array(binaryen_type)
+        )
+
+    def _get_value_type(self, binaryen_type: BinaryenType) -> BinaryenType:
+        """Array annotations are converted to heap types, values of those types are nullable references to them, or
+        pointers to arrays in linear memory when WasmGC is disabled"""
+        if self._is_memory_array(binaryen_type):
+            return Int32
+        if (
+            not binaryen.type.heap_type.is_basic(binaryen_type)
+            and not self.str
+            and self.gc
+        ):
+            return binaryen.type.from_heap_type(binaryen_type, True)
+        return binaryen_type
+
     def _set_var(
         self,
         name: str,
@@ -300,26 +500,409 @@ class Compiler(NodeVisitor):
         if type_annotation is None:
             type_annotation = value.get_type()
 
-        if (
-            not binaryen.type.heap_type.is_basic(type_annotation)
-            and not self.str
-            and self.gc
-        ):
-            type_annotation = binaryen.type.from_heap_type(type_annotation, True)
+        if self._is_memory_array(type_annotation):
+            self.memory_arrays[name] = binaryen.type.array_type.get_element_type(
+                type_annotation
+            )
+        type_annotation = self._get_value_type(type_annotation)
 
         local_id = self._create_local(name, type_annotation)
         return self.module.local_set(local_id, value)
 
     def visit_Module(self, node: Module):
-        # Add a parent attribute to all nodes
-        for n in ast.walk(node):
-            for child in ast.iter_child_nodes(n):
-                child.parent = n
+        # Only visit the statements that can declare Wasm, rather than every node in the file
+        statements = self.statements
+        if statements is None:
+            statements = iter_module_statements(node.body)
+        functions = []
+        if self.profile is not None:
+            # Compile the functions last, from the most to the least called, so hot functions are next to each other
+            statements = list(statements)
+            functions = [s for s in statements if isinstance(s, FunctionDef)]
+            statements = [
+                s for s in statements if not isinstance(s, FunctionDef)
+            ] + self.profile.order_functions(functions)
+        for statement in statements:
+            self.visit(statement)
+
+        for name in self.compiled_functions:
+            self.add_wrapper_functions(name)
+
+        if self.profile is not None:
+            mark_cold_functions(self.module, self.profile.get_cold_functions(functions))
+
+    def add_wrapper_functions(self, name: str):
+        """Add the exported helpers the host uses to call a compiled function in bulk"""
+        if self.vectorize:
+            self._add_vectorized_function(name)
+        if self.gc:
+            self._add_array_result_function(name)
+
+    def remove_function(self, name: str):
+        """Remove a compiled function, its export and its wrapper functions from the module"""
+        for function_name in [name, VECTORIZE_PREFIX + name, RESULT_PREFIX + name]:
+            ascii_name = function_name.encode("ascii")
+            if binaryen.lib.BinaryenGetFunction(self.module.ref, ascii_name):
+                binaryen.lib.BinaryenRemoveExport(self.module.ref, ascii_name)
+                self.module.remove_function(ascii_name)
+        if name in self.compiled_functions:
+            self.compiled_functions.remove(name)
+        self.buffer_writes.pop(name, None)
+        self.function_calls.pop(name, None)
+        self.allocating_functions.discard(name)
+
+    def _allocates(self, name: str) -> bool:
+        """Check if a function allocates linear memory, itself or in any function it calls"""
+        seen = set()
+        pending = [name]
+        while pending:
+            function = pending.pop()
+            if function in self.allocating_functions:
+                return True
+            seen.add(function)
+            pending.extend(self.function_calls.get(function, set()) - seen)
+        return False
+
+    def get_signatures(self) -> dict[str, dict]:
+        signatures = {}
+        for name in self.compiled_functions:
+            signatures[name] = {
+                "params": list(map(get_type_name, self.function_arguments[name])),
+                "result": get_type_name(self.function_returns[name]),
+                "writes": self.buffer_writes.get(name, []),
+                "allocates": self._allocates(name),
+            }
+        return signatures
+
+    def emit_binary(self) -> bytes:
+        """Emit the module as a Wasm binary, followed by a custom section describing the signatures of the exported functions.
+        The section is added here rather than to the module, as binaryen can't remove or replace a custom section when
+        functions are recompiled."""
+        contents = json.dumps(self.get_signatures()).encode("utf-8")
+        name = SIGNATURE_SECTION_NAME.encode("utf-8")
+        section = _encode_uleb128(len(name)) + name + contents
+        return (
+            self.module.emit_binary() + b"\0" + _encode_uleb128(len(section)) + section
+        )
 
-        super().generic_visit(node)
+    def _ensure_memory(self):
+        if self.has_memory:
+            return
+        self.module.set_memory(
+            1,
+            MAX_MEMORY_PAGES,
+            MEMORY_NAME,
+            [],
+            [],
+            [],
+            [],
+            [],
+            False,
+            False,
+            MEMORY_NAME,
+        )
+        # The host moves the heap pointer, so it is exported as a mutable global
+        self.module.set_feature(
+            self.module.get_features() | binaryen.Feature.MutableGlobals
+        )
+        self.module.add_global(
+            HEAP_POINTER_NAME, Int32, True, self.module.i32(HEAP_BASE)
+        )
+        binaryen.lib.BinaryenAddGlobalExport(
+            self.module.ref, HEAP_POINTER_NAME, HEAP_POINTER_NAME
+        )
+        self.has_memory = True
+
+    def _add_counter(self, kind: str, branch=0):
+        """Add an exported i64 global which counts how often the current function, or an arm of one of its if
+        statements, runs. Returns the expression that increments it."""
+        name = get_counter_name(len(self.profile_counters))
+        self.profile_counters.append(
+            (self.function_node.name, self.function_hash, kind, branch)
+        )
+        self.module.set_feature(
+            self.module.get_features() | binaryen.Feature.MutableGlobals
+        )
+        self.module.add_global(name, Int64, True, self.module.i64(0))
+        binaryen.lib.BinaryenAddGlobalExport(self.module.ref, name, name)
+        return self.module.global_set(
+            name,
+            self.module.binary(
+                binaryen.operations.AddInt64(),
+                self.module.global_get(name, Int64),
+                self.module.i64(1),
+            ),
+        )
+
+    def _add_vectorized_function(self, name: str):
+        """Export `__vectorize_<name>(in_ptr_0, ..., in_ptr_n, out_ptr, count)`, which calls a scalar function on every
+        element of arrays in linear memory and writes the results to out_ptr. This lets the host run a function over a
+        whole array with a single call."""
+        argument_types = self.function_arguments[name]
+        return_type = self.function_returns[name]
+
+        if len(argument_types) == 0:
+            return
+        if any(arg_type not in NUMBER_TYPES for arg_type in argument_types):
+            return
+        if return_type not in NUMBER_TYPES:
+            return
+
+        self._ensure_memory()
+        mod = self.module
+
+        num_args = len(argument_types)
+        out_index = num_args
+        count_index = num_args + 1
+        i_index = num_args + 2
+
+        def get_i32(index: int):
+            return mod.local_get(index, Int32)
+
+        def element_pointer(pointer_index: int, element_type: BinaryenType):
+            offset = mod.binary(
+                binaryen.operations.MulInt32(),
+                get_i32(i_index),
+                mod.i32(get_type_size(element_type)),
+            )
+            return mod.binary(
+                binaryen.operations.AddInt32(), get_i32(pointer_index), offset
+            )
+
+        arguments = []
+        for arg_index, arg_type in enumerate(argument_types):
+            size = get_type_size(arg_type)
+            arguments.append(
+                mod.load(
+                    size,
+                    True,
+                    0,
+                    size,
+                    arg_type,
+                    element_pointer(arg_index, arg_type),
+                    MEMORY_NAME,
+                )
+            )
+
+        return_size = get_type_size(return_type)
+        store_result = mod.store(
+            return_size,
+            0,
+            return_size,
+            element_pointer(out_index, return_type),
+            mod.call(name.encode("ascii"), arguments, return_type),
+            return_type,
+            MEMORY_NAME,
+        )
+
+        loop_name = f"{VECTORIZE_PREFIX}loop".encode("ascii")
+        exit_name = f"{VECTORIZE_PREFIX}exit".encode("ascii")
+        loop = mod.loop(
+            loop_name,
+            mod.block(
+                None,
+                [
+                    mod.Break(
+                        exit_name,
+                        mod.binary(
+                            binaryen.operations.GeSInt32(),
+                            get_i32(i_index),
+                            get_i32(count_index),
+                        ),
+                        None,
+                    ),
+                    store_result,
+                    mod.local_set(
+                        i_index,
+                        mod.binary(
+                            binaryen.operations.AddInt32(), get_i32(i_index), mod.i32(1)
+                        ),
+                    ),
+                    mod.Break(loop_name, None, None),
+                ],
+                binaryen.type.TypeNone,
+            ),
+        )
+        body = mod.block(
+            exit_name,
+            [mod.local_set(i_index, mod.i32(0)), loop],
+            binaryen.type.TypeNone,
+        )
+
+        vectorized_name = f"{VECTORIZE_PREFIX}{name}".encode("ascii")
+        mod.add_function(
+            vectorized_name,
+            binaryen.type.create([Int32] * (num_args + 2)),
+            binaryen.type.TypeNone,
+            [Int32],
+            body,
+        )
+        mod.add_function_export(vectorized_name, vectorized_name)
+
+    def _add_array_result_function(self, name: str):
+        """Export `__result_<name>(args..., out_ptr) -> length` for functions which return an array of numbers. It
+        calls the function and copies the elements of the returned array to out_ptr, growing memory if needed, so the
+        host can read the whole array with a single copy."""
+        return_type = self.function_returns[name]
+        if binaryen.type.heap_type.is_basic(return_type):
+            return
+        if not binaryen.type.heap_type.is_array(return_type):
+            return
+        element_type = binaryen.type.array_type.get_element_type(return_type)
+        if element_type not in NUMBER_TYPES:
+            return
+
+        self._ensure_memory()
+        mod = self.module
+
+        parameter_types = []
+        for arg_type in self.function_arguments[name]:
+            if isinstance(arg_type, BufferType):
+                parameter_types.extend([Int32, Int32])
+            else:
+                parameter_types.append(self._get_value_type(arg_type))
+        num_args = len(parameter_types)
+        out_index = num_args
+        array_index = num_args + 1
+        length_index = num_args + 2
+        i_index = num_args + 3
+        pages_index = num_args + 4
+        array_type = self._get_value_type(return_type)
+        size = get_type_size(element_type)
+
+        def get_i32(index: int):
+            return mod.local_get(index, Int32)
+
+        def memory_size():
+            return binaryen.Expression(
+                binaryen.lib.BinaryenMemorySize(mod.ref, MEMORY_NAME, False)
+            )
+
+        arguments = [
+            mod.local_get(index, arg_type)
+            for index, arg_type in enumerate(parameter_types)
+        ]
+        call = mod.call(name.encode("ascii"), arguments, array_type)
+
+        # Pages needed to hold the copied elements, rounded up
+        end = mod.binary(
+            binaryen.operations.AddInt32(),
+            get_i32(out_index),
+            mod.binary(
+                binaryen.operations.MulInt32(), get_i32(length_index), mod.i32(size)
+            ),
+        )
+        needed_pages = mod.binary(
+            binaryen.operations.ShrUInt32(),
+            mod.binary(binaryen.operations.AddInt32(), end, mod.i32(65535)),
+            mod.i32(16),
+        )
+        grow_memory = mod.If(
+            mod.binary(
+                binaryen.operations.GtUInt32(), get_i32(pages_index), memory_size()
+            ),
+            mod.drop(
+                binaryen.Expression(
+                    binaryen.lib.BinaryenMemoryGrow(
+                        mod.ref,
+                        mod.binary(
+                            binaryen.operations.SubInt32(),
+                            get_i32(pages_index),
+                            memory_size(),
+                        ).ref,
+                        MEMORY_NAME,
+                        False,
+                    )
+                )
+            ),
+            None,
+        )
+
+        store_element = mod.store(
+            size,
+            0,
+            size,
+            mod.binary(
+                binaryen.operations.AddInt32(),
+                get_i32(out_index),
+                mod.binary(
+                    binaryen.operations.MulInt32(), get_i32(i_index), mod.i32(size)
+                ),
+            ),
+            mod.array_get(
+                mod.local_get(array_index, array_type),
+                get_i32(i_index),
+                element_type,
+                False,
+            ),
+            element_type,
+            MEMORY_NAME,
+        )
+
+        loop_name = f"{RESULT_PREFIX}loop".encode("ascii")
+        exit_name = f"{RESULT_PREFIX}exit".encode("ascii")
+        loop = mod.loop(
+            loop_name,
+            mod.block(
+                None,
+                [
+                    mod.Break(
+                        exit_name,
+                        mod.binary(
+                            binaryen.operations.GeSInt32(),
+                            get_i32(i_index),
+                            get_i32(length_index),
+                        ),
+                        None,
+                    ),
+                    store_element,
+                    mod.local_set(
+                        i_index,
+                        mod.binary(
+                            binaryen.operations.AddInt32(), get_i32(i_index), mod.i32(1)
+                        ),
+                    ),
+                    mod.Break(loop_name, None, None),
+                ],
+                binaryen.type.TypeNone,
+            ),
+        )
+        body = mod.block(
+            None,
+            [
+                mod.local_set(array_index, call),
+                mod.local_set(
+                    length_index,
+                    mod.array_len(mod.local_get(array_index, array_type)),
+                ),
+                mod.local_set(pages_index, needed_pages),
+                grow_memory,
+                mod.local_set(i_index, mod.i32(0)),
+                mod.block(exit_name, [loop], binaryen.type.TypeNone),
+                get_i32(length_index),
+            ],
+            Int32,
+        )
+
+        result_name = f"{RESULT_PREFIX}{name}".encode("ascii")
+        mod.add_function(
+            result_name,
+            binaryen.type.create(parameter_types + [Int32]),
+            Int32,
+            [array_type, Int32, Int32, Int32],
+            body,
+        )
+        mod.add_function_export(result_name, result_name)
 
     def visit(self, node):
         # print(f"Visiting: {node}")
+        if (
+            isinstance(node, FunctionDef)
+            and self.timings is not None
+            and node.name in self.function_arguments
+        ):
+            with self.timings.measure(node.name, function=True):
+                return super().visit(node)
         return super().visit(node)
 
     # visit_Expression
@@ -334,6 +917,8 @@ class Compiler(NodeVisitor):
         if not contains_wasm:
             return
 
+        add_parent_links(node)
+
         if self.func_ref is not None:
             # We are already in a WASM function, inner functions are not supported
             raise NotImplementedError
@@ -345,25 +930,44 @@ class Compiler(NodeVisitor):
         if any(default for default in node.args.defaults):
             raise RuntimeError("Defaults not supported")
 
-        for i, argument in enumerate(node.args.args):
+        function_parameter_types = []
+        for argument in node.args.args:
             argument_type = get_binaryen_type(argument.annotation, self.object_aliases)
             if argument_type is None:
                 raise RuntimeError(
                     f'Types must be provided for all function arguments. "{self.filename}", line {node.lineno}.'
                 )
 
+            index = len(function_parameter_types)
+            if isinstance(argument_type, BufferType):
+                # Buffers are passed as a pointer and a length
+                self._ensure_memory()
+                self.buffers[argument.arg] = (argument_type, index)
+                function_parameter_types.extend([Int32, Int32])
+                continue
+
+            if self._is_memory_array(argument_type):
+                self._ensure_memory()
+                self.memory_arrays[argument.arg] = (
+                    binaryen.type.array_type.get_element_type(argument_type)
+                )
+            argument_type = self._get_value_type(argument_type)
             self.variable_types[argument.arg] = argument_type
-            self.variable_indexes[argument.arg] = i
+            self.variable_indexes[argument.arg] = index
+            function_parameter_types.append(argument_type)
 
         return_type = get_binaryen_type(node.returns, self.object_aliases)
 
         if return_type is None:
             return_type = binaryen.type.TypeNone
 
-        body = self.module.block(None, [], return_type)
+        if isinstance(return_type, BufferType):
+            raise RuntimeError(
+                f'Buffers can only be used as function arguments. "{self.filename}", line {node.lineno}.'
+            )
+        return_type = self._get_value_type(return_type)
 
-        # # Dicts preserve insertion order, no locals have been added yet
-        function_parameter_types = list(self.variable_types.values())
+        body = self.module.block(None, [], return_type)
 
         self.func_ref = self.module.add_function(
             name,
@@ -373,8 +977,23 @@ class Compiler(NodeVisitor):
             body,
         )
 
-        for i, argument in enumerate(node.args.args):
-            self.func_ref.set_local_name(i, argument.arg.encode("ascii"))
+        for argument in node.args.args:
+            if argument.arg in self.buffers:
+                index = self.buffers[argument.arg][1]
+                self.func_ref.set_local_name(index, argument.arg.encode("ascii"))
+                self.func_ref.set_local_name(
+                    index + 1, f"{argument.arg}_len".encode("ascii")
+                )
+            else:
+                index = self.variable_indexes[argument.arg]
+                self.func_ref.set_local_name(index, argument.arg.encode("ascii"))
+
+        self.function_node = node
+        self.branch_index = 0
+        if self.instrument or self.profile is not None:
+            self.function_hash = get_function_hash(node)
+        if self.instrument:
+            body.append_child(self._add_counter("calls"))
 
         for body_node in node.body:
             if isinstance(body_node, AST):
@@ -385,10 +1004,23 @@ class Compiler(NodeVisitor):
                     print("Error: Non binaryen output of node!")
 
         self.module.add_function_export(name, name)
+        self.compiled_functions.append(node.name)
+        self.buffer_writes[node.name] = [
+            i
+            for i, argument in enumerate(node.args.args)
+            if argument.arg in self.written_buffers
+        ]
+        self.function_calls[node.name] = self.called_functions
 
         self.func_ref = None
+        self.function_node = None
+        self.function_hash = None
         self.variable_indexes = {}
         self.variable_types = {}
+        self.buffers = {}
+        self.written_buffers = set()
+        self.called_functions = set()
+        self.memory_arrays = {}
         self.scoped_globals = {}
 
     # visit_AsyncFunctionDef
@@ -430,10 +1062,22 @@ class Compiler(NodeVisitor):
                 case Name():
                     name = target.id
                     expressions.append(self._set_var(name, value, target.lineno))
+                case Subscript(value=Name()) if target.value.id in self.buffers:
+                    expressions.append(
+                        self._store_buffer_element(
+                            target.value.id, target.slice, value, node.lineno
+                        )
+                    )
+                case Subscript(value=Name()) if target.value.id in self.memory_arrays:
+                    expressions.append(
+                        self._store_array_element(
+                            target.value.id, target.slice, value, node.lineno
+                        )
+                    )
                 case Subscript(value=Name()):
                     if not self.gc:
                         raise RuntimeError(
-                            "Enable Garbage Collection with the -gc flag to use arrays"
+                            f'Only arrays and buffers can be assigned to with a subscript. "{self.filename}", line {node.lineno}.'
                         )
                     # Assume its a list
                     name = target.value.id
@@ -541,7 +1185,236 @@ class Compiler(NodeVisitor):
             node.target.id, value, node.lineno, type_annotation=type_annotation
         )
 
-    # visit_For
+    def _get_constant_int(self, node: AST) -> int | None:
+        """Get the value of an integer literal, or None if the node is not one"""
+        match node:
+            case Constant(value=int() as value) if not isinstance(value, bool):
+                return value
+            case UnaryOp(
+                op=USub(), operand=Constant(value=int() as value)
+            ) if not isinstance(value, bool):
+                return -value
+        return None
+
+    def visit_For(self, node: For):
+        if self.func_ref is None:
+            return None
+
+        match node:
+            case For(
+                target=Name(), iter=Call(func=Name(id="range"), args=range_args)
+            ) if (1 <= len(range_args) <= 3 and len(node.iter.keywords) == 0):
+                pass
+            case _:
+                raise RuntimeError(
+                    f'For loops are only supported over range(), with a single loop variable. "{self.filename}", line {node.lineno}.'
+                )
+
+        start_node = range_args[0] if len(range_args) > 1 else None
+        stop_node = range_args[1] if len(range_args) > 1 else range_args[0]
+        step_node = range_args[2] if len(range_args) > 2 else None
+
+        # A literal step tells us which way the loop counts at compile time
+        step = 1 if step_node is None else self._get_constant_int(step_node)
+        if step == 0:
+            raise RuntimeError(
+                f'range() step must not be zero. "{self.filename}", line {node.lineno}.'
+            )
+        if step is not None and not -(2**63) <= step < 2**63:
+            raise RuntimeError(
+                f'range() step does not fit in an i64. "{self.filename}", line {node.lineno}.'
+            )
+
+        start = self.visit(start_node) if start_node is not None else None
+        stop = self.visit(stop_node)
+        step_value = (
+            self.visit(step_node) if step_node is not None and step is None else None
+        )
+        arguments = [value for value in (start, stop, step_value) if value is not None]
+        if any(value.get_type() not in [Int32, Int64] for value in arguments):
+            raise RuntimeError(
+                f'range() arguments must be integers. "{self.filename}", line {node.lineno}.'
+            )
+
+        # Count with an i64 if the loop variable, any argument or a literal step is one, otherwise an i32
+        target = node.target.id
+        target_type = self.variable_types.get(target, self.scoped_globals.get(target))
+        counter_type = Int32
+        if (
+            target_type == Int64
+            or any(value.get_type() == Int64 for value in arguments)
+            or (step is not None and not -(2**31) <= step < 2**31)
+        ):
+            counter_type = Int64
+
+        ops = binaryen.operations
+        if counter_type == Int64:
+            add_op, sub_op, div_op = ops.AddInt64(), ops.SubInt64(), ops.DivUInt64()
+            less_op, greater_op = ops.LtSInt64(), ops.GtSInt64()
+            equal_op, not_equal_op = ops.EqInt64(), ops.NeInt64()
+            constant = self.module.i64
+            bits = 64
+        else:
+            add_op, sub_op, div_op = ops.AddInt32(), ops.SubInt32(), ops.DivUInt32()
+            less_op, greater_op = ops.LtSInt32(), ops.GtSInt32()
+            equal_op, not_equal_op = ops.EqInt32(), ops.NeInt32()
+            constant = self.module.i32
+            bits = 32
+
+        loop_id = id(node)
+        mod = self.module
+
+        def get(index: int):
+            return mod.local_get(index, counter_type)
+
+        # The range is counted in hidden locals, so assigning to the loop variable in the body doesn't change the
+        # iteration, just like python
+        counter = self._create_local(f"__for_{loop_id}", counter_type)
+        stop_local = self._create_local(f"__for_stop_{loop_id}", counter_type)
+        # The number of iterations left. The counter may wrap around after the last iteration near the limits of its
+        # type, so it is never compared with stop.
+        remaining = self._create_local(f"__for_count_{loop_id}", counter_type)
+        setup = [
+            mod.local_set(
+                counter,
+                (
+                    self._cast_numeric_to_type(start, counter_type, node.lineno)
+                    if start is not None
+                    else constant(0)
+                ),
+            ),
+            mod.local_set(
+                stop_local, self._cast_numeric_to_type(stop, counter_type, node.lineno)
+            ),
+        ]
+
+        def trip_count(nonempty, distance, magnitude):
+            # ceil(distance / magnitude) without overflowing: distance and magnitude are exact as unsigned numbers
+            return mod.select(
+                nonempty,
+                mod.binary(
+                    add_op,
+                    mod.binary(
+                        div_op, mod.binary(sub_op, distance, constant(1)), magnitude
+                    ),
+                    constant(1),
+                ),
+                constant(0),
+                counter_type,
+            )
+
+        if step is not None:
+            # The unsigned magnitude of the step, as a signed constant of the counter's type
+            magnitude = abs(step)
+            if magnitude >= 2 ** (bits - 1):
+                magnitude -= 2**bits
+            if step > 0:
+                count = trip_count(
+                    mod.binary(less_op, get(counter), get(stop_local)),
+                    mod.binary(sub_op, get(stop_local), get(counter)),
+                    constant(magnitude),
+                )
+            else:
+                count = trip_count(
+                    mod.binary(greater_op, get(counter), get(stop_local)),
+                    mod.binary(sub_op, get(counter), get(stop_local)),
+                    constant(magnitude),
+                )
+            increment = constant(step)
+        else:
+            step_local = self._create_local(f"__for_step_{loop_id}", counter_type)
+            setup.append(
+                mod.local_set(
+                    step_local,
+                    self._cast_numeric_to_type(step_value, counter_type, node.lineno),
+                )
+            )
+            # Python raises a ValueError for a zero step, trap instead
+            setup.append(
+                mod.If(
+                    mod.binary(equal_op, get(step_local), constant(0)),
+                    mod.unreachable(),
+                    None,
+                )
+            )
+
+            def positive():
+                return mod.binary(greater_op, get(step_local), constant(0))
+
+            count = trip_count(
+                mod.select(
+                    positive(),
+                    mod.binary(less_op, get(counter), get(stop_local)),
+                    mod.binary(greater_op, get(counter), get(stop_local)),
+                    Int32,
+                ),
+                mod.select(
+                    positive(),
+                    mod.binary(sub_op, get(stop_local), get(counter)),
+                    mod.binary(sub_op, get(counter), get(stop_local)),
+                    counter_type,
+                ),
+                mod.select(
+                    positive(),
+                    get(step_local),
+                    mod.binary(sub_op, constant(0), get(step_local)),
+                    counter_type,
+                ),
+            )
+            increment = get(step_local)
+
+        setup.append(mod.local_set(remaining, count))
+        condition = mod.binary(not_equal_op, get(remaining), constant(0))
+
+        self.while_stack.append(loop_id)
+        self.continue_labels[loop_id] = f"loop_continue_{loop_id}".encode("ascii")
+
+        loop_body = [self._set_var(target, get(counter), node.lineno)]
+        for python_exp in node.body:
+            wasm_exp = self.visit(python_exp)
+            loop_body.append(wasm_exp)
+
+        self.while_stack.pop()
+        del self.continue_labels[loop_id]
+
+        else_body = []
+        for python_exp in node.orelse:
+            wasm_exp = self.visit(python_exp)
+            else_body.append(wasm_exp)
+
+        else_block = (
+            mod.block(
+                f"loop_else_{loop_id}".encode("ascii"),
+                else_body,
+                binaryen.type.TypeNone,
+            )
+            if len(else_body) > 0
+            else mod.nop()
+        )
+
+        # continue branches out of loop_continue to the increment, break branches out of loop_body which skips the else
+        body = mod.block(
+            f"loop_body_{loop_id}".encode("ascii"),
+            [
+                mod.block(
+                    f"loop_continue_{loop_id}".encode("ascii"),
+                    loop_body,
+                    binaryen.type.TypeNone,
+                ),
+                mod.local_set(
+                    remaining, mod.binary(sub_op, get(remaining), constant(1))
+                ),
+                mod.local_set(counter, mod.binary(add_op, get(counter), increment)),
+                mod.Break(f"loop_{loop_id}".encode("ascii"), None, None),
+            ],
+            binaryen.type.TypeNone,
+        )
+
+        loop_test = mod.If(condition, body, else_block)
+        loop = mod.loop(f"loop_{loop_id}".encode("ascii"), loop_test)
+
+        return mod.block(None, [*setup, loop], binaryen.type.TypeNone)
+
     # visit_AsyncFor
 
     def visit_While(self, node: While):
@@ -597,6 +1470,13 @@ class Compiler(NodeVisitor):
         if_true = self.module.block(None, [], binaryen.type.Auto)
         if_false = self.module.block(None, [], binaryen.type.Auto)
 
+        # Number the if statements of a function in the order they appear, to match them up with their profile
+        branch = self.branch_index
+        self.branch_index += 1
+        if self.instrument:
+            if_true.append_child(self._add_counter("then", branch))
+            if_false.append_child(self._add_counter("else", branch))
+
         for python_exp in node.body:
             wasm_exp = self.visit(python_exp)
             if_true.append_child(wasm_exp)
@@ -605,6 +1485,15 @@ class Compiler(NodeVisitor):
             wasm_exp = self.visit(python_exp)
             if_false.append_child(wasm_exp)
 
+        if self.profile is not None and len(node.orelse) > 0:
+            counts = self.profile.get_branch(
+                self.function_node.name, self.function_hash, branch
+            )
+            if counts is not None and counts[1] > counts[0]:
+                # The else arm runs more often, negate the condition so it comes first
+                negated = self.module.unary(binaryen.operations.EqZInt32(), condition)
+                return self.module.If(negated, if_false, if_true)
+
         return self.module.If(condition, if_true, if_false)
 
     # visit_With
@@ -627,9 +1516,11 @@ class Compiler(NodeVisitor):
 
     def visit_Import(self, node: Import):
         handle_Import(node, self.module_aliases)
+        mini_math.handle_Import(node, self.math_aliases)
 
     def visit_ImportFrom(self, node: ImportFrom):
         handle_ImportFrom(node, self.object_aliases)
+        mini_math.handle_ImportFrom(node, self.math_functions)
 
     def visit_Global(self, node: Global):
         for name in node.names:
@@ -715,7 +1606,7 @@ class Compiler(NodeVisitor):
             return None
 
         if len(self.while_stack) == 0:
-            raise RuntimeError("Break can only be used in a while loop")
+            raise RuntimeError("Break can only be used in a loop")
         loop_id = self.while_stack[-1]
         loop_name = f"loop_body_{loop_id}".encode("ascii")
         return self.module.Break(loop_name, None, None)
@@ -725,9 +1616,9 @@ class Compiler(NodeVisitor):
             return None
 
         if len(self.while_stack) == 0:
-            raise RuntimeError("Break can only be used in a while loop")
+            raise RuntimeError("Continue can only be used in a loop")
         loop_id = self.while_stack[-1]
-        loop_name = f"loop_{loop_id}".encode("ascii")
+        loop_name = self.continue_labels.get(loop_id, f"loop_{loop_id}".encode("ascii"))
         return self.module.Break(loop_name, None, None)
 
     # visit_BoolOp
@@ -739,11 +1630,19 @@ class Compiler(NodeVisitor):
 
         left = self.visit(node.left)
         right = self.visit(node.right)
+        if isinstance(node.op, Pow):
+            # The exponent keeps its own type, e.g. an f32 raised to an integer literal is multiplied out
+            return self._power(node, left, right)
+
         (cast_left, cast_right) = self._cast_numeric_to_matching(
             left, right, node.lineno
         )
         op_type = cast_left.get_type()
 
+        folded = self._fold_constants(node.op, cast_left, cast_right)
+        if folded is not None:
+            return folded
+
         match node.op:
             case Add():
                 match op_type:
@@ -785,15 +1684,19 @@ class Compiler(NodeVisitor):
                         raise RuntimeError("Can't multiply non numeric wasm types")
                 return self.module.binary(mult_op, cast_left, cast_right)
             case Div():
+                if op_type in [Int32, Int64]:
+                    # / on integers is true division in python, which gives a float
+                    cast_left = self._cast_numeric_to_type(
+                        cast_left, Float64, node.lineno
+                    )
+                    cast_right = self._cast_numeric_to_type(
+                        cast_right, Float64, node.lineno
+                    )
+                    op_type = Float64
+                    folded = self._fold_constants(node.op, cast_left, cast_right)
+                    if folded is not None:
+                        return folded
                 match op_type:
-                    case binaryen.type.Int32:
-                        return self.module.binary(
-                            binaryen.operations.DivSInt32(), cast_left, cast_right
-                        )
-                    case binaryen.type.Int64:
-                        return self.module.binary(
-                            binaryen.operations.DivSInt64(), cast_left, cast_right
-                        )
                     case binaryen.type.Float32:
                         return self.module.binary(
                             binaryen.operations.DivFloat32(), cast_left, cast_right
@@ -805,33 +1708,461 @@ class Compiler(NodeVisitor):
                     case _:
                         raise RuntimeError("Can't multiply non numeric wasm types")
             case Mod():
-                match op_type:
-                    case binaryen.type.Int32:
-                        mod_op = binaryen.operations.RemSInt32()
-                    case binaryen.type.Int64:
-                        mod_op = binaryen.operations.RemSInt64()
-                    case _:
-                        raise RuntimeError("Can't do modulus on non integer wasm types")
-                return self.module.binary(mod_op, cast_left, cast_right)
+                if op_type not in [Int32, Int64]:
+                    raise RuntimeError("Can't do modulus on non integer wasm types")
+                return self._floor_div_mod(node, cast_left, cast_right, modulo=True)
             case FloorDiv():
+                if op_type in [Int32, Int64]:
+                    return self._floor_div_mod(
+                        node, cast_left, cast_right, modulo=False
+                    )
                 # NOTE: Python has strange floor division because of PEP 238
                 # In python: a // b == floor(a/b)
-                left_float = self._cast_numeric_to_type(
-                    left, binaryen.type.Float64, node.lineno
+                if op_type == Float32:
+                    div_op = binaryen.operations.DivFloat32()
+                    floor_op = binaryen.operations.FloorFloat32()
+                else:
+                    div_op = binaryen.operations.DivFloat64()
+                    floor_op = binaryen.operations.FloorFloat64()
+                result = self.module.binary(div_op, cast_left, cast_right)
+                return self.module.unary(floor_op, result)
+            case LShift() | RShift() | BitOr() | BitXor() | BitAnd():
+                if op_type not in [Int32, Int64]:
+                    raise RuntimeError(
+                        f'Bitwise operators can only be used on integers. "{self.filename}", line {node.lineno}.'
+                    )
+                # >> is an arithmetic shift in python. Shift counts are taken modulo the number of bits, like Wasm.
+                ops = binaryen.operations
+                is_64 = op_type == Int64
+                bitwise_op = {
+                    LShift: ops.ShlInt64() if is_64 else ops.ShlInt32(),
+                    RShift: ops.ShrSInt64() if is_64 else ops.ShrSInt32(),
+                    BitOr: ops.OrInt64() if is_64 else ops.OrInt32(),
+                    BitXor: ops.XorInt64() if is_64 else ops.XorInt32(),
+                    BitAnd: ops.AndInt64() if is_64 else ops.AndInt32(),
+                }[type(node.op)]
+                return self.module.binary(bitwise_op, cast_left, cast_right)
+            case MatMult():
+                raise NotImplementedError
+            case _:
+                raise NotImplementedError
+
+    def _fold_constants(
+        self, op, left: binaryen.Expression, right: binaryen.Expression
+    ) -> binaryen.Expression | None:
+        """Evaluate +, -, * and float / on two constants of the same type when compiling. The result is a literal, so
+        it can take the type of its context just like one written in the source."""
+        left_value = self._get_literal_value(left)
+        right_value = self._get_literal_value(right)
+        if left_value is None or right_value is None:
+            return None
+
+        op_type = left.get_type()
+        match op:
+            case Add():
+                value = left_value + right_value
+            case Sub():
+                value = left_value - right_value
+            case Mult():
+                value = left_value * right_value
+            case Div() if op_type in [Float32, Float64] and right_value != 0:
+                value = left_value / right_value
+            case BitAnd() | BitOr() | BitXor() if op_type in [Int32, Int64]:
+                value = {BitAnd: int.__and__, BitOr: int.__or__, BitXor: int.__xor__}[
+                    type(op)
+                ](left_value, right_value)
+            case LShift() | RShift() if op_type in [Int32, Int64] and right_value >= 0:
+                # Shifts of two literals are computed like python, so 1 << 40 is 2**40 as an i64 for any type of literal,
+                # the same as 2**40 written out. Negative counts are an error in python and are left to the Wasm
+                # instruction, which takes counts modulo the number of bits.
+                if isinstance(op, LShift):
+                    value = left_value << right_value
+                else:
+                    value = left_value >> right_value
+            case FloorDiv() | Mod() if op_type in [Int32, Int64] and right_value != 0:
+                # Python's integer // and % are what the compiled code computes
+                if isinstance(op, FloorDiv):
+                    value = left_value // right_value
+                else:
+                    value = left_value % right_value
+            case _:
+                return None
+
+        # Floats are computed as f64, rounding an f64 result of +, -, * or / on two f32 values gives the same result as
+        # the f32 instruction
+        if op_type in [Int32, Int64]:
+            return self._make_integer_literal(value, op_type)
+        return self._make_literal(value, op_type)
+
+    def _make_integer_literal(self, value: int, literal_type: BinaryenType):
+        """Create the result of integer arithmetic on literals. Like a literal in the source it becomes an i64 if it is too
+        large for an i32, and beyond that it wraps around like Wasm does."""
+        literal = self._make_literal(value, literal_type)
+        if literal is None:
+            literal = self._make_literal(value, Int64)
+        if literal is None:
+            value = (value + 2**63) % 2**64 - 2**63
+            literal = self._make_literal(value, Int64)
+        return literal
+
+    def _power(
+        self, node: BinOp, base: binaryen.Expression, exponent: binaryen.Expression
+    ):
+        """Compile base ** exponent. Integer exponents use exponentiation by squaring: a literal exponent is multiplied
+        out in place, any other calls a helper function with a loop. x ** 0.5 is a square root.
+        """
+        base_type = base.get_type()
+        exponent_type = exponent.get_type()
+        if base_type not in NUMBER_TYPES or exponent_type not in NUMBER_TYPES:
+            raise RuntimeError(
+                f'Powers can only be taken of numbers. "{self.filename}", line {node.lineno}.'
+            )
+        float_types = [Float32, Float64]
+
+        exponent_value = self._get_literal_value(exponent)
+        if exponent_value is not None and exponent_type in float_types:
+            if exponent_value == 0.5 and base_type in float_types:
+                sqrt_op = (
+                    binaryen.operations.SqrtFloat32()
+                    if base_type == Float32
+                    else binaryen.operations.SqrtFloat64()
                 )
-                right_float = self._cast_numeric_to_type(
-                    right, binaryen.type.Float64, node.lineno
+                return self.module.unary(sqrt_op, base)
+            if exponent_value != int(exponent_value):
+                raise RuntimeError(
+                    f'Only whole numbers and 0.5 are supported as float exponents. "{self.filename}", line {node.lineno}.'
                 )
-                result = self.module.binary(
-                    binaryen.operations.DivFloat64(), left_float, right_float
+            # A whole float exponent gives a float, e.g. 3 ** 2.0 == 9.0
+            exponent_value = int(exponent_value)
+            if base_type not in float_types:
+                base = self._cast_numeric_to_type(base, Float64, node.lineno)
+                base_type = Float64
+        elif exponent_type in float_types:
+            raise RuntimeError(
+                f'Only whole numbers and 0.5 are supported as float exponents. "{self.filename}", line {node.lineno}.'
+            )
+
+        if (
+            exponent_value is not None
+            and exponent_value < 0
+            and base_type not in float_types
+        ):
+            # A negative power of an integer is a float in python
+            base = self._cast_numeric_to_type(base, Float64, node.lineno)
+            base_type = Float64
+
+        if exponent_value is None:
+            if base_type in float_types:
+                exponent = self._cast_numeric_to_type(exponent, Int64, node.lineno)
+            else:
+                base, exponent = self._cast_numeric_to_matching(
+                    base, exponent, node.lineno
                 )
-                return self.module.unary(binaryen.operations.FloorFloat64(), result)
-            case (
-                MatMult() | Pow() | LShift() | RShift() | BitOr() | BitXor() | BitAnd()
-            ):
-                raise NotImplementedError
+                base_type = base.get_type()
+            helper = self._get_pow_function(base_type)
+            return self.module.call(helper, [base, exponent], base_type)
+
+        base_value = self._get_literal_value(base)
+        if base_value is not None:
+            return self._fold_power(base_value, exponent_value, base_type, node.lineno)
+
+        return self._multiply_out_power(node, base, exponent_value)
+
+    def _fold_power(self, base_value, exponent_value: int, base_type, lineno: int):
+        if base_type in [Int32, Int64]:
+            if exponent_value * abs(base_value).bit_length() <= 64:
+                value = base_value**exponent_value
+            else:
+                # Only the low 64 bits are kept, so there is no need to compute a huge power in full
+                value = pow(base_value, exponent_value, 2**64)
+            return self._make_integer_literal(value, base_type)
+        try:
+            value = float(base_value) ** exponent_value
+        except (OverflowError, ZeroDivisionError):
+            raise RuntimeError(
+                f'Power of a literal can not be computed. "{self.filename}", line {lineno}.'
+            )
+        return self._make_literal(value, base_type)
+
+    def _multiply_out_power(
+        self, node: BinOp, base: binaryen.Expression, exponent: int
+    ):
+        """base ** exponent for a literal exponent, as a chain of squares and multiplies"""
+        mod = self.module
+        base_type = base.get_type()
+        match base_type:
+            case binaryen.type.Int32:
+                mul_op, one = binaryen.operations.MulInt32(), mod.i32(1)
+            case binaryen.type.Int64:
+                mul_op, one = binaryen.operations.MulInt64(), mod.i64(1)
+            case binaryen.type.Float32:
+                mul_op, one = binaryen.operations.MulFloat32(), mod.f32(1)
             case _:
-                raise NotImplementedError
+                mul_op, one = binaryen.operations.MulFloat64(), mod.f64(1)
+
+        if exponent == 0:
+            return mod.block(None, [mod.drop(base), one], base_type)
+        if exponent == 1:
+            return base
+        if exponent == -1:
+            return self._reciprocal(base)
+
+        node_id = id(node)
+        base_local = self._create_local(f"__base_{node_id}", base_type)
+        result_local = self._create_local(f"__power_{node_id}", base_type)
+
+        def get(index: int):
+            return mod.local_get(index, base_type)
+
+        # Left to right binary exponentiation: square for every bit after the first, and multiply by base for set bits
+        steps = [
+            mod.local_set(base_local, base),
+            mod.local_set(result_local, get(base_local)),
+        ]
+        for bit in bin(abs(exponent))[3:]:
+            steps.append(
+                mod.local_set(
+                    result_local,
+                    mod.binary(mul_op, get(result_local), get(result_local)),
+                )
+            )
+            if bit == "1":
+                steps.append(
+                    mod.local_set(
+                        result_local,
+                        mod.binary(mul_op, get(result_local), get(base_local)),
+                    )
+                )
+        result = get(result_local)
+        if exponent < 0:
+            result = self._reciprocal(result)
+        return mod.block(None, [*steps, result], base_type)
+
+    def _reciprocal(self, value: binaryen.Expression):
+        if value.get_type() == Float32:
+            return self.module.binary(
+                binaryen.operations.DivFloat32(), self.module.f32(1), value
+            )
+        return self.module.binary(
+            binaryen.operations.DivFloat64(), self.module.f64(1), value
+        )
+
+    def _get_pow_function(self, base_type: BinaryenType) -> bytes:
+        """Add a function computing base ** exponent by squaring, for an exponent only known at run time. Integer bases
+        take an exponent of the same type and trap if it is negative, as the result would be a float. Float bases take
+        an i64 exponent."""
+        mod = self.module
+        type_name = get_type_name(base_type)
+        name = f"{POW_PREFIX}{type_name}".encode("ascii")
+        if binaryen.lib.BinaryenGetFunction(mod.ref, name):
+            return name
+
+        ops = binaryen.operations
+        is_float = base_type in [Float32, Float64]
+        exponent_type = Int64 if is_float else base_type
+        mul_op = {
+            Int32: ops.MulInt32(),
+            Int64: ops.MulInt64(),
+            Float32: ops.MulFloat32(),
+            Float64: ops.MulFloat64(),
+        }[base_type]
+        one = {Int32: mod.i32, Int64: mod.i64, Float32: mod.f32, Float64: mod.f64}[
+            base_type
+        ]
+        if exponent_type == Int64:
+            exponent_ops = (
+                ops.AndInt64(),
+                ops.ShrUInt64(),
+                ops.LtSInt64(),
+                ops.SubInt64(),
+                ops.EqZInt64(),
+            )
+            exponent_constant = mod.i64
+        else:
+            exponent_ops = (
+                ops.AndInt32(),
+                ops.ShrUInt32(),
+                ops.LtSInt32(),
+                ops.SubInt32(),
+                ops.EqZInt32(),
+            )
+            exponent_constant = mod.i32
+        and_op, shift_op, less_op, sub_op, eqz_op = exponent_ops
+
+        # Locals: 0 base, 1 exponent, 2 result
+        def base():
+            return mod.local_get(0, base_type)
+
+        def exponent():
+            return mod.local_get(1, exponent_type)
+
+        def result():
+            return mod.local_get(2, base_type)
+
+        negative = mod.binary(less_op, exponent(), exponent_constant(0))
+        if is_float:
+            # Negative exponents give the reciprocal. Negating the most negative i64 wraps, but it is still right as
+            # an unsigned number.
+            start = mod.If(
+                negative,
+                mod.local_set(1, mod.binary(sub_op, exponent_constant(0), exponent())),
+                None,
+            )
+        else:
+            start = mod.If(negative, mod.unreachable(), None)
+
+        loop_body = mod.block(
+            None,
+            [
+                mod.If(
+                    mod.unary(
+                        eqz_op, mod.binary(and_op, exponent(), exponent_constant(1))
+                    ),
+                    mod.nop(),
+                    mod.local_set(2, mod.binary(mul_op, result(), base())),
+                ),
+                mod.local_set(0, mod.binary(mul_op, base(), base())),
+                mod.local_set(
+                    1, mod.binary(shift_op, exponent(), exponent_constant(1))
+                ),
+                mod.Break(b"pow_loop", None, None),
+            ],
+            binaryen.type.TypeNone,
+        )
+        loop = mod.loop(
+            b"pow_loop", mod.If(mod.unary(eqz_op, exponent()), mod.nop(), loop_body)
+        )
+
+        final = result()
+        if is_float:
+            final = mod.select(
+                mod.binary(
+                    less_op, mod.local_get(3, exponent_type), exponent_constant(0)
+                ),
+                self._reciprocal(result()),
+                final,
+                base_type,
+            )
+            # Local 3 keeps the original exponent, to know if the result must be inverted
+            body = mod.block(
+                None,
+                [
+                    mod.local_set(3, exponent()),
+                    start,
+                    mod.local_set(2, one(1)),
+                    loop,
+                    final,
+                ],
+                base_type,
+            )
+            var_types = [base_type, exponent_type]
+        else:
+            body = mod.block(
+                None, [start, mod.local_set(2, one(1)), loop, final], base_type
+            )
+            var_types = [base_type]
+
+        mod.add_function(
+            name,
+            binaryen.type.create([base_type, exponent_type]),
+            base_type,
+            var_types,
+            body,
+        )
+        return name
+
+    def _floor_div_mod(
+        self,
+        node: BinOp,
+        left: binaryen.Expression,
+        right: binaryen.Expression,
+        modulo: bool,
+    ):
+        """Integer // or % with python's semantics, which round the quotient towards negative infinity, so the remainder
+        has the sign of the divisor. Wasm's div_s and rem_s truncate towards zero instead, so their result is adjusted
+        without branching when the remainder and divisor have different signs."""
+        mod = self.module
+        op_type = left.get_type()
+        bits = 64 if op_type == Int64 else 32
+        ops = binaryen.operations
+        if op_type == Int64:
+            div_op, rem_op, shift_op = ops.DivSInt64(), ops.RemSInt64(), ops.ShrSInt64()
+            and_op, xor_op, add_op = ops.AndInt64(), ops.XorInt64(), ops.AddInt64()
+            less_op, not_equal_op = ops.LtSInt64(), ops.NeInt64()
+            constant = mod.i64
+        else:
+            div_op, rem_op, shift_op = ops.DivSInt32(), ops.RemSInt32(), ops.ShrSInt32()
+            and_op, xor_op, add_op = ops.AndInt32(), ops.XorInt32(), ops.AddInt32()
+            less_op, not_equal_op = ops.LtSInt32(), ops.NeInt32()
+            constant = mod.i32
+
+        divisor = self._get_literal_value(right)
+        if divisor is not None and divisor > 0 and divisor & (divisor - 1) == 0:
+            # Powers of two: an arithmetic shift already floors, and masking gives a non negative remainder
+            if modulo:
+                return mod.binary(and_op, left, constant(divisor - 1))
+            return mod.binary(shift_op, left, constant(divisor.bit_length() - 1))
+
+        def get(index: int):
+            return mod.local_get(index, op_type)
+
+        node_id = id(node)
+        left_local = self._create_local(f"__dividend_{node_id}", op_type)
+        remainder_local = self._create_local(f"__remainder_{node_id}", op_type)
+        setup = [mod.local_set(left_local, left)]
+
+        if divisor is not None and divisor > 0:
+            # A positive divisor only needs adjusting when the remainder is negative. remainder >> (bits - 1) is -1
+            # when it is and 0 otherwise.
+            setup.append(
+                mod.local_set(
+                    remainder_local,
+                    mod.binary(rem_op, get(left_local), constant(divisor)),
+                )
+            )
+            sign = mod.binary(shift_op, get(remainder_local), constant(bits - 1))
+            if modulo:
+                result = mod.binary(
+                    add_op,
+                    get(remainder_local),
+                    mod.binary(and_op, sign, constant(divisor)),
+                )
+            else:
+                quotient = mod.binary(div_op, get(left_local), constant(divisor))
+                result = mod.binary(add_op, quotient, sign)
+            return mod.block(None, [*setup, result], op_type)
+
+        right_local = self._create_local(f"__divisor_{node_id}", op_type)
+        setup.append(mod.local_set(right_local, right))
+        setup.append(
+            mod.local_set(
+                remainder_local, mod.binary(rem_op, get(left_local), get(right_local))
+            )
+        )
+        # Adjust when the remainder is not zero and its sign differs from the divisor's
+        needs_adjusting = mod.binary(
+            binaryen.operations.AndInt32(),
+            mod.binary(not_equal_op, get(remainder_local), constant(0)),
+            mod.binary(
+                less_op,
+                mod.binary(xor_op, get(remainder_local), get(right_local)),
+                constant(0),
+            ),
+        )
+        if modulo:
+            result = mod.binary(
+                add_op,
+                get(remainder_local),
+                mod.select(needs_adjusting, get(right_local), constant(0), op_type),
+            )
+        else:
+            quotient = mod.binary(div_op, get(left_local), get(right_local))
+            result = mod.binary(
+                add_op,
+                quotient,
+                mod.select(needs_adjusting, constant(-1), constant(0), op_type),
+            )
+        return mod.block(None, [*setup, result], op_type)
 
     def visit_UnaryOp(self, node: UnaryOp):
         if self.func_ref is None:
@@ -839,6 +2170,18 @@ class Compiler(NodeVisitor):
 
         value = self.visit(node.operand)
         op_type = value.get_type()
+
+        # Negate literals when compiling, e.g. -1 is a constant rather than 1 * -1
+        literal = self._get_literal_value(value)
+        if isinstance(node.op, USub) and literal is not None:
+            negated = self._make_literal(-literal, op_type)
+            if negated is None and op_type == Int32:
+                negated = self._make_literal(-literal, Int64)
+            if negated is not None:
+                return negated
+        if isinstance(node.op, Invert) and isinstance(literal, int):
+            return self._make_literal(~literal, op_type)
+
         match node.op:
             case UAdd():
                 # Unary Add does nothing
@@ -876,7 +2219,20 @@ class Compiler(NodeVisitor):
                     raise RuntimeError
                 return self.module.binary(op, zero, value)
             case Invert():
-                raise NotImplementedError
+                # ~x == x ^ -1
+                match op_type:
+                    case binaryen.type.Int32:
+                        return self.module.binary(
+                            binaryen.operations.XorInt32(), value, self.module.i32(-1)
+                        )
+                    case binaryen.type.Int64:
+                        return self.module.binary(
+                            binaryen.operations.XorInt64(), value, self.module.i64(-1)
+                        )
+                    case _:
+                        raise RuntimeError(
+                            f'Bitwise operators can only be used on integers. "{self.filename}", line {node.lineno}.'
+                        )
 
     # visit_Lambda
     # visit_IfExp
@@ -1014,7 +2370,28 @@ class Compiler(NodeVisitor):
         if len(node.keywords) > 0:
             raise NotImplementedError("wasmfunc does not support keyword arguments!")
 
-        assert isinstance(node.func, Name)
+        match node.func:
+            case Attribute(value=Name(id=module)) if module in self.math_aliases:
+                return mini_math.call(self, node.func.attr, node)
+            case Name(id=name) if (
+                name in self.math_functions and name not in self.function_arguments
+            ):
+                return mini_math.call(self, self.math_functions[name], node)
+            case Attribute(value=Name(id=module), attr=name) if (
+                module in self.module_aliases and name in mini_std.SIMD_INTRINSICS
+            ):
+                return mini_std.SIMD_INTRINSICS[name](self, node)
+            case Name(id=name) if (
+                self.object_aliases.get(name) in mini_std.SIMD_INTRINSICS
+                and name not in self.function_arguments
+            ):
+                return mini_std.SIMD_INTRINSICS[self.object_aliases[name]](self, node)
+            case Name():
+                pass
+            case _:
+                raise RuntimeError(
+                    f'Only Wasm functions, builtins, math functions and SIMD intrinsics can be called. "{self.filename}", line {node.lineno}.'
+                )
 
         if node.func.id not in self.function_arguments:
             if hasattr(mini_std, node.func.id):
@@ -1028,13 +2405,30 @@ class Compiler(NodeVisitor):
 
         args = []
         for i, argument in enumerate(node.args):
-            arg_exp = self.visit(argument)
             arg_type = argument_types[i]
+            if isinstance(arg_type, BufferType):
+                if not (isinstance(argument, Name) and argument.id in self.buffers):
+                    raise RuntimeError(
+                        f'Only buf arguments can be passed as a buf. "{self.filename}", line {node.lineno}.'
+                    )
+                buffer_type, pointer_index = self.buffers[argument.id]
+                if buffer_type != arg_type:
+                    raise RuntimeError(
+                        f'Buffer element types do not match. "{self.filename}", line {node.lineno}.'
+                    )
+                # The called function could write to the buffer
+                self.written_buffers.add(argument.id)
+                args.append(self.module.local_get(pointer_index, Int32))
+                args.append(self.module.local_get(pointer_index + 1, Int32))
+                continue
+
+            arg_exp = self.visit(argument)
             cast_arg_exp = self._cast_numeric_to_type(arg_exp, arg_type, node.lineno)
             args.append(cast_arg_exp)
 
-        return_type = self.function_returns[node.func.id]
+        return_type = self._get_value_type(self.function_returns[node.func.id])
 
+        self.called_functions.add(node.func.id)
         return self.module.call(name, args, return_type)
 
     # visit_FormattedValue
@@ -1048,8 +2442,15 @@ class Compiler(NodeVisitor):
         if isinstance(node.value, str):
             return self.module.string_const(node.value.encode("ascii"))
         if isinstance(node.value, int):
-            value = binaryen.literal.int32(node.value)
-            return self.module.const(value)
+            # Integers are i32 unless they are too large, the context they are used in may change the type later
+            literal = self._make_literal(node.value, Int32)
+            if literal is None:
+                literal = self._make_literal(node.value, Int64)
+            if literal is None:
+                raise RuntimeError(
+                    f'Integer literal is too large for an i64. "{self.filename}", line {node.lineno}.'
+                )
+            return literal
         if isinstance(node.value, float):
             value = binaryen.literal.float64(node.value)
             return self.module.const(value)
@@ -1059,12 +2460,253 @@ class Compiler(NodeVisitor):
 
     # visit_Attribute
 
+    def _get_buffer_element_address(
+        self, name: str, index_node: AST, lineno: int
+    ) -> binaryen.Expression:
+        """Get the address of an element of a buffer, trapping if the index is out of bounds"""
+        buffer_type, pointer_index = self.buffers[name]
+        size = get_type_size(buffer_type.element_type)
+
+        index = self._cast_numeric_to_type(self.visit(index_node), Int32, lineno)
+        index_local = self.func_ref.add_var(Int32)
+        get_index = lambda: self.module.local_get(index_local, Int32)
+
+        # An unsigned comparison also catches negative indexes
+        bounds_check = self.module.If(
+            self.module.binary(
+                binaryen.operations.GeUInt32(),
+                get_index(),
+                self.module.local_get(pointer_index + 1, Int32),
+            ),
+            self.module.unreachable(),
+            None,
+        )
+        address = self.module.binary(
+            binaryen.operations.AddInt32(),
+            self.module.local_get(pointer_index, Int32),
+            self.module.binary(
+                binaryen.operations.MulInt32(), get_index(), self.module.i32(size)
+            ),
+        )
+        return self.module.block(
+            None,
+            [self.module.local_set(index_local, index), bounds_check, address],
+            Int32,
+        )
+
+    def _load_buffer_element(self, name: str, index_node: AST, lineno: int):
+        element_type = self.buffers[name][0].element_type
+        size = get_type_size(element_type)
+        address = self._get_buffer_element_address(name, index_node, lineno)
+        return self.module.load(size, True, 0, size, element_type, address, MEMORY_NAME)
+
+    def _store_buffer_element(
+        self, name: str, index_node: AST, value: binaryen.Expression, lineno: int
+    ):
+        element_type = self.buffers[name][0].element_type
+        size = get_type_size(element_type)
+        address = self._get_buffer_element_address(name, index_node, lineno)
+        value = self._cast_numeric_to_type(value, element_type, lineno)
+        self.written_buffers.add(name)
+        return self.module.store(
+            size, 0, size, address, value, element_type, MEMORY_NAME
+        )
+
+    def _get_alloc_function(self) -> bytes:
+        """Add `__alloc(size) -> pointer`, which reserves size bytes of linear memory by bumping the heap pointer and
+        grows the memory if needed. Nothing is freed by the module, the host resets the heap pointer after each call.
+        """
+        mod = self.module
+        if self.function_node is not None:
+            self.allocating_functions.add(self.function_node.name)
+        if binaryen.lib.BinaryenGetFunction(mod.ref, ALLOC_NAME):
+            return ALLOC_NAME
+
+        self._ensure_memory()
+        ops = binaryen.operations
+        size_index, pointer_index, end_index = 0, 1, 2
+
+        def get(index: int):
+            return mod.local_get(index, Int32)
+
+        def memory_bytes():
+            return mod.binary(
+                ops.ShlInt32(),
+                binaryen.Expression(
+                    binaryen.lib.BinaryenMemorySize(mod.ref, MEMORY_NAME, False)
+                ),
+                mod.i32(16),
+            )
+
+        grow = binaryen.Expression(
+            binaryen.lib.BinaryenMemoryGrow(
+                mod.ref,
+                mod.binary(
+                    ops.ShrUInt32(),
+                    mod.binary(
+                        ops.AddInt32(),
+                        mod.binary(ops.SubInt32(), get(end_index), memory_bytes()),
+                        mod.i32(65535),
+                    ),
+                    mod.i32(16),
+                ).ref,
+                MEMORY_NAME,
+                False,
+            )
+        )
+        body = mod.block(
+            None,
+            [
+                # Align to 8 bytes, the host may leave the heap pointer anywhere
+                mod.local_set(
+                    pointer_index,
+                    mod.binary(
+                        ops.AndInt32(),
+                        mod.binary(
+                            ops.AddInt32(),
+                            mod.global_get(HEAP_POINTER_NAME, Int32),
+                            mod.i32(7),
+                        ),
+                        mod.i32(-8),
+                    ),
+                ),
+                mod.local_set(
+                    end_index,
+                    mod.binary(ops.AddInt32(), get(pointer_index), get(size_index)),
+                ),
+                # Trap if the end wrapped around, or the memory can't grow
+                mod.If(
+                    mod.binary(ops.LtUInt32(), get(end_index), get(pointer_index)),
+                    mod.unreachable(),
+                    None,
+                ),
+                mod.If(
+                    mod.binary(ops.GtUInt32(), get(end_index), memory_bytes()),
+                    mod.If(
+                        mod.binary(ops.EqInt32(), grow, mod.i32(-1)),
+                        mod.unreachable(),
+                        None,
+                    ),
+                    None,
+                ),
+                mod.global_set(HEAP_POINTER_NAME, get(end_index)),
+                get(pointer_index),
+            ],
+            Int32,
+        )
+        mod.add_function(
+            ALLOC_NAME, binaryen.type.create([Int32]), Int32, [Int32, Int32], body
+        )
+        return ALLOC_NAME
+
+    def _new_memory_array(
+        self, element_type: BinaryenType, length: binaryen.Expression
+    ) -> tuple[int, int, list[binaryen.Expression]]:
+        """Allocate an array of length elements in linear memory. Returns the locals holding its pointer and its
+        length, and the expressions which allocate it. The elements are not initialised.
+        """
+        mod = self.module
+        pointer = self.func_ref.add_var(Int32)
+        length_local = self.func_ref.add_var(Int32)
+        size = mod.binary(
+            binaryen.operations.AddInt32(),
+            mod.binary(
+                binaryen.operations.MulInt32(),
+                mod.local_get(length_local, Int32),
+                mod.i32(get_type_size(element_type)),
+            ),
+            mod.i32(ARRAY_HEADER_SIZE),
+        )
+        expressions = [
+            mod.local_set(length_local, length),
+            mod.local_set(pointer, mod.call(self._get_alloc_function(), [size], Int32)),
+            mod.store(
+                4,
+                0,
+                4,
+                mod.local_get(pointer, Int32),
+                mod.local_get(length_local, Int32),
+                Int32,
+                MEMORY_NAME,
+            ),
+        ]
+        return pointer, length_local, expressions
+
+    def _get_array_length(self, name: str) -> binaryen.Expression:
+        pointer = self.module.local_get(self.variable_indexes[name], Int32)
+        return self.module.load(4, False, 0, 4, Int32, pointer, MEMORY_NAME)
+
+    def _get_array_element_address(
+        self, name: str, index_node: AST, lineno: int
+    ) -> binaryen.Expression:
+        """Get the address of an element of an array in linear memory, less the header, trapping if the index is out of
+        bounds"""
+        size = get_type_size(self.memory_arrays[name])
+
+        index = self._cast_numeric_to_type(self.visit(index_node), Int32, lineno)
+        index_local = self.func_ref.add_var(Int32)
+        get_index = lambda: self.module.local_get(index_local, Int32)
+
+        # An unsigned comparison also catches negative indexes
+        bounds_check = self.module.If(
+            self.module.binary(
+                binaryen.operations.GeUInt32(),
+                get_index(),
+                self._get_array_length(name),
+            ),
+            self.module.unreachable(),
+            None,
+        )
+        address = self.module.binary(
+            binaryen.operations.AddInt32(),
+            self.module.local_get(self.variable_indexes[name], Int32),
+            self.module.binary(
+                binaryen.operations.MulInt32(), get_index(), self.module.i32(size)
+            ),
+        )
+        return self.module.block(
+            None,
+            [self.module.local_set(index_local, index), bounds_check, address],
+            Int32,
+        )
+
+    def _load_array_element(self, name: str, index_node: AST, lineno: int):
+        element_type = self.memory_arrays[name]
+        size = get_type_size(element_type)
+        address = self._get_array_element_address(name, index_node, lineno)
+        return self.module.load(
+            size, True, ARRAY_HEADER_SIZE, size, element_type, address, MEMORY_NAME
+        )
+
+    def _store_array_element(
+        self, name: str, index_node: AST, value: binaryen.Expression, lineno: int
+    ):
+        element_type = self.memory_arrays[name]
+        size = get_type_size(element_type)
+        address = self._get_array_element_address(name, index_node, lineno)
+        value = self._cast_numeric_to_type(value, element_type, lineno)
+        return self.module.store(
+            size, ARRAY_HEADER_SIZE, size, address, value, element_type, MEMORY_NAME
+        )
+
     def visit_Subscript(self, node: Subscript):
         if self.func_ref is None:
             return None
+        if isinstance(node.value, Name) and node.value.id in self.buffers:
+            if not isinstance(node.ctx, Load):
+                raise NotImplementedError(
+                    f'Buffers can only be read or assigned to with a subscript. "{self.filename}", line {node.lineno}.'
+                )
+            return self._load_buffer_element(node.value.id, node.slice, node.lineno)
+        if isinstance(node.value, Name) and node.value.id in self.memory_arrays:
+            if not isinstance(node.ctx, Load):
+                raise NotImplementedError(
+                    f'Arrays can only be read or assigned to with a subscript. "{self.filename}", line {node.lineno}.'
+                )
+            return self._load_array_element(node.value.id, node.slice, node.lineno)
         if not self.gc:
             raise RuntimeError(
-                "Enable Garbage Collection with the -gc flag to use arrays"
+                f'Only arrays and buffers can be subscripted. "{self.filename}", line {node.lineno}.'
             )
 
         value = self.visit(node.value)
@@ -1115,6 +2757,11 @@ class Compiler(NodeVisitor):
                 binaryen_type = self.scoped_globals[node.id]
                 return self.module.global_get(ascii_name, binaryen_type)
 
+            if node.id in self.buffers:
+                raise RuntimeError(
+                    f'Buffers can only be subscripted, passed to len() or passed to another function. "{self.filename}", line {node.lineno}.'
+                )
+
             raise RuntimeError(f"Trying to load an undeclared variable {node.id}")
         if isinstance(node.ctx, Store):
             raise RuntimeError("This code should never be reached")
@@ -1124,16 +2771,34 @@ class Compiler(NodeVisitor):
     def visit_List(self, node: List):
         if self.func_ref is None:
             return None
-        if not self.gc:
-            raise RuntimeError(
-                "Enable Garbage Collection with the -gc flag to use arrays"
-            )
-
         if not isinstance(node.parent, AnnAssign):
             raise RuntimeError("Lists must be assigned with an annotation.")
         array_type = get_binaryen_type(node.parent.annotation, self.object_aliases)
         array_element_type = binaryen.type.array_type.get_element_type(array_type)
 
+        if not self.gc:
+            size = get_type_size(array_element_type)
+            pointer, _length, expressions = self._new_memory_array(
+                array_element_type, self.module.i32(len(node.elts))
+            )
+            for i, element in enumerate(node.elts):
+                value = self._cast_numeric_to_type(
+                    self.visit(element), array_element_type, node.lineno
+                )
+                expressions.append(
+                    self.module.store(
+                        size,
+                        ARRAY_HEADER_SIZE + i * size,
+                        size,
+                        self.module.local_get(pointer, Int32),
+                        value,
+                        array_element_type,
+                        MEMORY_NAME,
+                    )
+                )
+            expressions.append(self.module.local_get(pointer, Int32))
+            return self.module.block(None, expressions, Int32)
+
         elements = []
         for element in node.elts:
             wasm_element = self.visit(element)
@@ -1,22 +1,86 @@
-import inspect
-from typing import Callable, Sequence, TypeVar
+import importlib
+from functools import update_wrapper, wraps
+from typing import Callable, Iterable, Iterator, Sequence, TypeVar
 
-from .file_handler import compile_file, get_wasm_runner
+from .optimise import OptimisationSettings
+from .runtime import WasmRuntime, get_runtime
 from .types import wasmfuncBaseType
 
 wasmfuncType = TypeVar("wasmfuncType", bound=wasmfuncBaseType)
 
 
+def _import_function(module_name: str, qualname: str):
+    # Pickled wrappers are loaded by reference, the same way pickle handles plain functions
+    value = importlib.import_module(module_name)
+    for attribute in qualname.split("."):
+        value = getattr(value, attribute)
+    return value
+
+
+class WasmFunction:
+    """A python function which is executed as Wasm. Returned by `@wasmfunc(exec=True)`"""
+
+    def __init__(
+        self, python_function: Callable[..., wasmfuncType], runtime: WasmRuntime
+    ) -> None:
+        update_wrapper(self, python_function)
+        self.runtime = runtime
+        self._wasm_function: Callable | None = None
+
+    def __call__(self, *args: Sequence[wasmfuncType]) -> wasmfuncType:
+        wasm_function = self._wasm_function
+        if wasm_function is None:
+            wasm_function = self.runtime.get_function(self.__name__)
+            self._wasm_function = wasm_function
+
+        result = wasm_function(*args)
+        return result
+
+    def map(
+        self, iterable: Iterable[tuple], workers: int | None = None, chunksize=1
+    ) -> Iterator[wasmfuncType]:
+        """Call the function with every tuple of arguments in iterable, using a pool of `workers` processes.
+        The compiled module is sent to each worker once. Results are yielded in the same order as the arguments.
+        """
+        return self.runtime.map(self.__name__, iterable, workers, chunksize)
+
+    def vectorize(self, *arrays, out=None):
+        """Call the function on every element of NumPy arrays (one array per argument) with a single call into Wasm.
+        Results are written to `out` if it is given, otherwise they are returned in a new array.
+        """
+        return self.runtime.vectorize(self.__name__, *arrays, out=out)
+
+    def __reduce__(self):
+        return (_import_function, (self.__module__, self.__qualname__))
+
+
 def wasmfunc(
     exec=False,
     enable_gc=False,
     enable_str=False,
+    optimise: bool | int | str = False,
+    cache=True,
+    eager=False,
+    always_inline_max_size: int | None = None,
+    flexible_inline_max_size: int | None = None,
+    passes: Sequence[str] = (),
+    profile: str | None = None,
 ):
-    """Mark a python function as Wasm compilable. Will be executed as regular python, unless exec is set to true. To compile this function to Wasm, run `wasmfunc your_file.py`"""
+    """Mark a python function as Wasm compilable. Will be executed as regular python, unless exec is set to true. To compile this function to Wasm, run `wasmfunc your_file.py`
+
+    When exec is true the compiled module is kept in a disk cache (see `wasmfunc.cache`), set cache to false to always compile from source.
+    The module is compiled on the first call, unless eager is true, in which case it starts compiling in a background thread straight away.
+
+    optimise is an optimisation level like the CLI's -O flags: 0 to 4, "s" or "z", or True for the default level ("s").
+    always_inline_max_size and flexible_inline_max_size set binaryen's inlining thresholds, and passes is a list of
+    binaryen passes to run after the level's pipeline, e.g. `passes=["precompute", "vacuum"]`.
+    profile is the path of a profile written by `wasmfunc profile`, which guides branch layout, function order and inlining.
+    """
 
     def decorator(python_function: Callable[..., wasmfuncType]):
         if not exec:
 
+            @wraps(python_function)
             def run_as_python_wrapper(*args: Sequence[wasmfuncType]) -> wasmfuncType:
                 # Call the wrapped function normally
                 result = python_function(*args)
@@ -24,18 +88,20 @@ def wasmfunc(
 
             return run_as_python_wrapper
 
-        def run_as_wasm_wrapper(*args: Sequence[wasmfuncType]) -> wasmfuncType:
-            file_info = inspect.getframeinfo(inspect.currentframe().f_back)
-            file_path = file_info.filename
-
-            compiler = compile_file(
-                file_path, enable_gc=enable_gc, enable_str=enable_str
-            )
-            runner = get_wasm_runner(compiler, enable_gc=enable_gc)
-
-            result = runner(python_function.__name__, args)
-            return result
+        # Every decorated function in a file shares one compiled module, which is built on the first call (or in the background if eager)
+        runtime = get_runtime(
+            python_function.__code__.co_filename,
+            enable_gc=enable_gc,
+            enable_str=enable_str,
+            optimise=OptimisationSettings.from_options(
+                optimise, always_inline_max_size, flexible_inline_max_size, passes
+            ),
+            use_cache=cache,
+            profile=profile,
+        )
+        if eager:
+            runtime.load_in_background()
 
-        return run_as_wasm_wrapper
+        return WasmFunction(python_function, runtime)
 
     return decorator
@@ -1,38 +1,87 @@
+import array
 import ast
+import base64
+import json
 import os
 import subprocess
+import threading
+import weakref
+from glob import glob
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from wasmtime import Instance, Module, Store
+from .timings import CompileTimings, measure
 
-from .compiler import Compiler
-from .pre_compiler import PreCompiler
+if TYPE_CHECKING:
+    from .compiler import Compiler
+    from .profile import Profile
 
 
-def compile_file(input_path: str, enable_gc=False, enable_str=False):
+def compile_file(
+    input_path: str,
+    enable_gc=False,
+    enable_str=False,
+    vectorize=False,
+    timings: "CompileTimings | None" = None,
+    instrument=False,
+    profile: "Profile | None" = None,
+):
+    """Compile a python file to a Wasm module. If timings is given, the time and memory used by each stage is recorded in it.
+    instrument adds the counters used by `profile.profile_file`, and profile is a profile to optimise the module with.
+    """
+    # Imported here so that binaryen is only loaded when something is compiled
+    from .compiler import Compiler
+    from .pre_compiler import PreCompiler
+
     with open(input_path, "r", encoding="utf-8") as file:
         code = file.read()
         path = os.path.split(input_path)
         filename = path[-1]
-        tree = ast.parse(code, filename=filename, type_comments=True)
-        pre_compiler = PreCompiler()
-        pre_compiler.visit(tree)
+        with measure(timings, "ast.parse"):
+            tree = ast.parse(code, filename=filename, type_comments=True)
+        with measure(timings, "pre_compile"):
+            pre_compiler = PreCompiler()
+            pre_compiler.visit(tree)
         compiler = Compiler(
             filename,
             pre_compiler.argument_types,
             pre_compiler.return_type,
             enable_gc=enable_gc,
             enable_str=enable_str,
+            vectorize=vectorize,
+            statements=pre_compiler.statements,
+            instrument=instrument,
+            profile=profile,
         )
-        compiler.visit(tree)
+        compiler.timings = timings
+        with measure(timings, "compile"):
+            compiler.visit(tree)
 
-        compiler.module.auto_drop()
-        if not compiler.module.validate():
-            compiler.module.print()
-            raise RuntimeError("Wasm module is not valid!")
+        validate_module(compiler, timings)
         return compiler
 
 
+def validate_module(compiler: "Compiler", timings: "CompileTimings | None" = None):
+    with measure(timings, "auto_drop"):
+        compiler.module.auto_drop()
+    with measure(timings, "validate"):
+        valid = compiler.module.validate()
+    if not valid:
+        compiler.module.print()
+        raise RuntimeError("Wasm module is not valid!")
+
+
+def find_source_files(paths: list[str]) -> list[str]:
+    """Expand directories to the python files inside them"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob(os.path.join(path, "**", "*.py"), recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
 def generate_output_path(input_path: str, binary=True):
     """Generates a corresponding output path for an input path. E.g. `a/b/c.py` becomes `a/b/c.wasm`.
 
@@ -82,38 +131,163 @@ def execute_wasm_binary_with_deno(file, function, arguments):
 
     value = result.stdout.decode().strip()
 
+    # Results are printed in full, parse them as an int first so i64 values keep their precision
     try:
-        value = int(value)
+        return int(value)
     except ValueError:
         pass
     try:
-        value = float(value)
+        return float(value)
     except ValueError:
         pass
     return value
 
 
-def get_wasm_runner(compiler: Compiler, enable_gc=False):
-    if enable_gc:
+def _read_uleb128(binary: bytes, offset: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = binary[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte & 0x80 == 0:
+            return value, offset
+
+
+def read_custom_section(binary: bytes, name: str) -> bytes | None:
+    """Get the contents of the custom section `name` of a Wasm binary, or None if it doesn't have one"""
+    # Skip the magic number and version
+    offset = 8
+    while offset < len(binary):
+        section_id = binary[offset]
+        size, offset = _read_uleb128(binary, offset + 1)
+        end = offset + size
+        if section_id == 0:
+            name_length, name_offset = _read_uleb128(binary, offset)
+            section_name = binary[name_offset : name_offset + name_length]
+            if section_name.decode("utf-8") == name:
+                return binary[name_offset + name_length : end]
+        offset = end
+    return None
+
+
+def _stop_deno_process(process: subprocess.Popen):
+    if process.poll() is None:
+        process.stdin.close()
+        process.kill()
+        process.wait()
+
+
+class DenoWorker:
+    """A long running deno process that instantiates a WasmGC binary once and then serves calls to it.
+    Calls are sent over stdin and stdout, one JSON message per line (see `runWasmGC.js --serve`).
+    """
+
+    def __init__(self, binary: bytes) -> None:
+        self.binary = binary
+        self._process: subprocess.Popen | None = None
+        # The process handles one call at a time, a call from another thread waits for the previous one to finish
+        self._lock = threading.Lock()
+
+    def _start(self):
+        js_path = Path(__file__).parent.joinpath("runWasmGC.js")
+        command = [
+            "deno",
+            "run",
+            "-A",
+            "--v8-flags=--experimental-wasm-stringref",
+            str(js_path),
+            "--serve",
+        ]
+        try:
+            process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+        except FileNotFoundError as error:
+            raise RuntimeError(
+                "deno is required to run WasmGC modules, see https://deno.com"
+            ) from error
+        # Make sure the process doesn't outlive the worker, or the interpreter
+        self._finalizer = weakref.finalize(self, _stop_deno_process, process)
+        self._process = process
+        self._send({"binary": base64.b64encode(self.binary).decode("ascii")})
+
+    def _send(self, message: dict):
+        process = self._process
+        process.stdin.write(json.dumps(message).encode("utf-8") + b"\n")
+        process.stdin.flush()
+        line = process.stdout.readline()
+        if not line:
+            self.close()
+            raise RuntimeError("The deno WasmGC worker exited unexpectedly")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"Error in WasmGC runner: {response['error']}")
+        return response["result"]
+
+    def call(self, function: str, arguments, itemsize: int | None = None) -> str:
+        """Call an exported function and return its result as a string.
+        If itemsize is given the function must be a `__result_<name>` export, and the returned array elements are sent
+        back base64 encoded."""
+        message = {"function": function, "args": list(map(str, arguments))}
+        if itemsize is not None:
+            message["itemsize"] = itemsize
+        with self._lock:
+            if self._process is None:
+                self._start()
+            return self._send(message)
+
+    def close(self):
+        if self._process is not None:
+            self._finalizer()
+            self._process = None
+
+
+def get_wasm_gc_runner(binary: bytes):
+    """Get a runner that executes a WasmGC binary in a persistent deno worker"""
+    from . import memory
+    from .compiler import RESULT_PREFIX, SIGNATURE_SECTION_NAME
+
+    worker = DenoWorker(binary)
+    signatures = read_custom_section(binary, SIGNATURE_SECTION_NAME)
+    result_types = {
+        name: signature["result"]
+        for name, signature in json.loads(signatures or "{}").items()
+    }
+
+    def run_wasm_gc_func(fn_name, variables_list):
+        result_type = result_types.get(fn_name)
+        if result_type is not None and result_type.startswith("array["):
+            element_type = result_type[6:-1]
+            itemsize = array.array(memory.TYPECODES[element_type]).itemsize
+            data = worker.call(RESULT_PREFIX + fn_name, variables_list, itemsize)
+            return memory.bytes_to_array(base64.b64decode(data), element_type)
+
+        value = worker.call(fn_name, variables_list)
+        match result_type:
+            case "i32" | "i64":
+                return int(value)
+            case "f32" | "f64":
+                return float(value)
+            case "none":
+                return None
+        return value
 
-        def run_wasm_gc_func(fn_name, variables_list):
-            binary_name = f"./gc_runner_{compiler.filename}.wasm"
-            compiler.module.write_binary(binary_name)
+    return run_wasm_gc_func
 
-            value = execute_wasm_binary_with_deno(binary_name, fn_name, variables_list)
-            os.remove(binary_name)
 
-            return value
+def get_wasm_runner(compiler: "Compiler", enable_gc=False):
+    from .runtime import WasmRuntime, runs_in_process
 
-        return run_wasm_gc_func
+    if not runs_in_process(compiler.str):
+        return get_wasm_gc_runner(compiler.emit_binary())
     else:
-        # Instantiate wasm runtime
-        wasm_store = Store()
-        wasm_module = Module(wasm_store.engine, compiler.module.emit_binary())
-        wasm_instance = Instance(wasm_store, wasm_module, [])
+        # Use a runtime, so that arrays passed as buf arguments are copied into linear memory in bulk
+        runtime = WasmRuntime.from_binary(compiler.emit_binary(), enable_gc)
 
         def run_wasm_func(wt_name, variables_list):
-            wasm_func = wasm_instance.exports(wasm_store)[wt_name]
-            return wasm_func(wasm_store, *variables_list)
+            return runtime.get_function(wt_name)(*variables_list)
 
         return run_wasm_func
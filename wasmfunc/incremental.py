@@ -0,0 +1,153 @@
+"""Function level incremental recompilation.
+
+`IncrementalCompiler` keeps the binaryen module of a source file between compiles. Every Wasm function is keyed by a
+hash of its AST and of the signatures of the functions it calls, and only functions whose key has changed are compiled
+again. Everything else at the top level of the file (imports, globals, other code) can affect any function, so a change
+there rebuilds the whole module.
+"""
+
+import ast
+import hashlib
+import os
+from ast import Call, FunctionDef, Name
+from typing import TYPE_CHECKING
+
+from .file_handler import validate_module
+
+if TYPE_CHECKING:
+    import binaryen
+
+    from .compiler import Compiler
+    from .pre_compiler import PreCompiler
+
+
+def copy_module(compiler: "Compiler") -> "binaryen.Module":
+    """Copy a compiled module, signature section included, by reading back its binary. The copy can be optimised without
+    touching the module an `IncrementalCompiler` keeps."""
+    import binaryen
+
+    binary = compiler.emit_binary()
+    module = binaryen.Module.__new__(binaryen.Module)
+    module.ref = binaryen.lib.BinaryenModuleRead(
+        binaryen.ffi.new("char[]", binary), len(binary)
+    )
+    module.set_feature(compiler.module.get_features())
+    return module
+
+
+class IncrementalCompiler:
+    """Compiles a source file to Wasm, reusing the compiled functions from the previous compile which haven't changed.
+    The module returned by `compile` is updated in place by the next compile, so emit or copy it before compiling again,
+    and never optimise it in place (inlining would leave stale copies of recompiled functions behind), optimise a
+    `copy_module` instead. If a compile fails the kept module is thrown away and the next compile rebuilds it.
+    """
+
+    def __init__(
+        self, input_path: str, enable_gc=False, enable_str=False, vectorize=False
+    ) -> None:
+        self.input_path = input_path
+        self.enable_gc = enable_gc
+        self.enable_str = enable_str
+        self.vectorize = vectorize
+
+        self.compiler: "Compiler | None" = None
+        self._module_key: str | None = None
+        self._function_keys: dict[str, str] = {}
+        # The functions compiled by the last call to compile
+        self.recompiled: list[str] = []
+
+    def _get_module_key(self, tree: ast.Module, functions: dict[str, FunctionDef]):
+        digest = hashlib.sha256()
+        digest.update(f"gc={self.enable_gc} str={self.enable_str}".encode("utf-8"))
+        digest.update(f"vectorize={self.vectorize}".encode("utf-8"))
+        for node in tree.body:
+            if isinstance(node, FunctionDef) and functions.get(node.name) is node:
+                continue
+            digest.update(ast.dump(node).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _get_function_key(self, node: FunctionDef, pre_compiler: "PreCompiler"):
+        from .pre_compiler import get_type_name
+
+        digest = hashlib.sha256()
+        digest.update(ast.dump(node).encode("utf-8"))
+        # Calls are compiled using the signature of the callee, so a change to it must recompile the caller
+        callees = {
+            call.func.id
+            for call in ast.walk(node)
+            if isinstance(call, Call) and isinstance(call.func, Name)
+        }
+        for callee in sorted(callees):
+            if callee in pre_compiler.argument_types:
+                params = map(get_type_name, pre_compiler.argument_types[callee])
+                result = get_type_name(pre_compiler.return_type[callee])
+                digest.update(f"{callee}({','.join(params)})->{result}".encode())
+        return digest.hexdigest()
+
+    def compile(self) -> "Compiler":
+        from .compiler import Compiler
+        from .pre_compiler import PreCompiler
+
+        with open(self.input_path, "r", encoding="utf-8") as file:
+            code = file.read()
+        filename = os.path.split(self.input_path)[-1]
+        tree = ast.parse(code, filename=filename, type_comments=True)
+        pre_compiler = PreCompiler()
+        pre_compiler.visit(tree)
+
+        # Only top level functions can be recompiled on their own
+        functions = {
+            node.name: node
+            for node in tree.body
+            if isinstance(node, FunctionDef)
+            and node.name in pre_compiler.argument_types
+        }
+        module_key = self._get_module_key(tree, functions)
+        function_keys = {
+            name: self._get_function_key(node, pre_compiler)
+            for name, node in functions.items()
+        }
+
+        if self.compiler is None or module_key != self._module_key:
+            compiler = Compiler(
+                filename,
+                pre_compiler.argument_types,
+                pre_compiler.return_type,
+                enable_gc=self.enable_gc,
+                enable_str=self.enable_str,
+                vectorize=self.vectorize,
+                statements=pre_compiler.statements,
+            )
+            compiler.visit(tree)
+            validate_module(compiler)
+            self.recompiled = list(functions)
+        else:
+            compiler = self.compiler
+            changed = [
+                name
+                for name, key in function_keys.items()
+                if self._function_keys.get(name) != key
+            ]
+            removed = [name for name in self._function_keys if name not in functions]
+
+            try:
+                compiler.function_arguments = pre_compiler.argument_types
+                compiler.function_returns = pre_compiler.return_type
+                for name in changed + removed:
+                    compiler.remove_function(name)
+                for name in changed:
+                    compiler.visit(functions[name])
+                    compiler.add_wrapper_functions(name)
+                validate_module(compiler)
+            except BaseException:
+                # The module is left half updated, so start again from scratch on the next compile
+                self.compiler = None
+                self._module_key = None
+                self._function_keys = {}
+                raise
+            self.recompiled = changed
+
+        self.compiler = compiler
+        self._module_key = module_key
+        self._function_keys = function_keys
+        return compiler
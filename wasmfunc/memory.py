@@ -0,0 +1,133 @@
+"""Helpers for moving arrays in and out of the linear memory exported by a wasmtime instance.
+
+NumPy is an optional dependency (`pip install wasmfunc[numpy]`), it is only imported when the NumPy helpers are used.
+"""
+
+import array
+
+WASM_PAGE_SIZE = 65536
+
+# Wasm value types, as printed by wasmtime, to NumPy dtype names
+DTYPES = {"i32": "int32", "i64": "int64", "f32": "float32", "f64": "float64"}
+
+# Wasm value types to `array.array` type codes
+TYPECODES = {"i32": "i", "i64": "q", "f32": "f", "f64": "d"}
+
+
+def import_numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError(
+            "NumPy is required to pass arrays to Wasm, install it with `pip install wasmfunc[numpy]`"
+        ) from error
+    return numpy
+
+
+def align(offset: int, alignment=8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def ensure_memory_size(memory, store, size: int):
+    """Grow a wasmtime memory so it is at least `size` bytes long"""
+    current_size = memory.data_len(store)
+    if current_size < size:
+        missing_pages = -(-(size - current_size) // WASM_PAGE_SIZE)
+        memory.grow(store, missing_pages)
+
+
+def get_memory_array(memory, store, offset: int, dtype, count: int):
+    """Get a NumPy array which is a view of `count` elements of linear memory starting at `offset`.
+    The view stays valid when the memory grows as long as the engine doesn't move memory, see `runtime.create_engine`.
+    """
+    numpy = import_numpy()
+    dtype = numpy.dtype(dtype)
+    memory_bytes = numpy.ctypeslib.as_array(
+        memory.data_ptr(store), shape=(memory.data_len(store),)
+    )
+    return memory_bytes[offset : offset + count * dtype.itemsize].view(dtype)
+
+
+def get_memory_address(memory, store) -> int:
+    import ctypes
+
+    return ctypes.cast(memory.data_ptr(store), ctypes.c_void_p).value
+
+
+def get_memory_offset(array, memory, store) -> int | None:
+    """Get the offset of a NumPy array in linear memory, or None if the array does not live in it"""
+    numpy = import_numpy()
+    if not isinstance(array, numpy.ndarray) or not array.flags.c_contiguous:
+        return None
+    offset = array.ctypes.data - get_memory_address(memory, store)
+    if offset < 0 or offset + array.nbytes > memory.data_len(store):
+        return None
+    return offset
+
+
+def allocate(memory, heap_pointer, store, size: int) -> int:
+    """Reserve `size` bytes of linear memory by bumping the module's heap pointer, growing the memory if needed.
+    Returns the offset of the reserved space."""
+    offset = align(heap_pointer.value(store))
+    end = offset + size
+    ensure_memory_size(memory, store, end)
+    heap_pointer.set_value(store, end)
+    return offset
+
+
+def bytes_to_array(data: bytes, type_name: str) -> array.array:
+    result = array.array(TYPECODES[type_name])
+    result.frombytes(data)
+    return result
+
+
+def read_array(memory, store, offset: int, type_name: str, count: int) -> array.array:
+    """Copy `count` elements of linear memory starting at `offset` into an `array.array`.
+    This doesn't need NumPy, but the result supports the buffer protocol, so `numpy.frombuffer` can wrap it without
+    copying."""
+    import ctypes
+
+    result = array.array(TYPECODES[type_name], [0]) * count
+    if count > 0:
+        address, _length = result.buffer_info()
+        ctypes.memmove(
+            address,
+            get_memory_address(memory, store) + offset,
+            count * result.itemsize,
+        )
+    return result
+
+
+def write_memory_array(memory, heap_pointer, store, values, type_name: str) -> int:
+    """Copy a sequence into a new array in linear memory, laid out like the arrays the Wasm module allocates (see
+    `compiler.ARRAY_HEADER_SIZE`). Returns the pointer to the array."""
+    import ctypes
+
+    from .compiler import ARRAY_HEADER_SIZE
+
+    elements = array.array(TYPECODES[type_name], values)
+    header = array.array("i", [len(elements)])
+    pointer = allocate(
+        memory,
+        heap_pointer,
+        store,
+        ARRAY_HEADER_SIZE + len(elements) * elements.itemsize,
+    )
+    address = get_memory_address(memory, store) + pointer
+    ctypes.memmove(address, header.buffer_info()[0], header.itemsize)
+    if len(elements) > 0:
+        ctypes.memmove(
+            address + ARRAY_HEADER_SIZE,
+            elements.buffer_info()[0],
+            len(elements) * elements.itemsize,
+        )
+    return pointer
+
+
+def read_memory_array(memory, store, pointer: int, type_name: str) -> array.array:
+    """Copy an array the Wasm module allocated in linear memory into an `array.array`. pointer points at the length of
+    the array, followed by its elements (see `compiler.ARRAY_HEADER_SIZE`)."""
+    from .compiler import ARRAY_HEADER_SIZE
+
+    count = read_array(memory, store, pointer, "i32", 1)[0]
+    return read_array(memory, store, pointer + ARRAY_HEADER_SIZE, type_name, count)
@@ -0,0 +1,117 @@
+from ast import Call, Import, ImportFrom
+from typing import TYPE_CHECKING
+
+import binaryen
+
+if TYPE_CHECKING:
+    from .compiler import Compiler
+
+# The functions of python's math module which compile to a single Wasm instruction. Unlike python, they never raise:
+# e.g. math.sqrt(-1) is NaN rather than a ValueError. math.floor, math.ceil and math.trunc round a float to a whole
+# number of the same float type, the conversion to an integer only happens if the result is used as one.
+
+Int32 = binaryen.type.Int32
+Int64 = binaryen.type.Int64
+Float32 = binaryen.type.Float32
+Float64 = binaryen.type.Float64
+
+
+def handle_Import(node: Import, math_aliases: list[str]):
+    # Record if math is imported, or if its imported under an alias
+    for module in node.names:
+        if module.name == "math":
+            math_aliases.append(module.asname if module.asname is not None else "math")
+
+
+def handle_ImportFrom(node: ImportFrom, math_functions: dict[str, str]):
+    # Record the functions imported from math, by the name they are used under
+    if node.module != "math":
+        return
+    for function in node.names:
+        math_functions[function.asname or function.name] = function.name
+
+
+def _visit_arguments(
+    compiler: "Compiler", node: Call, name: str, count: int
+) -> list[binaryen.Expression]:
+    if node.args.__len__() != count:
+        raise RuntimeError(
+            f'math.{name} takes {count} argument(s). "{compiler.filename}", line {node.lineno}.'
+        )
+    return [compiler.visit(argument) for argument in node.args]
+
+
+def _to_float(compiler: "Compiler", value: binaryen.Expression, lineno: int):
+    # Integers become f64, as python converts them to a float
+    if value.get_type() in [Float32, Float64]:
+        return value
+    return compiler._cast_numeric_to_type(value, Float64, lineno)
+
+
+def sqrt(compiler: "Compiler", node: Call):
+    [value] = _visit_arguments(compiler, node, "sqrt", 1)
+    value = _to_float(compiler, value, node.lineno)
+    if value.get_type() == Float32:
+        op = binaryen.operations.SqrtFloat32()
+    else:
+        op = binaryen.operations.SqrtFloat64()
+    return compiler.module.unary(op, value)
+
+
+def _round(compiler: "Compiler", node: Call, name: str, f32_op, f64_op):
+    [value] = _visit_arguments(compiler, node, name, 1)
+    match value.get_type():
+        case binaryen.type.Float32:
+            return compiler.module.unary(f32_op, value)
+        case binaryen.type.Float64:
+            return compiler.module.unary(f64_op, value)
+        case binaryen.type.Int32 | binaryen.type.Int64:
+            # Integers are already whole numbers
+            return value
+    raise RuntimeError(
+        f'math.{name} needs a number. "{compiler.filename}", line {node.lineno}.'
+    )
+
+
+def floor(compiler: "Compiler", node: Call):
+    ops = binaryen.operations
+    return _round(compiler, node, "floor", ops.FloorFloat32(), ops.FloorFloat64())
+
+
+def ceil(compiler: "Compiler", node: Call):
+    ops = binaryen.operations
+    return _round(compiler, node, "ceil", ops.CeilFloat32(), ops.CeilFloat64())
+
+
+def trunc(compiler: "Compiler", node: Call):
+    ops = binaryen.operations
+    return _round(compiler, node, "trunc", ops.TruncFloat32(), ops.TruncFloat64())
+
+
+def copysign(compiler: "Compiler", node: Call):
+    [magnitude, sign] = _visit_arguments(compiler, node, "copysign", 2)
+    magnitude, sign = compiler._cast_numeric_to_matching(magnitude, sign, node.lineno)
+    magnitude = _to_float(compiler, magnitude, node.lineno)
+    sign = _to_float(compiler, sign, node.lineno)
+    if magnitude.get_type() == Float32:
+        op = binaryen.operations.CopySignFloat32()
+    else:
+        op = binaryen.operations.CopySignFloat64()
+    return compiler.module.binary(op, magnitude, sign)
+
+
+FUNCTIONS = {
+    "sqrt": sqrt,
+    "floor": floor,
+    "ceil": ceil,
+    "trunc": trunc,
+    "copysign": copysign,
+}
+
+
+def call(compiler: "Compiler", name: str, node: Call):
+    if name not in FUNCTIONS:
+        raise RuntimeError(
+            f'math.{name} is not supported in Wasm functions. "{compiler.filename}", line {node.lineno}.'
+        )
+    return FUNCTIONS[name](compiler, node)
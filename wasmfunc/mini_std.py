@@ -1,4 +1,4 @@
-from ast import AnnAssign, Call, Name
+from ast import AST, AnnAssign, Call, Constant, Name
 from typing import TYPE_CHECKING
 
 import binaryen
@@ -12,9 +12,6 @@ if TYPE_CHECKING:
 
 
 def list(compiler: "Compiler", node: Call):
-    if not compiler.gc:
-        raise RuntimeError("Enable Garbage Collection with the -gc flag to use arrays")
-
     if node.args.__len__() != 1:
         raise RuntimeError
 
@@ -52,6 +49,11 @@ def list(compiler: "Compiler", node: Call):
                 step, binaryen.type.Int32, node.lineno
             )
 
+            if not compiler.gc:
+                return _memory_range(
+                    compiler, node, array_element_type, start, stop, step
+                )
+
             # create array with length ceil((stop - start)/step) == ((stop - start) + step - 1) / step;
             # source: https://stackoverflow.com/questions/2745074/fast-ceiling-of-an-integer-division-in-c-c
             minus_op = binaryen.operations.SubInt32()
@@ -141,9 +143,126 @@ def list(compiler: "Compiler", node: Call):
             raise RuntimeError()
 
 
+def _memory_range(
+    compiler: "Compiler",
+    node: Call,
+    element_type: "binaryen.internals.BinaryenType",
+    start: binaryen.Expression,
+    stop: binaryen.Expression,
+    step: binaryen.Expression,
+):
+    """list(range(start, stop, step)) as an array in linear memory"""
+    from .compiler import ARRAY_HEADER_SIZE, MEMORY_NAME, get_type_size
+
+    mod = compiler.module
+    ops = binaryen.operations
+    Int32 = binaryen.type.Int32
+    Float64 = binaryen.type.Float64
+    start_local = compiler.func_ref.add_var(Int32)
+    step_local = compiler.func_ref.add_var(Int32)
+    value_local = compiler.func_ref.add_var(Int32)
+    i_local = compiler.func_ref.add_var(Int32)
+    get = lambda index: mod.local_get(index, Int32)
+
+    # ceil((stop - start) / step), which is negative for an empty range. A step of 0 traps when truncating.
+    length = compiler._cast_numeric_to_type(
+        mod.unary(
+            ops.CeilFloat64(),
+            mod.binary(
+                ops.DivFloat64(),
+                compiler._cast_numeric_to_type(
+                    mod.binary(ops.SubInt32(), stop, get(start_local)),
+                    Float64,
+                    node.lineno,
+                ),
+                compiler._cast_numeric_to_type(get(step_local), Float64, node.lineno),
+            ),
+        ),
+        Int32,
+        node.lineno,
+    )
+    range_length = compiler.func_ref.add_var(Int32)
+    setup = [
+        mod.local_set(start_local, start),
+        mod.local_set(step_local, step),
+        mod.local_set(range_length, length),
+    ]
+    pointer, length_local, allocate = compiler._new_memory_array(
+        element_type,
+        mod.select(
+            mod.binary(ops.GtSInt32(), get(range_length), mod.i32(0)),
+            get(range_length),
+            mod.i32(0),
+            Int32,
+        ),
+    )
+
+    size = get_type_size(element_type)
+    loop_name = f"range_{id(node)}".encode("ascii")
+    exit_name = f"range_exit_{id(node)}".encode("ascii")
+    store = mod.store(
+        size,
+        ARRAY_HEADER_SIZE,
+        size,
+        mod.binary(
+            ops.AddInt32(),
+            get(pointer),
+            mod.binary(ops.MulInt32(), get(i_local), mod.i32(size)),
+        ),
+        compiler._cast_numeric_to_type(get(value_local), element_type, node.lineno),
+        element_type,
+        MEMORY_NAME,
+    )
+    loop = mod.loop(
+        loop_name,
+        mod.block(
+            None,
+            [
+                mod.Break(
+                    exit_name,
+                    mod.binary(ops.GeSInt32(), get(i_local), get(length_local)),
+                    None,
+                ),
+                store,
+                mod.local_set(
+                    value_local,
+                    mod.binary(ops.AddInt32(), get(value_local), get(step_local)),
+                ),
+                mod.local_set(
+                    i_local, mod.binary(ops.AddInt32(), get(i_local), mod.i32(1))
+                ),
+                mod.Break(loop_name, None, None),
+            ],
+            binaryen.type.TypeNone,
+        ),
+    )
+    return mod.block(
+        None,
+        [
+            *setup,
+            *allocate,
+            mod.local_set(value_local, get(start_local)),
+            mod.local_set(i_local, mod.i32(0)),
+            mod.block(exit_name, [loop], binaryen.type.TypeNone),
+            get(pointer),
+        ],
+        Int32,
+    )
+
+
 def len(compiler: "Compiler", node: Call):
+    match node.args:
+        case [Name(id=name)] if name in compiler.buffers:
+            # Buffers are passed with their length in the local after the pointer
+            pointer_index = compiler.buffers[name][1]
+            return compiler.module.local_get(pointer_index + 1, binaryen.type.Int32)
+        case [Name(id=name)] if name in compiler.memory_arrays:
+            return compiler._get_array_length(name)
+
     if not compiler.gc:
-        raise RuntimeError("Enable Garbage Collection with the -gc flag to use arrays")
+        raise RuntimeError(
+            f'len() only supports arrays and buffers. "{compiler.filename}", line {node.lineno}.'
+        )
 
     if node.args.__len__() != 1:
         raise RuntimeError
@@ -153,3 +272,406 @@ def len(compiler: "Compiler", node: Call):
             # Assuming its a array
             value = compiler.visit(node.args[0])
             return compiler.module.array_len(value)
+
+
+def abs(compiler: "Compiler", node: Call):
+    if node.args.__len__() != 1:
+        raise RuntimeError(
+            f'abs takes 1 argument. "{compiler.filename}", line {node.lineno}.'
+        )
+
+    mod = compiler.module
+    ops = binaryen.operations
+    value = compiler.visit(node.args[0])
+    value_type = value.get_type()
+    match value_type:
+        case binaryen.type.Float32:
+            return mod.unary(ops.AbsFloat32(), value)
+        case binaryen.type.Float64:
+            return mod.unary(ops.AbsFloat64(), value)
+        case binaryen.type.Int32:
+            bits, shift_op, xor_op, sub_op = (
+                32,
+                ops.ShrSInt32(),
+                ops.XorInt32(),
+                ops.SubInt32(),
+            )
+            constant = mod.i32
+        case binaryen.type.Int64:
+            bits, shift_op, xor_op, sub_op = (
+                64,
+                ops.ShrSInt64(),
+                ops.XorInt64(),
+                ops.SubInt64(),
+            )
+            constant = mod.i64
+        case _:
+            raise RuntimeError(
+                f'abs needs a number. "{compiler.filename}", line {node.lineno}.'
+            )
+
+    # Branchless: sign is -1 for negative values and 0 otherwise, (x ^ sign) - sign flips and adds one if negative
+    local = compiler.func_ref.add_var(value_type)
+    sign = compiler.func_ref.add_var(value_type)
+    get = lambda index: mod.local_get(index, value_type)
+    return mod.block(
+        None,
+        [
+            mod.local_set(local, value),
+            mod.local_set(sign, mod.binary(shift_op, get(local), constant(bits - 1))),
+            mod.binary(sub_op, mod.binary(xor_op, get(local), get(sign)), get(sign)),
+        ],
+        value_type,
+    )
+
+
+def _min_max(compiler: "Compiler", node: Call, name: str, float_ops, int_ops):
+    if node.args.__len__() < 2:
+        raise RuntimeError(
+            f'{name} takes at least 2 arguments in Wasm functions. "{compiler.filename}", line {node.lineno}.'
+        )
+
+    mod = compiler.module
+    result = compiler.visit(node.args[0])
+    for argument in node.args[1:]:
+        current, other = compiler._cast_numeric_to_matching(
+            result, compiler.visit(argument), node.lineno
+        )
+        value_type = current.get_type()
+        match value_type:
+            case binaryen.type.Float32:
+                result = mod.binary(float_ops[0], current, other)
+            case binaryen.type.Float64:
+                result = mod.binary(float_ops[1], current, other)
+            case _:
+                # Like python, keep the current value unless the other one is strictly smaller (or larger)
+                compare_op = (
+                    int_ops[0] if value_type == binaryen.type.Int32 else int_ops[1]
+                )
+                current_local = compiler.func_ref.add_var(value_type)
+                other_local = compiler.func_ref.add_var(value_type)
+                get = lambda index: mod.local_get(index, value_type)
+                result = mod.block(
+                    None,
+                    [
+                        mod.local_set(current_local, current),
+                        mod.local_set(other_local, other),
+                        mod.select(
+                            mod.binary(
+                                compare_op, get(other_local), get(current_local)
+                            ),
+                            get(other_local),
+                            get(current_local),
+                            value_type,
+                        ),
+                    ],
+                    value_type,
+                )
+    return result
+
+
+def min(compiler: "Compiler", node: Call):
+    ops = binaryen.operations
+    return _min_max(
+        compiler,
+        node,
+        "min",
+        (ops.MinFloat32(), ops.MinFloat64()),
+        (ops.LtSInt32(), ops.LtSInt64()),
+    )
+
+
+def max(compiler: "Compiler", node: Call):
+    ops = binaryen.operations
+    return _min_max(
+        compiler,
+        node,
+        "max",
+        (ops.MaxFloat32(), ops.MaxFloat64()),
+        (ops.GtSInt32(), ops.GtSInt64()),
+    )
+
+
+class VectorShape:
+    """How the 128 bits of a SIMD vector are split into lanes, e.g. f32x4 is four f32 lanes"""
+
+    def __init__(
+        self, name: str, lanes: int, lane_type: "binaryen.internals.BinaryenType"
+    ) -> None:
+        self.name = name
+        self.lanes = lanes
+        self.lane_type = lane_type
+        self.lane_size = 16 // lanes
+        self.floating = name.startswith("f")
+
+    def op(self, name: str):
+        """Get the binaryen operation for this shape e.g. op("Add") is AddVecF32x4 for f32x4. Integer min and max are
+        signed."""
+        signed = "S" if name in ["Min", "Max"] and not self.floating else ""
+        return getattr(
+            binaryen.operations, f"{name}{signed}Vec{self.name.capitalize()}"
+        )()
+
+
+SIMD_SHAPES = [
+    VectorShape("f32x4", 4, binaryen.type.Float32),
+    VectorShape("f64x2", 2, binaryen.type.Float64),
+    VectorShape("i32x4", 4, binaryen.type.Int32),
+]
+
+
+def _check_arguments(compiler: "Compiler", node: Call, name: str, count: int):
+    if node.args.__len__() != count:
+        raise RuntimeError(
+            f'{name} takes {count} argument(s). "{compiler.filename}", line {node.lineno}.'
+        )
+
+
+def _visit_vector(compiler: "Compiler", node: Call, name: str, argument: AST):
+    vector = compiler.visit(argument)
+    if vector.get_type() != binaryen.type.Vec128:
+        raise RuntimeError(
+            f'{name} needs a SIMD vector. "{compiler.filename}", line {node.lineno}.'
+        )
+    return vector
+
+
+def _visit_lane(compiler: "Compiler", node: Call, shape: VectorShape, argument: AST):
+    # Wasm encodes the lane in the instruction, so it has to be known when compiling
+    match argument:
+        case Constant(value=int() as lane) if 0 <= lane < shape.lanes:
+            return lane
+    raise RuntimeError(
+        f'The lane of a {shape.name} vector must be a constant from 0 to {shape.lanes - 1}. "{compiler.filename}", line {node.lineno}.'
+    )
+
+
+def _simd_address(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+    """Get the address of the vector at buffer[index], trapping unless all of its lanes are in the buffer"""
+    match node.args[0]:
+        case Name(id=buffer) if buffer in compiler.buffers:
+            pass
+        case _:
+            raise RuntimeError(
+                f'{name} needs a buf argument. "{compiler.filename}", line {node.lineno}.'
+            )
+    buffer_type, pointer_index = compiler.buffers[buffer]
+    if buffer_type.element_type != shape.lane_type:
+        raise RuntimeError(
+            f'The lanes of {name} do not match the elements of the buffer. "{compiler.filename}", line {node.lineno}.'
+        )
+
+    mod = compiler.module
+    ops = binaryen.operations
+    Int32 = binaryen.type.Int32
+    index = compiler._cast_numeric_to_type(
+        compiler.visit(node.args[1]), Int32, node.lineno
+    )
+    index_local = compiler.func_ref.add_var(Int32)
+    get_index = lambda: mod.local_get(index_local, Int32)
+    get_length = lambda: mod.local_get(pointer_index + 1, Int32)
+
+    # Unsigned comparisons also catch negative indexes, length - index only wraps when index > length is already true
+    out_of_bounds = mod.binary(
+        ops.OrInt32(),
+        mod.binary(ops.GtUInt32(), get_index(), get_length()),
+        mod.binary(
+            ops.LtUInt32(),
+            mod.binary(ops.SubInt32(), get_length(), get_index()),
+            mod.i32(shape.lanes),
+        ),
+    )
+    address = mod.binary(
+        ops.AddInt32(),
+        mod.local_get(pointer_index, Int32),
+        mod.binary(ops.MulInt32(), get_index(), mod.i32(shape.lane_size)),
+    )
+    return buffer, mod.block(
+        None,
+        [
+            mod.local_set(index_local, index),
+            mod.If(out_of_bounds, mod.unreachable(), None),
+            address,
+        ],
+        Int32,
+    )
+
+
+def _simd_splat(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+    _check_arguments(compiler, node, name, 1)
+    value = compiler._cast_numeric_to_type(
+        compiler.visit(node.args[0]), shape.lane_type, node.lineno
+    )
+    return compiler.module.unary(shape.op("Splat"), value)
+
+
+def _simd_make(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+    _check_arguments(compiler, node, name, shape.lanes)
+    lanes = [
+        compiler._cast_numeric_to_type(
+            compiler.visit(argument), shape.lane_type, node.lineno
+        )
+        for argument in node.args
+    ]
+    vector = compiler.module.unary(shape.op("Splat"), lanes[0])
+    for lane in range(1, shape.lanes):
+        vector = binaryen.Expression(
+            binaryen.lib.BinaryenSIMDReplace(
+                compiler.module.ref,
+                shape.op("ReplaceLane"),
+                vector.ref,
+                lane,
+                lanes[lane].ref,
+            )
+        )
+    return vector
+
+
+def _simd_load(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+    from .compiler import MEMORY_NAME
+
+    _check_arguments(compiler, node, name, 2)
+    _buffer, address = _simd_address(compiler, node, shape, name)
+    return compiler.module.load(
+        16, False, 0, shape.lane_size, binaryen.type.Vec128, address, MEMORY_NAME
+    )
+
+
+def _simd_store(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+    from .compiler import MEMORY_NAME
+
+    _check_arguments(compiler, node, name, 3)
+    buffer, address = _simd_address(compiler, node, shape, name)
+    vector = _visit_vector(compiler, node, name, node.args[2])
+    compiler.written_buffers.add(buffer)
+    return compiler.module.store(
+        16, 0, shape.lane_size, address, vector, binaryen.type.Vec128, MEMORY_NAME
+    )
+
+
+def _simd_extract_lane(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+    _check_arguments(compiler, node, name, 2)
+    vector = _visit_vector(compiler, node, name, node.args[0])
+    lane = _visit_lane(compiler, node, shape, node.args[1])
+    return binaryen.Expression(
+        binaryen.lib.BinaryenSIMDExtract(
+            compiler.module.ref, shape.op("ExtractLane"), vector.ref, lane
+        )
+    )
+
+
+def _simd_replace_lane(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+    _check_arguments(compiler, node, name, 3)
+    vector = _visit_vector(compiler, node, name, node.args[0])
+    lane = _visit_lane(compiler, node, shape, node.args[1])
+    value = compiler._cast_numeric_to_type(
+        compiler.visit(node.args[2]), shape.lane_type, node.lineno
+    )
+    return binaryen.Expression(
+        binaryen.lib.BinaryenSIMDReplace(
+            compiler.module.ref, shape.op("ReplaceLane"), vector.ref, lane, value.ref
+        )
+    )
+
+
+def _simd_binary(operation: str):
+    def simd_binary(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+        _check_arguments(compiler, node, name, 2)
+        left = _visit_vector(compiler, node, name, node.args[0])
+        right = _visit_vector(compiler, node, name, node.args[1])
+        return compiler.module.binary(shape.op(operation), left, right)
+
+    return simd_binary
+
+
+def _simd_unary(operation: str):
+    def simd_unary(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+        _check_arguments(compiler, node, name, 1)
+        vector = _visit_vector(compiler, node, name, node.args[0])
+        return compiler.module.unary(shape.op(operation), vector)
+
+    return simd_unary
+
+
+# Byte masks for i8x16.shuffle, which swap the two halves of a vector, and neighbouring 32 bit lanes
+SWAP_HALVES = [*range(8, 16), *range(0, 8)]
+SWAP_PAIRS = [*range(4, 8), *range(0, 4), *range(12, 16), *range(8, 12)]
+
+
+def _simd_reduce(operation: str):
+    def simd_reduce(compiler: "Compiler", node: Call, shape: VectorShape, name: str):
+        """Combine a vector with itself with its halves swapped until the result is in lane 0, which takes
+        log2(lanes) vector operations rather than one scalar operation per lane"""
+        _check_arguments(compiler, node, name, 1)
+        mod = compiler.module
+        Vec128 = binaryen.type.Vec128
+        vector = _visit_vector(compiler, node, name, node.args[0])
+        local = compiler.func_ref.add_var(Vec128)
+        get = lambda: mod.local_get(local, Vec128)
+
+        steps = [mod.local_set(local, vector)]
+        masks = [SWAP_HALVES] if shape.lanes == 2 else [SWAP_HALVES, SWAP_PAIRS]
+        for mask in masks:
+            shuffled = binaryen.Expression(
+                binaryen.lib.BinaryenSIMDShuffle(
+                    mod.ref,
+                    get().ref,
+                    get().ref,
+                    binaryen.ffi.new("uint8_t[16]", mask),
+                )
+            )
+            steps.append(
+                mod.local_set(local, mod.binary(shape.op(operation), get(), shuffled))
+            )
+        steps.append(
+            binaryen.Expression(
+                binaryen.lib.BinaryenSIMDExtract(
+                    mod.ref, shape.op("ExtractLane"), get().ref, 0
+                )
+            )
+        )
+        return mod.block(None, steps, shape.lane_type)
+
+    return simd_reduce
+
+
+def _get_simd_intrinsics():
+    """Map the name of every SIMD intrinsic e.g. f32x4_add to a function compiling it. The python versions of the
+    intrinsics are in simd.py."""
+    intrinsics = {
+        "splat": _simd_splat,
+        "make": _simd_make,
+        "load": _simd_load,
+        "store": _simd_store,
+        "extract_lane": _simd_extract_lane,
+        "replace_lane": _simd_replace_lane,
+        "add": _simd_binary("Add"),
+        "sub": _simd_binary("Sub"),
+        "mul": _simd_binary("Mul"),
+        "min": _simd_binary("Min"),
+        "max": _simd_binary("Max"),
+        "abs": _simd_unary("Abs"),
+        "neg": _simd_unary("Neg"),
+        "sum": _simd_reduce("Add"),
+        "reduce_min": _simd_reduce("Min"),
+        "reduce_max": _simd_reduce("Max"),
+    }
+    # Wasm has no integer vector division or square root
+    float_intrinsics = {"div": _simd_binary("Div"), "sqrt": _simd_unary("Sqrt")}
+
+    functions = {}
+    for shape in SIMD_SHAPES:
+        shape_intrinsics = dict(intrinsics)
+        if shape.floating:
+            shape_intrinsics.update(float_intrinsics)
+        for suffix, function in shape_intrinsics.items():
+            name = f"{shape.name}_{suffix}"
+            functions[name] = (
+                lambda compiler, node, function=function, shape=shape, name=name: function(
+                    compiler, node, shape, name
+                )
+            )
+    return functions
+
+
+SIMD_INTRINSICS = _get_simd_intrinsics()
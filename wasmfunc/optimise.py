@@ -0,0 +1,151 @@
+import threading
+from typing import TYPE_CHECKING, Sequence
+
+if TYPE_CHECKING:
+    import binaryen
+
+# (optimize level, shrink level) of each level, these match the levels of binaryen's wasm-opt
+OPTIMISATION_LEVELS = {
+    "0": (0, 0),
+    "1": (1, 0),
+    "2": (2, 0),
+    "3": (3, 0),
+    "4": (4, 0),
+    "s": (2, 1),
+    "z": (2, 2),
+}
+# The level used by `optimise=True` and the CLI by default, binaryen's own default of optimize level 2 and shrink level 1
+DEFAULT_LEVEL = "s"
+
+# binaryen keeps its pass options in globals shared by every module, so only one module is optimised at a time
+_options_lock = threading.Lock()
+
+
+def _run_passes(module: "binaryen.Module", passes: Sequence[str]):
+    import binaryen
+
+    names = [binaryen.ffi.new("char[]", name.encode("utf-8")) for name in passes]
+    binaryen.lib.BinaryenModuleRunPasses(
+        module.ref, binaryen.ffi.new("char*[]", names), len(names)
+    )
+
+
+def run_pass(module: "binaryen.Module", name: str, argument: str | None = None):
+    """Run a single binaryen pass on a module. The argument is passed to the pass the same way as wasm-opt's
+    `--name=argument`."""
+    import binaryen
+
+    with _options_lock:
+        if argument is not None:
+            binaryen.lib.BinaryenSetPassArgument(
+                name.encode("utf-8"), argument.encode("utf-8")
+            )
+        try:
+            _run_passes(module, [name])
+        finally:
+            if argument is not None:
+                binaryen.lib.BinaryenClearPassArguments()
+
+
+class OptimisationSettings:
+    """How a module is optimised: an optimisation level from -O0 to -O4, -Os or -Oz, the inlining thresholds and a list
+    of extra binaryen passes which are run after the level's default pipeline (or on their own at level 0).
+    """
+
+    def __init__(
+        self,
+        level: str = DEFAULT_LEVEL,
+        always_inline_max_size: int | None = None,
+        flexible_inline_max_size: int | None = None,
+        passes: Sequence[str] = (),
+    ) -> None:
+        if level not in OPTIMISATION_LEVELS:
+            raise RuntimeError(
+                f"Unknown optimisation level -O{level}, expected one of {', '.join('-O' + name for name in OPTIMISATION_LEVELS)}."
+            )
+        for size in (always_inline_max_size, flexible_inline_max_size):
+            if size is not None and size < 0:
+                raise RuntimeError("Inlining thresholds can not be negative.")
+        self.level = level
+        self.always_inline_max_size = always_inline_max_size
+        self.flexible_inline_max_size = flexible_inline_max_size
+        self.passes = tuple(passes)
+
+    @classmethod
+    def from_options(
+        cls,
+        optimise: "bool | int | str | OptimisationSettings" = False,
+        always_inline_max_size: int | None = None,
+        flexible_inline_max_size: int | None = None,
+        passes: Sequence[str] = (),
+    ) -> "OptimisationSettings":
+        """Build settings from the keyword arguments of `@wasmfunc(...)`. optimise is a level (0-4, "s" or "z", with or
+        without a leading "O"), True for the default level or False for no optimisation.
+        """
+        if isinstance(optimise, OptimisationSettings):
+            return optimise
+        if optimise is True:
+            level = DEFAULT_LEVEL
+        elif optimise is False:
+            level = "0"
+        else:
+            level = str(optimise).removeprefix("-").removeprefix("O")
+        return cls(level, always_inline_max_size, flexible_inline_max_size, passes)
+
+    @property
+    def enabled(self) -> bool:
+        return self.level != "0" or len(self.passes) > 0
+
+    def _key(self):
+        return (
+            self.level,
+            self.always_inline_max_size,
+            self.flexible_inline_max_size,
+            self.passes,
+        )
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, OptimisationSettings) and other._key() == self._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        # Also used in the disk cache key, so it must describe every setting
+        return (
+            f"OptimisationSettings(level={self.level!r}, always_inline_max_size={self.always_inline_max_size!r}, "
+            f"flexible_inline_max_size={self.flexible_inline_max_size!r}, passes={self.passes!r})"
+        )
+
+    def apply(self, module: "binaryen.Module"):
+        """Optimise a module in place"""
+        if not self.enabled:
+            return
+
+        import binaryen
+
+        lib = binaryen.lib
+        optimize_level, shrink_level = OPTIMISATION_LEVELS[self.level]
+        with _options_lock:
+            previous = (
+                lib.BinaryenGetOptimizeLevel(),
+                lib.BinaryenGetShrinkLevel(),
+                lib.BinaryenGetAlwaysInlineMaxSize(),
+                lib.BinaryenGetFlexibleInlineMaxSize(),
+            )
+            lib.BinaryenSetOptimizeLevel(optimize_level)
+            lib.BinaryenSetShrinkLevel(shrink_level)
+            if self.always_inline_max_size is not None:
+                lib.BinaryenSetAlwaysInlineMaxSize(self.always_inline_max_size)
+            if self.flexible_inline_max_size is not None:
+                lib.BinaryenSetFlexibleInlineMaxSize(self.flexible_inline_max_size)
+            try:
+                if self.level != "0":
+                    module.optimize()
+                if self.passes:
+                    _run_passes(module, self.passes)
+            finally:
+                lib.BinaryenSetOptimizeLevel(previous[0])
+                lib.BinaryenSetShrinkLevel(previous[1])
+                lib.BinaryenSetAlwaysInlineMaxSize(previous[2])
+                lib.BinaryenSetFlexibleInlineMaxSize(previous[3])
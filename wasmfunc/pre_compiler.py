@@ -1,15 +1,22 @@
 #!/usr/bin/env python
+import ast
 from ast import (
+    AnnAssign,
+    Assign,
+    AsyncFunctionDef,
     Attribute,
     Call,
     FunctionDef,
     Import,
     ImportFrom,
+    Module,
     Name,
     NodeVisitor,
     Subscript,
     expr,
+    stmt,
 )
+from functools import cache
 
 import binaryen
 
@@ -18,6 +25,53 @@ Int32 = binaryen.type.Int32
 Int64 = binaryen.type.Int64
 Float32 = binaryen.type.Float32
 Float64 = binaryen.type.Float64
+Vec128 = binaryen.type.Vec128
+
+
+class BufferType:
+    """A `buf[T]` function argument. In Wasm it is passed as two i32 arguments: a pointer into linear memory and the number of elements."""
+
+    def __init__(self, element_type: BinaryenType) -> None:
+        self.element_type = element_type
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BufferType) and other.element_type == self.element_type
+
+    def __hash__(self) -> int:
+        return hash(("buf", self.element_type))
+
+
+def get_type_name(binaryen_type: "BinaryenType | BufferType") -> str:
+    """Get the wasmfunc name of a type e.g. i32 or buf[f64], used to describe function signatures to the host"""
+    names = {Int32: "i32", Int64: "i64", Float32: "f32", Float64: "f64"}
+    if isinstance(binaryen_type, BufferType):
+        return f"buf[{names[binaryen_type.element_type]}]"
+    if binaryen_type in names:
+        return names[binaryen_type]
+    if binaryen_type == binaryen.type.TypeNone:
+        return "none"
+    if binaryen_type == Vec128:
+        return "v128"
+    if binaryen_type == binaryen.type.Stringref:
+        return "string"
+    # Array annotations are converted to heap types, see get_binaryen_type
+    if not binaryen.type.heap_type.is_basic(
+        binaryen_type
+    ) and binaryen.type.heap_type.is_array(binaryen_type):
+        element_type = binaryen.type.array_type.get_element_type(binaryen_type)
+        return f"array[{names.get(element_type, '?')}]"
+    return "?"
+
+
+@cache
+def get_array_type(element_type: BinaryenType):
+    """Get the heap type of a mutable array. Types are interned, so every annotation for the same array shares one
+    instead of building a new type each time."""
+    tb = binaryen.TypeBuilder(1)
+    # Use not packed for now, easier I think
+    tb.set_array_type(0, element_type, binaryen.type.NotPacked, True)
+
+    return tb.build()[0]
 
 
 def get_binaryen_type(node: expr | None, object_aliases: dict[str, str]):
@@ -26,7 +80,16 @@ def get_binaryen_type(node: expr | None, object_aliases: dict[str, str]):
     # Or are Name e.g. by using `from wasmfunc import i32`
     # Note that both the Attribute and Name can be aliased because of `import wasmfunc as p`
     # Or `from wasmfunc import i32 as integer32`
-    type_map = {"i32": Int32, "i64": Int64, "f32": Float32, "f64": Float64}
+    type_map = {
+        "i32": Int32,
+        "i64": Int64,
+        "f32": Float32,
+        "f64": Float64,
+        # Every SIMD vector is a v128 in Wasm, the intrinsics used on it decide how its lanes are read
+        "f32x4": Vec128,
+        "f64x2": Vec128,
+        "i32x4": Vec128,
+    }
 
     match node:
         case None:
@@ -45,11 +108,14 @@ def get_binaryen_type(node: expr | None, object_aliases: dict[str, str]):
             if element_type is None:
                 raise RuntimeError("Cannot have a list with element type None")
 
-            tb = binaryen.TypeBuilder(1)
-            # Use not packed for now, easier I think
-            tb.set_array_type(0, element_type, binaryen.type.NotPacked, True)
+            return get_array_type(element_type)
+        case Subscript(value=Name(id="buf")):
+            element_type = get_binaryen_type(node.slice, object_aliases)
+
+            if element_type not in [Int32, Int64, Float32, Float64]:
+                raise RuntimeError("Buffers can only contain i32, i64, f32 or f64")
 
-            return tb.build()[0]
+            return BufferType(element_type)
         case _:
             raise RuntimeWarning(f"Unkown argument annotation {node} ({type(node)})")
 
@@ -91,22 +157,63 @@ def does_contain_wasm(
             ) if decorator.func.value.id in module_aliases:
                 contains_wasm = True
                 break
-            case Call(func=Name()) if object_aliases[decorator.func.id] == "wasmfunc":
+            case Call(func=Name()) if object_aliases.get(decorator.func.id) == "wasmfunc":
                 contains_wasm = True
                 break
     return contains_wasm
 
 
+def iter_module_statements(statements: list[stmt]):
+    """Yield the statements the compiler needs from a module in source order: imports, assignments which may declare
+    globals, and function definitions. Compound statements such as if or class are searched, but the bodies of
+    functions and all expressions are skipped, so plain python code around the Wasm functions costs almost nothing."""
+    for statement in statements:
+        match statement:
+            case Import() | ImportFrom() | Assign() | AnnAssign() | FunctionDef():
+                yield statement
+            case AsyncFunctionDef():
+                continue
+            case _:
+                for field in ("body", "orelse", "finalbody"):
+                    yield from iter_module_statements(getattr(statement, field, []))
+                for handler in getattr(statement, "handlers", []):
+                    yield from iter_module_statements(handler.body)
+
+
+def add_parent_links(node: FunctionDef):
+    """Add a parent attribute to every node in a function"""
+    for parent in ast.walk(node):
+        for child in ast.iter_child_nodes(parent):
+            child.parent = parent
+
+
 class PreCompiler(NodeVisitor):
+    """Collects the wasmfunc imports, the statements of the module and the signatures of every Wasm function, in a single
+    pass over the top level of the module"""
+
     def __init__(self) -> None:
         self.module_aliases = []
         self.object_aliases = {}
 
         self.argument_types: dict[str, list[BinaryenType]] = {}
         self.return_type: dict[str, BinaryenType] = {}
+        # Statements for the compiler to visit, see iter_module_statements
+        self.statements: list[stmt] = []
 
         super().__init__()
 
+    def visit_Module(self, node: Module):
+        for statement in iter_module_statements(node.body):
+            if not isinstance(statement, FunctionDef):
+                self.statements.append(statement)
+            self.visit(statement)
+
+    def visit_Assign(self, node: Assign):
+        pass
+
+    def visit_AnnAssign(self, node: AnnAssign):
+        pass
+
     def visit_FunctionDef(self, node: FunctionDef):
         """Check if function has the binaryen decorator @binaryen.wasmfunc"""
         contains_wasm = does_contain_wasm(
@@ -115,6 +222,7 @@ class PreCompiler(NodeVisitor):
 
         if not contains_wasm:
             return
+        self.statements.append(node)
 
         arguments = []
         for argument in node.args.args:
@@ -0,0 +1,182 @@
+"""Profile guided optimisation.
+
+`profile_file` compiles a module with a counter on the entry of every Wasm function and on both arms of every `if`
+statement, runs a workload through it and returns a `Profile` of the counts. Passing the profile to a later compile
+(`wasmfunc compile --profile`, `@wasmfunc(profile=...)` or `compile_file(profile=...)`) uses it to:
+
+- lay out each `if` so that its hotter arm comes first, as engines place the first arm on the fall through path
+- order the functions of the module from the most to the least called
+- stop binaryen from inlining functions which are rarely called, so its inlining budget goes to the hot ones
+
+Counts are kept per function along with a hash of the function's source, so a function that has changed since it was
+profiled is compiled as if it had no profile.
+"""
+
+import ast
+import hashlib
+import importlib.util
+import json
+import os
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:
+    import binaryen
+
+    from .compiler import Compiler
+
+PROFILE_FORMAT_VERSION = 1
+
+# Prefix of the exported i64 globals that count function calls and branches in an instrumented module
+COUNTER_PREFIX = "__profile_"
+
+# Functions called less than this fraction of the calls to the hottest function are never inlined
+COLD_FUNCTION_FRACTION = 0.01
+
+
+def get_function_hash(node: ast.FunctionDef) -> str:
+    return hashlib.sha256(ast.dump(node).encode("utf-8")).hexdigest()
+
+
+def generate_profile_path(input_path: str):
+    """Generates the default profile path for an input path. E.g. `a/b/c.py` becomes `a/b/c.profile.json`."""
+    filename, _file_extension = os.path.splitext(input_path)
+    return filename + ".profile.json"
+
+
+class Profile:
+    """The call and branch counts of every function in a module, collected by `profile_file`"""
+
+    def __init__(self, functions: dict[str, dict] | None = None) -> None:
+        # {name: {"hash": str, "calls": int, "branches": [[then_count, else_count], ...]}}
+        self.functions = functions if functions is not None else {}
+
+    @classmethod
+    def load(cls, path: str) -> "Profile":
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if data.get("version") != PROFILE_FORMAT_VERSION:
+            raise RuntimeError(
+                f'Profile "{path}" was written by a different version of wasmfunc, profile the module again.'
+            )
+        return cls(data["functions"])
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": PROFILE_FORMAT_VERSION, "functions": self.functions},
+                file,
+                indent=2,
+            )
+
+    def _get_function(self, name: str, function_hash: str) -> dict | None:
+        function = self.functions.get(name)
+        if function is None or function["hash"] != function_hash:
+            return None
+        return function
+
+    def get_calls(self, name: str, function_hash: str) -> int | None:
+        function = self._get_function(name, function_hash)
+        return function["calls"] if function is not None else None
+
+    def get_branch(
+        self, name: str, function_hash: str, index: int
+    ) -> tuple[int, int] | None:
+        """Get how many times the then and else arms of the index-th `if` statement in a function were run"""
+        function = self._get_function(name, function_hash)
+        if function is None or index >= len(function["branches"]):
+            return None
+        then_count, else_count = function["branches"][index]
+        return then_count, else_count
+
+    def order_functions(
+        self, nodes: Iterable[ast.FunctionDef]
+    ) -> list[ast.FunctionDef]:
+        """Sort functions from the most to the least called. Functions without a profile keep their order, after the
+        profiled ones."""
+        return sorted(
+            nodes,
+            key=lambda node: -(self.get_calls(node.name, get_function_hash(node)) or 0),
+        )
+
+    def get_cold_functions(self, nodes: Iterable[ast.FunctionDef]) -> list[str]:
+        calls = {
+            node.name: self.get_calls(node.name, get_function_hash(node))
+            for node in nodes
+        }
+        hottest = max((count for count in calls.values() if count), default=0)
+        return [
+            name
+            for name, count in calls.items()
+            if count is not None and count < hottest * COLD_FUNCTION_FRACTION
+        ]
+
+
+def mark_cold_functions(module: "binaryen.Module", names: Iterable[str]):
+    """Stop binaryen from inlining functions into their callers"""
+    from .optimise import run_pass
+
+    for name in names:
+        run_pass(module, "no-inline", name)
+
+
+def get_counter_name(index: int) -> bytes:
+    return f"{COUNTER_PREFIX}{index}".encode("ascii")
+
+
+def load_workload(workload_path: str) -> dict[str, list[tuple]]:
+    """Get the `testinputs_<function>` lists of arguments defined in a python file"""
+    spec = importlib.util.spec_from_file_location("wasmfunc_workload", workload_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return {
+        name.removeprefix("testinputs_"): list(value)
+        for name, value in vars(module).items()
+        if name.startswith("testinputs_")
+    }
+
+
+def profile_file(
+    input_path: str,
+    workload: dict[str, list[tuple]] | None = None,
+    enable_gc=False,
+) -> Profile:
+    """Compile a file with call and branch counters, call its functions with every tuple of arguments in workload and
+    return the counts. The workload defaults to the `testinputs_<function>` lists in the file itself.
+    """
+    from .file_handler import compile_file
+    from .runtime import WasmRuntime
+
+    if workload is None:
+        workload = load_workload(input_path)
+
+    compiler = compile_file(input_path, enable_gc=enable_gc, instrument=True)
+    runtime = WasmRuntime.from_binary(compiler.emit_binary(), enable_gc)
+    for name, inputs in workload.items():
+        if name not in compiler.compiled_functions:
+            raise RuntimeError(
+                f'The workload calls {name}, which is not a Wasm function in "{input_path}".'
+            )
+        function = runtime.get_function(name)
+        for arguments in inputs:
+            function(*arguments)
+
+    return read_counters(compiler, runtime)
+
+
+def read_counters(compiler: "Compiler", runtime) -> Profile:
+    store, exports = runtime._get_thread_instance()
+    functions = {}
+    for index, (name, function_hash, kind, branch) in enumerate(
+        compiler.profile_counters
+    ):
+        function = functions.setdefault(
+            name, {"hash": function_hash, "calls": 0, "branches": []}
+        )
+        count = exports[get_counter_name(index).decode()].value(store)
+        if kind == "calls":
+            function["calls"] = count
+            continue
+        while len(function["branches"]) <= branch:
+            function["branches"].append([0, 0])
+        function["branches"][branch][0 if kind == "then" else 1] = count
+    return Profile(functions)
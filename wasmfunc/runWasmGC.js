@@ -1,7 +1,83 @@
 "use strict";
 // USE WITH: deno run -A --v8-flags=--experimental-wasm-stringref runWasmGC.js <filename> <function-name> <args>
+//       OR: deno run -A --v8-flags=--experimental-wasm-stringref runWasmGC.js --serve
+//
+// With --serve the module is loaded once and calls are read from stdin, one JSON message per line:
+//   {"binary": "<base64 Wasm binary>"}              -> {"result": null}
+//   {"function": "<name>", "args": ["<arg>", ...]}  -> {"result": "<output>"}
+//   {"function": "__result_<name>", "args": [...], "itemsize": <bytes>}  -> {"result": "<base64 array elements>"}
+// Any error is sent back as {"error": "<message>"}. Arguments and results are sent as strings, so that i64 values
+// (BigInt in JS) keep their precision.
 
-(async () => {
+// Must match HEAP_POINTER_NAME and MEMORY_NAME in compiler.py
+const HEAP_POINTER = "__heap_pointer";
+const MEMORY = "memory";
+
+const encoder = new TextEncoder();
+const decoder = new TextDecoder();
+
+async function writeLine(message) {
+  const data = encoder.encode(JSON.stringify(message) + "\n");
+  let written = 0;
+  while (written < data.length) {
+    written += await Deno.stdout.write(data.subarray(written));
+  }
+}
+
+function encodeBase64(bytes) {
+  // Convert in chunks, spreading a large array into fromCharCode overflows the stack
+  let binary = "";
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode(...bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binary);
+}
+
+async function handleMessage(state, message) {
+  if ("binary" in message) {
+    const binary = Uint8Array.from(atob(message.binary), (c) => c.charCodeAt(0));
+    const { instance } = await WebAssembly.instantiate(binary, {});
+    state.exports = instance.exports;
+    return null;
+  }
+
+  if (state.exports === null) {
+    throw new Error("No Wasm module has been loaded");
+  }
+  const func = state.exports[message.function];
+  if (typeof func !== "function") {
+    throw new Error(`Wasm func ${message.function} does not exist`);
+  }
+  if ("itemsize" in message) {
+    // __result_<name> copies the returned array into free memory after the heap pointer and returns its length
+    const offset = Math.ceil(state.exports[HEAP_POINTER].value / 8) * 8;
+    const count = func(...message.args, offset);
+    const memory = state.exports[MEMORY].buffer;
+    return encodeBase64(new Uint8Array(memory, offset, count * message.itemsize));
+  }
+  return String(func(...message.args));
+}
+
+async function serve() {
+  const state = { exports: null };
+  let buffered = "";
+  for await (const chunk of Deno.stdin.readable) {
+    buffered += decoder.decode(chunk, { stream: true });
+    let newline;
+    while ((newline = buffered.indexOf("\n")) !== -1) {
+      const line = buffered.slice(0, newline);
+      buffered = buffered.slice(newline + 1);
+      try {
+        const result = await handleMessage(state, JSON.parse(line));
+        await writeLine({ result });
+      } catch (error) {
+        await writeLine({ error: String(error) });
+      }
+    }
+  }
+}
+
+async function runOnce() {
   const file = await Deno.readFile(Deno.args[0]);
   const wasm = await WebAssembly.compile(file);
   const exports = WebAssembly.Module.exports(wasm);
@@ -20,5 +96,11 @@
 
   const output = instance.exports[funcName](...funcArgs);
 
-  console.log(Number(output));
-})();
+  console.log(String(output));
+}
+
+if (Deno.args[0] === "--serve") {
+  serve();
+} else {
+  runOnce();
+}
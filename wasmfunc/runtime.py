@@ -0,0 +1,541 @@
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Iterator
+
+from . import memory
+from .optimise import OptimisationSettings
+
+# NOTE: binaryen and wasmtime are slow to import, so they are only imported once a module is actually compiled or
+# executed. Importing wasmfunc, or a file full of decorated functions, should not pay for them.
+
+
+class WasmRuntime:
+    """Compiles a source file to Wasm once and shares the result between every decorated function in that file.
+
+    Functions can be called from many threads at once. Each thread runs in its own wasmtime store and instance of the
+    shared module, so Wasm globals are per thread.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        enable_gc=False,
+        enable_str=False,
+        optimise: "bool | int | str | OptimisationSettings" = False,
+        use_cache=True,
+        profile: str | None = None,
+    ) -> None:
+        self.file_path = file_path
+        self.enable_gc = enable_gc
+        self.enable_str = enable_str
+        self.optimise = OptimisationSettings.from_options(optimise)
+        self.use_cache = use_cache
+        # Path of a profile written by `wasmfunc profile`, used to optimise the module
+        self.profile = profile
+
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._load_thread: threading.Thread | None = None
+        self._functions: dict[str, Callable] = {}
+        # Argument and return types of each exported function, read from the binary's signature section
+        self.signatures: dict[str, dict] = {}
+
+        # Set when running in process with wasmtime. The engine and compiled module are shared, but stores are not
+        # thread safe, so every thread gets its own store and instance.
+        self._engine = None
+        self._module = None
+        self._thread_state = threading.local()
+        # Set when running a module that uses strings in a deno worker process
+        self._gc_binary = None
+        self._gc_runner = None
+
+    def _compile_binary(self) -> bytes:
+        from . import file_handler
+        from .profile import Profile
+
+        # Modules run in process with wasmtime include the loops used by `vectorize`
+        compiler = file_handler.compile_file(
+            self.file_path,
+            enable_gc=self.enable_gc,
+            enable_str=self.enable_str,
+            vectorize=runs_in_process(self.enable_str),
+            profile=Profile.load(self.profile) if self.profile is not None else None,
+        )
+        self.optimise.apply(compiler.module)
+        return compiler.emit_binary()
+
+    def load(self):
+        """Compile and instantiate the module. Only the first call does any work, and compiled artifacts are reused from the disk cache when possible."""
+        if self._loaded:
+            return
+        # If a background load is in progress this blocks until it has finished
+        with self._lock:
+            if self._loaded:
+                return
+
+            from wasmtime import Module
+
+            from . import cache
+            from .file_handler import get_wasm_gc_runner
+
+            key = None
+            if self.use_cache:
+                with open(self.file_path, "rb") as file:
+                    source = file.read()
+                profile = None
+                if self.profile is not None:
+                    with open(self.profile, "rb") as file:
+                        profile = file.read()
+                key = cache.get_cache_key(
+                    source,
+                    enable_gc=self.enable_gc,
+                    enable_str=self.enable_str,
+                    optimise=self.optimise,
+                    profile=profile,
+                )
+
+            binary = cache.load_binary(key) if key is not None else None
+            if binary is None:
+                binary = self._compile_binary()
+                if key is not None:
+                    cache.store_binary(key, binary)
+            self.signatures = _read_signatures(binary)
+
+            if not runs_in_process(self.enable_str):
+                self._gc_binary = binary
+                self._gc_runner = get_wasm_gc_runner(binary)
+            else:
+                engine = create_engine(self.enable_gc)
+                module = cache.load_module(key, engine) if key is not None else None
+                if module is None:
+                    module = Module(engine, binary)
+                    if key is not None:
+                        cache.store_module(key, module)
+
+                self._engine = engine
+                self._module = module
+
+            self._loaded = True
+
+    @classmethod
+    def from_binary(cls, binary: bytes, enable_gc=False):
+        """Create a runtime which runs an already compiled Wasm binary with wasmtime"""
+        from wasmtime import Module
+
+        runtime = cls("<binary>", enable_gc, use_cache=False)
+        runtime.signatures = _read_signatures(binary)
+        runtime._engine = create_engine(enable_gc)
+        runtime._module = Module(runtime._engine, binary)
+        runtime._loaded = True
+        return runtime
+
+    @classmethod
+    def from_artifact(
+        cls, artifact: bytes, signatures: dict, enable_gc=False, enable_str=False
+    ):
+        """Create a runtime from the output of `get_artifact`, without access to the source file"""
+        runtime = cls("<artifact>", enable_gc, enable_str, use_cache=False)
+        runtime.signatures = signatures
+        if not runs_in_process(enable_str):
+            from .file_handler import get_wasm_gc_runner
+
+            runtime._gc_binary = artifact
+            runtime._gc_runner = get_wasm_gc_runner(artifact)
+        else:
+            from wasmtime import Module
+
+            runtime._engine = create_engine(enable_gc)
+            runtime._module = Module.deserialize(runtime._engine, artifact)
+        runtime._loaded = True
+        return runtime
+
+    def get_artifact(self) -> bytes:
+        """Get the compiled module as bytes that can be sent to another process. This is the serialized native code for
+        wasmtime, or the Wasm binary for modules run with deno."""
+        self.load()
+        if self._gc_runner is not None:
+            return self._gc_binary
+        return self._module.serialize()
+
+    def map(
+        self,
+        name: str,
+        iterable: Iterable[tuple],
+        workers: int | None = None,
+        chunksize=1,
+    ) -> Iterator:
+        """Call the exported function `name` with every tuple of arguments in iterable, spread over a pool of worker
+        processes. The compiled module is sent to each worker once, and results are yielded in order.
+        """
+        artifact = self.get_artifact()
+        # Workers only need the artifact, so spawn them fresh rather than forking a process that has wasmtime threads
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_map_worker,
+            initargs=(artifact, self.signatures, self.enable_gc, self.enable_str),
+        ) as executor:
+            yield from executor.map(
+                partial(_call_in_map_worker, name), iterable, chunksize=chunksize
+            )
+
+    def load_in_background(self):
+        """Start compiling and instantiating the module in a background thread. Calls made before it finishes wait for it
+        to complete. If it fails, the error is raised again from the first call."""
+        with _runtimes_lock:
+            if self._loaded or self._load_thread is not None:
+                return
+            self._load_thread = threading.Thread(
+                target=self._background_load,
+                name=f"wasmfunc-load-{os.path.basename(self.file_path)}",
+                daemon=True,
+            )
+        self._load_thread.start()
+
+    def _background_load(self):
+        try:
+            self.load()
+        except Exception:
+            # Swallow the error here, load() will run again on the first call and raise it to the caller
+            pass
+
+    def _get_thread_instance(self):
+        """Get the calling thread's store and exports, instantiating the module for this thread if needed"""
+        thread_state = self._thread_state
+        if not hasattr(thread_state, "store"):
+            from wasmtime import Instance, Store
+
+            store = Store(self._engine)
+            instance = Instance(store, self._module, [])
+            thread_state.exports = instance.exports(store)
+            thread_state.store = store
+        return thread_state.store, thread_state.exports
+
+    def _get_thread_function(self, name: str) -> Callable:
+        """Get the export `name` from the calling thread's instance"""
+        store, exports = self._get_thread_instance()
+        functions = getattr(self._thread_state, "functions", None)
+        if functions is None:
+            functions = self._thread_state.functions = {}
+
+        function = functions.get(name)
+        if function is None:
+            function = functions[name] = partial(exports[name], store)
+        return function
+
+    def vectorize(self, name: str, *arrays, out=None):
+        """Call the function `name` on every element of the input arrays, in a single call into Wasm.
+        Inputs are copied into linear memory in bulk and a generated Wasm loop calls the scalar function on each element.
+        Results are written to `out` if given, otherwise a new NumPy array is returned.
+        """
+        from .compiler import HEAP_POINTER_NAME, VECTORIZE_PREFIX
+
+        numpy = memory.import_numpy()
+
+        self.load()
+        if self._gc_runner is not None:
+            raise RuntimeError(
+                "vectorize is not supported when running strings with deno"
+            )
+
+        store, exports = self._get_thread_instance()
+        scalar_function = exports[name]
+        vectorized_function = exports.get(VECTORIZE_PREFIX + name)
+        if vectorized_function is None:
+            raise TypeError(
+                f"{name} can't be vectorized, all of its arguments and its return value must be numbers"
+            )
+
+        function_type = scalar_function.type(store)
+        param_dtypes = [memory.DTYPES[str(param)] for param in function_type.params]
+        result_dtype = memory.DTYPES[str(function_type.results[0])]
+
+        if len(arrays) != len(param_dtypes):
+            raise TypeError(
+                f"{name} takes {len(param_dtypes)} arrays but {len(arrays)} were given"
+            )
+
+        inputs = [
+            numpy.ascontiguousarray(array, dtype=dtype).reshape(-1)
+            for array, dtype in zip(arrays, param_dtypes)
+        ]
+        count = len(inputs[0])
+        if any(len(array) != count for array in inputs):
+            raise ValueError("All arrays passed to vectorize must be the same length")
+
+        wasm_memory = exports["memory"]
+        heap_pointer = exports[HEAP_POINTER_NAME.decode()]
+        # Everything allocated for this call is freed by resetting the heap pointer afterwards
+        mark = heap_pointer.value(store)
+        try:
+            offsets = []
+            for array in inputs:
+                offset = memory.allocate(wasm_memory, heap_pointer, store, array.nbytes)
+                memory.get_memory_array(wasm_memory, store, offset, array.dtype, count)[
+                    :
+                ] = array
+                offsets.append(offset)
+            out_offset = memory.allocate(
+                wasm_memory,
+                heap_pointer,
+                store,
+                count * numpy.dtype(result_dtype).itemsize,
+            )
+
+            vectorized_function(store, *offsets, out_offset, count)
+
+            result = memory.get_memory_array(
+                wasm_memory, store, out_offset, result_dtype, count
+            )
+            if out is None:
+                return result.copy()
+            out[...] = result.reshape(numpy.shape(out))
+            return out
+        finally:
+            heap_pointer.set_value(store, mark)
+
+    def empty(self, length: int, dtype):
+        """Allocate a NumPy array in the calling thread's linear memory. Passing it as a buf argument from the same
+        thread doesn't copy it at all, and the function's writes are visible in it straight away.
+        The space is never freed, so allocate arrays once and reuse them. The engine never moves linear memory when it
+        grows, so the array stays valid after later allocations.
+        """
+        from .compiler import HEAP_POINTER_NAME
+
+        numpy = memory.import_numpy()
+        self.load()
+        store, exports = self._get_thread_instance()
+        heap_pointer = exports.get(HEAP_POINTER_NAME.decode())
+        if heap_pointer is None:
+            raise RuntimeError(
+                "This module has no linear memory, it needs at least one function with a buf argument"
+            )
+        wasm_memory = exports["memory"]
+        dtype = numpy.dtype(dtype)
+        offset = memory.allocate(
+            wasm_memory, heap_pointer, store, length * dtype.itemsize
+        )
+        return memory.get_memory_array(wasm_memory, store, offset, dtype, length)
+
+    def _call_with_memory(self, name: str, signature: dict, args: tuple):
+        """Call a function with buf arguments or an array result.
+
+        Arrays which already live in this thread's linear memory are passed without copying, anything else is copied in
+        with a single bulk copy and copied back out if the function writes to it. Returned arrays are copied into
+        linear memory by the Wasm module (or are already there without WasmGC), and then out into an `array.array`
+        with a single bulk copy. Without WasmGC array arguments are copied into linear memory too, but the function's
+        changes to them are not copied back, pass a buf for that.
+        """
+        from .compiler import HEAP_POINTER_NAME, RESULT_PREFIX
+
+        params = signature["params"]
+        if len(args) != len(params):
+            raise TypeError(
+                f"{name} takes {len(params)} arguments but {len(args)} were given"
+            )
+
+        store, exports = self._get_thread_instance()
+        wasm_memory = exports["memory"]
+        heap_pointer = exports[HEAP_POINTER_NAME.decode()]
+        writes = signature["writes"]
+
+        # Everything allocated for this call is freed by resetting the heap pointer afterwards
+        mark = heap_pointer.value(store)
+        try:
+            wasm_args = []
+            copied = []
+            for i, (param, argument) in enumerate(zip(params, args)):
+                if param.startswith("array[") and not self.enable_gc:
+                    try:
+                        pointer = memory.write_memory_array(
+                            wasm_memory, heap_pointer, store, argument, param[6:-1]
+                        )
+                    except TypeError:
+                        raise TypeError(
+                            f"Argument {i} of {name} must be a sequence of {param[6:-1]} values"
+                        ) from None
+                    wasm_args.append(pointer)
+                    continue
+                if not param.startswith("buf["):
+                    wasm_args.append(argument)
+                    continue
+
+                numpy = memory.import_numpy()
+                dtype = numpy.dtype(memory.DTYPES[param[4:-1]])
+                offset = memory.get_memory_offset(argument, wasm_memory, store)
+                if offset is not None and argument.dtype == dtype:
+                    wasm_args.extend([offset, argument.size])
+                    continue
+
+                array = numpy.ascontiguousarray(argument, dtype=dtype).reshape(-1)
+                offset = memory.allocate(wasm_memory, heap_pointer, store, array.nbytes)
+                memory.get_memory_array(wasm_memory, store, offset, dtype, array.size)[
+                    :
+                ] = array
+                wasm_args.extend([offset, array.size])
+                if i in writes:
+                    copied.append((argument, offset, dtype, array.size))
+
+            result_type = signature["result"]
+            if result_type.startswith("array[") and not self.enable_gc:
+                # Without WasmGC the array is already in linear memory, the function returns a pointer to it
+                pointer = self._get_thread_function(name)(*wasm_args)
+                result = memory.read_memory_array(
+                    wasm_memory, store, pointer, result_type[6:-1]
+                )
+            elif result_type.startswith("array["):
+                # The elements are written to free memory after the heap pointer
+                out_offset = memory.align(heap_pointer.value(store))
+                count = self._get_thread_function(RESULT_PREFIX + name)(
+                    *wasm_args, out_offset
+                )
+                result = memory.read_array(
+                    wasm_memory, store, out_offset, result_type[6:-1], count
+                )
+            else:
+                result = self._get_thread_function(name)(*wasm_args)
+
+            for argument, offset, dtype, count in copied:
+                values = memory.get_memory_array(
+                    wasm_memory, store, offset, dtype, count
+                )
+                if isinstance(argument, list):
+                    argument[:] = values.tolist()
+                    continue
+                target = memory.import_numpy().asarray(argument)
+                if target.flags.writeable:
+                    target[...] = values.reshape(target.shape)
+            return result
+        finally:
+            heap_pointer.set_value(store, mark)
+
+    def get_function(self, name: str) -> Callable:
+        """Get a callable for the exported Wasm function `name`. It takes the same positional arguments as the python function."""
+        function = self._functions.get(name)
+        if function is not None:
+            return function
+
+        self.load()
+
+        if self._gc_runner is not None:
+            gc_runner = self._gc_runner
+
+            def function(*args):
+                return gc_runner(name, args)
+
+        elif _uses_memory(self.signatures.get(name), self.enable_gc):
+            call_with_memory = self._call_with_memory
+            signature = self.signatures[name]
+
+            def function(*args):
+                return call_with_memory(name, signature, args)
+
+        else:
+            thread_state = self._thread_state
+            get_thread_function = self._get_thread_function
+
+            def function(*args):
+                try:
+                    wasm_function = thread_state.functions[name]
+                except (AttributeError, KeyError):
+                    wasm_function = get_thread_function(name)
+                return wasm_function(*args)
+
+        self._functions[name] = function
+        return function
+
+
+def runs_in_process(enable_str: bool) -> bool:
+    """Check if a module can run in process with wasmtime. wasmtime supports WasmGC structs and arrays, but not
+    stringref, so only modules compiled with strings enabled have to run in deno."""
+    return not enable_str
+
+
+def create_engine(enable_gc=False):
+    from wasmtime import Config, Engine
+
+    config = Config()
+    # Arrays from WasmRuntime.empty are views of linear memory, so it must never be moved when it grows. Growing past
+    # the space reserved for the memory fails instead.
+    config.memory_may_move = False
+    if enable_gc:
+        config.wasm_gc = True
+        config.wasm_function_references = True
+        config.wasm_reference_types = True
+    return Engine(config)
+
+
+def _uses_memory(signature: dict | None, enable_gc: bool) -> bool:
+    """Check if calls to a function pass data through linear memory, for buf arguments, array arguments without WasmGC
+    or an array result, or if it allocates arrays in linear memory which have to be freed after the call
+    """
+    if signature is None:
+        return False
+    if signature["result"].startswith("array[") or signature.get("allocates", False):
+        return True
+    memory_params = ("buf[",) if enable_gc else ("buf[", "array[")
+    return any(param.startswith(memory_params) for param in signature["params"])
+
+
+def _read_signatures(binary: bytes) -> dict[str, dict]:
+    from .compiler import SIGNATURE_SECTION_NAME
+    from .file_handler import read_custom_section
+
+    contents = read_custom_section(binary, SIGNATURE_SECTION_NAME)
+    if contents is None:
+        return {}
+    return json.loads(contents)
+
+
+_runtimes: dict[tuple, WasmRuntime] = {}
+_runtimes_lock = threading.Lock()
+
+
+def get_runtime(
+    file_path: str,
+    enable_gc=False,
+    enable_str=False,
+    optimise: "bool | int | str | OptimisationSettings" = False,
+    use_cache=True,
+    profile: str | None = None,
+) -> WasmRuntime:
+    """Get the runtime shared by every decorated function in a file, creating it if needed. Nothing is compiled until a function is called."""
+    file_path = os.path.abspath(file_path)
+    optimise = OptimisationSettings.from_options(optimise)
+    if profile is not None:
+        profile = os.path.abspath(profile)
+    key = (file_path, enable_gc, enable_str, optimise, use_cache, profile)
+    with _runtimes_lock:
+        runtime = _runtimes.get(key)
+        if runtime is None:
+            runtime = WasmRuntime(
+                file_path,
+                enable_gc=enable_gc,
+                enable_str=enable_str,
+                optimise=optimise,
+                use_cache=use_cache,
+                profile=profile,
+            )
+            _runtimes[key] = runtime
+    return runtime
+
+
+# The runtime of a process in a `WasmRuntime.map` pool
+_map_worker_runtime: WasmRuntime | None = None
+
+
+def _init_map_worker(
+    artifact: bytes, signatures: dict, enable_gc: bool, enable_str: bool
+):
+    global _map_worker_runtime
+    _map_worker_runtime = WasmRuntime.from_artifact(
+        artifact, signatures, enable_gc, enable_str
+    )
+
+
+def _call_in_map_worker(name: str, args: tuple):
+    return _map_worker_runtime.get_function(name)(*args)
@@ -0,0 +1,134 @@
+"""SIMD intrinsics for the `f32x4`, `f64x2` and `i32x4` vector types.
+
+In a Wasm function every intrinsic compiles to Wasm SIMD instructions, see `mini_std.SIMD_INTRINSICS`. The python
+versions below run when the function is called as plain python, where a vector is a tuple of its lanes. Horizontal
+reductions (`<shape>_sum`, `<shape>_reduce_min` and `<shape>_reduce_max`) combine the two halves of a vector until one
+lane is left, so the python versions add lanes in the same order as Wasm does.
+"""
+
+import math
+import operator
+
+
+def _check_range(buffer, index: int, lanes: int):
+    if index < 0 or index + lanes > len(buffer):
+        raise IndexError("SIMD load or store is out of the bounds of the buffer")
+
+
+def _splat(lanes: int):
+    def splat(value):
+        return (value,) * lanes
+
+    return splat
+
+
+def _make(lanes: int):
+    def make(*values):
+        if len(values) != lanes:
+            raise TypeError(f"Expected {lanes} lanes, got {len(values)}")
+        return tuple(values)
+
+    return make
+
+
+def _load(lanes: int):
+    def load(buffer, index: int):
+        _check_range(buffer, index, lanes)
+        return tuple(buffer[index + lane] for lane in range(lanes))
+
+    return load
+
+
+def _store(lanes: int):
+    def store(buffer, index: int, vector):
+        _check_range(buffer, index, lanes)
+        for lane in range(lanes):
+            buffer[index + lane] = vector[lane]
+
+    return store
+
+
+def _extract_lane(vector, lane: int):
+    return vector[lane]
+
+
+def _replace_lane(vector, lane: int, value):
+    return vector[:lane] + (value,) + vector[lane + 1 :]
+
+
+def _lanewise(operation):
+    def lanewise(*vectors):
+        return tuple(operation(*lanes) for lanes in zip(*vectors))
+
+    return lanewise
+
+
+def _reduce(operation):
+    def reduce(vector):
+        lanes = list(vector)
+        while len(lanes) > 1:
+            half = len(lanes) // 2
+            lanes = [operation(a, b) for a, b in zip(lanes[:half], lanes[half:])]
+        return lanes[0]
+
+    return reduce
+
+
+f32x4_splat = _splat(4)
+f32x4_make = _make(4)
+f32x4_load = _load(4)
+f32x4_store = _store(4)
+f32x4_extract_lane = _extract_lane
+f32x4_replace_lane = _replace_lane
+f32x4_add = _lanewise(operator.add)
+f32x4_sub = _lanewise(operator.sub)
+f32x4_mul = _lanewise(operator.mul)
+f32x4_div = _lanewise(operator.truediv)
+f32x4_min = _lanewise(min)
+f32x4_max = _lanewise(max)
+f32x4_abs = _lanewise(abs)
+f32x4_neg = _lanewise(operator.neg)
+f32x4_sqrt = _lanewise(math.sqrt)
+f32x4_sum = _reduce(operator.add)
+f32x4_reduce_min = _reduce(min)
+f32x4_reduce_max = _reduce(max)
+
+f64x2_splat = _splat(2)
+f64x2_make = _make(2)
+f64x2_load = _load(2)
+f64x2_store = _store(2)
+f64x2_extract_lane = _extract_lane
+f64x2_replace_lane = _replace_lane
+f64x2_add = _lanewise(operator.add)
+f64x2_sub = _lanewise(operator.sub)
+f64x2_mul = _lanewise(operator.mul)
+f64x2_div = _lanewise(operator.truediv)
+f64x2_min = _lanewise(min)
+f64x2_max = _lanewise(max)
+f64x2_abs = _lanewise(abs)
+f64x2_neg = _lanewise(operator.neg)
+f64x2_sqrt = _lanewise(math.sqrt)
+f64x2_sum = _reduce(operator.add)
+f64x2_reduce_min = _reduce(min)
+f64x2_reduce_max = _reduce(max)
+
+i32x4_splat = _splat(4)
+i32x4_make = _make(4)
+i32x4_load = _load(4)
+i32x4_store = _store(4)
+i32x4_extract_lane = _extract_lane
+i32x4_replace_lane = _replace_lane
+i32x4_add = _lanewise(operator.add)
+i32x4_sub = _lanewise(operator.sub)
+i32x4_mul = _lanewise(operator.mul)
+i32x4_min = _lanewise(min)
+i32x4_max = _lanewise(max)
+i32x4_abs = _lanewise(abs)
+i32x4_neg = _lanewise(operator.neg)
+i32x4_sum = _reduce(operator.add)
+i32x4_reduce_min = _reduce(min)
+i32x4_reduce_max = _reduce(max)
+
+__all__ = [
+    name for name in list(globals()) if name.startswith(("f32x4_", "f64x2_", "i32x4_"))
+]
@@ -0,0 +1,124 @@
+"""Wall time and memory use of each stage of compiling a file.
+
+Pass a `CompileTimings` to `compile_file` (or use `wasmfunc compile --timings`) to find out whether a slow build is
+spent in the python to Wasm compiler, or in binaryen passes:
+
+    timings = CompileTimings()
+    compiler = compile_file("kernels.py", timings=timings)
+    with timings.measure("optimize"):
+        compiler.module.optimize()
+    print(timings.report())
+
+Peak memory is measured with tracemalloc, so it only counts python allocations. Binaryen allocates natively, so the
+maximum resident set size of the process at the end of each stage is recorded as well, where the platform supports it
+(the `resource` module is not available on Windows).
+"""
+
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class StageTiming:
+    """How long a stage took, the peak python memory allocated during it and the process's max RSS at its end (bytes).
+    max_rss is None on platforms without the `resource` module."""
+
+    def __init__(
+        self, name: str, seconds: float, peak_memory: int, max_rss: int | None
+    ):
+        self.name = name
+        self.seconds = seconds
+        self.peak_memory = peak_memory
+        self.max_rss = max_rss
+
+    def __repr__(self) -> str:
+        return f"StageTiming({self.name!r}, seconds={self.seconds:.6f}, peak_memory={self.peak_memory}, max_rss={self.max_rss})"
+
+
+def _get_max_rss() -> int | None:
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class CompileTimings:
+    """Records a `StageTiming` for each stage of a compile, and for each function compiled by the `Compiler` visit.
+    Tracing memory slows python code down, set trace_memory to false for more accurate times.
+    """
+
+    def __init__(self, trace_memory=True) -> None:
+        self.trace_memory = trace_memory
+        self.stages: list[StageTiming] = []
+        self.functions: list[StageTiming] = []
+        # Peak memory of the stages being measured, as functions are measured inside the compile stage
+        self._peaks: list[int] = []
+
+    @contextmanager
+    def measure(self, name: str, function=False):
+        """Time the body of the with statement as the stage `name`, or as the compile of function `name`"""
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            if self._peaks:
+                # Resetting the peak below would lose the enclosing stage's peak so far
+                self._peaks[-1] = max(
+                    self._peaks[-1], tracemalloc.get_traced_memory()[1]
+                )
+            tracemalloc.reset_peak()
+        self._peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = self._peaks.pop()
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            if started_tracing:
+                tracemalloc.stop()
+            timing = StageTiming(name, seconds, peak, _get_max_rss())
+            (self.functions if function else self.stages).append(timing)
+
+    def report(self) -> str:
+        """Format the timings as a table"""
+        lines = [
+            f"{'stage':<32} {'time (ms)':>10} {'peak (KiB)':>11} {'max rss (MiB)':>14}"
+        ]
+
+        def add_line(timing: StageTiming, name: str):
+            max_rss = (
+                f"{timing.max_rss / 1024 ** 2:>14.1f}"
+                if timing.max_rss is not None
+                else f"{'-':>14}"
+            )
+            lines.append(
+                f"{name:<32} {timing.seconds * 1000:>10.3f} {timing.peak_memory / 1024:>11.1f} {max_rss}"
+            )
+
+        for stage in self.stages:
+            add_line(stage, stage.name)
+            if stage.name == "compile":
+                for function in sorted(self.functions, key=lambda t: -t.seconds):
+                    add_line(function, f"  {function.name}")
+        lines.append(
+            f"{'total':<32} {sum(stage.seconds for stage in self.stages) * 1000:>10.3f}"
+        )
+        return "\n".join(lines)
+
+
+def measure(timings: CompileTimings | None, name: str, function=False):
+    """Measure a stage if timings are being recorded, otherwise do nothing"""
+    if timings is None:
+        return nullcontext()
+    return timings.measure(name, function)
@@ -5,14 +5,28 @@ class wasmfuncBaseType(Protocol):
     pass
 
 
-class array(wasmfuncBaseType, Protocol):
-    pass
+class array[T](wasmfuncBaseType, Protocol):
+    """An array e.g. array[i32]. It is a WasmGC array with garbage collection enabled, otherwise it is allocated in linear memory and freed when the call from python returns. Functions returning an array of numbers give back an `array.array` when executed as Wasm."""
+
+    def __getitem__(self, __index: int, /) -> T: ...
+    def __setitem__(self, __index: int, __value: T, /) -> None: ...
+    def __len__(self) -> int: ...
 
 
 class string(wasmfuncBaseType, Protocol):
     pass
 
 
+class buf[T](wasmfuncBaseType, Protocol):
+    """A buffer of numbers in linear memory, e.g. buf[f64]. Only valid as a function argument.
+    Pass a NumPy array or any object supporting the buffer protocol when calling from python.
+    """
+
+    def __getitem__(self, __index: int, /) -> T: ...
+    def __setitem__(self, __index: int, __value: T, /) -> None: ...
+    def __len__(self) -> int: ...
+
+
 class i32(wasmfuncBaseType, Protocol):
     def __add__(self, __value: Union[Self, int], /) -> Self: ...
     def __sub__(self, __value: Union[Self, int], /) -> Self: ...
@@ -49,5 +63,17 @@ class f64(wasmfuncBaseType, Protocol):
     def __gt__(self, __value: Union[Self, int], /) -> bool: ...
 
 
+class f32x4(wasmfuncBaseType, Protocol):
+    """A Wasm SIMD vector of four f32 lanes, used through the f32x4_* intrinsics. In python it is a tuple of its lanes."""
+
+
+class f64x2(wasmfuncBaseType, Protocol):
+    """A Wasm SIMD vector of two f64 lanes, used through the f64x2_* intrinsics. In python it is a tuple of its lanes."""
+
+
+class i32x4(wasmfuncBaseType, Protocol):
+    """A Wasm SIMD vector of four i32 lanes, used through the i32x4_* intrinsics. In python it is a tuple of its lanes."""
+
+
 class none(wasmfuncBaseType):
     pass
@@ -0,0 +1,100 @@
+"""`wasmfunc watch`: recompile files as soon as they change.
+
+The watcher is a single long running process, so python, binaryen and the compiled modules stay loaded between compiles.
+Every file has its own `IncrementalCompiler`, so a change only recompiles the functions it touches, and only the outputs
+of the file that changed are written again.
+"""
+
+import os
+import time
+
+from .file_handler import find_source_files, generate_output_name
+from .incremental import IncrementalCompiler, copy_module
+from .optimise import OptimisationSettings
+
+
+class Watcher:
+    """Polls source files for changes, and recompiles the `.wasm` and `.wat` outputs of the ones that changed"""
+
+    def __init__(
+        self,
+        paths: list[str],
+        enable_gc=False,
+        enable_str=False,
+        optimise: OptimisationSettings | None = None,
+    ) -> None:
+        self.paths = paths
+        self.enable_gc = enable_gc
+        self.enable_str = enable_str
+        self.optimise = optimise if optimise is not None else OptimisationSettings()
+
+        self._compilers: dict[str, IncrementalCompiler] = {}
+        self._mtimes: dict[str, int] = {}
+
+    def poll(self) -> list[str]:
+        """Compile every file that is new or has been modified since the last poll. Returns messages to report."""
+        files = find_source_files(self.paths)
+        for file in list(self._mtimes):
+            if file not in files:
+                del self._mtimes[file]
+                self._compilers.pop(file, None)
+
+        messages = []
+        for file in files:
+            try:
+                mtime = os.stat(file).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            if self._mtimes.get(file) == mtime:
+                continue
+            self._mtimes[file] = mtime
+            messages.extend(self.compile(file))
+        return messages
+
+    def compile(self, file: str) -> list[str]:
+        incremental = self._compilers.get(file)
+        if incremental is None:
+            incremental = IncrementalCompiler(file, self.enable_gc, self.enable_str)
+            self._compilers[file] = incremental
+
+        start = time.perf_counter()
+        try:
+            compiler = incremental.compile()
+            if len(compiler.compiled_functions) == 0:
+                return [f"No Wasm functions found in {file}"]
+
+            # The incremental module is reused by the next compile, so only ever optimise a copy of it
+            module = compiler.module
+            if self.optimise.enabled:
+                module = copy_module(compiler)
+                self.optimise.apply(module)
+                binary = module.emit_binary()
+            else:
+                binary = compiler.emit_binary()
+
+            filename = generate_output_name(file)
+            with open(filename, "wb") as output:
+                output.write(binary)
+            module.write_text(generate_output_name(file, False))
+        except Exception as error:
+            # Start from scratch next time, rather than from a module that may be half updated
+            del self._compilers[file]
+            return [f"Error compiling {file}: {type(error).__name__}: {error}"]
+
+        milliseconds = (time.perf_counter() - start) * 1000
+        if incremental.recompiled:
+            recompiled = ", ".join(incremental.recompiled)
+        else:
+            recompiled = "no functions changed"
+        return [f"Written {filename} in {milliseconds:.1f} ms ({recompiled})"]
+
+    def run(self, interval=0.2):
+        """Poll for changes every interval seconds until interrupted"""
+        print(f"Watching {', '.join(self.paths)} for changes, press Ctrl+C to stop")
+        try:
+            while True:
+                for message in self.poll():
+                    print(message, flush=True)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass